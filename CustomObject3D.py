@@ -1,6 +1,9 @@
 from panda3d.core import NodePath, LPoint3f, ShadeModelAttrib
 from typing import Tuple, Generator
 
+from lighting import LightBindings
+from spatial import SpatialIndex
+
 GRAVITY = 0.01
 
 class CustomObject3D:
@@ -10,13 +13,17 @@ class CustomObject3D:
     def __init__(self, model: NodePath, position: Tuple[float, float, float],
                  parent: NodePath, scale: Tuple[float, float, float] = (1, 1, 1),
                  is_flat: bool = False, emmits_light: bool = False, light_color: Tuple[float, float, float] = None,
-                 light_color_temperature: float = None, light_distance_threshold: float = 0):
+                 light_color_temperature: float = None, light_distance_threshold: float = 0,
+                 spatial_index: SpatialIndex = None, light_bindings: LightBindings = None):
 
         self.model = model
         self.position = position
         self.relative_position = [0, 0, 0]
         self.scale = scale
         self.parent = parent
+        self.spatial_index = spatial_index
+        # Shared by all lights, so that the number of lights on each node is limited
+        self.light_bindings = light_bindings
         self.velocity = [0, 0, 0]
         self.gravity = GRAVITY
         self.model.reparentTo(parent)
@@ -34,6 +41,11 @@ class CustomObject3D:
     def set_pos(self, pos_x, pos_y, pos_z):
         self.model.setPos(pos_x, pos_y, pos_z)
         self.position = (pos_x, pos_y, pos_z)
+        self.update_spatial_index()
+
+    def update_spatial_index(self):
+        if self.spatial_index is not None:
+            self.spatial_index.move(self.model, self.model.getPos())
     
     def move(self):
         offset = self.velocity
@@ -43,6 +55,7 @@ class CustomObject3D:
         self.relative_position = [self.relative_position[i] + offset[i] for i in range(3)]
         if self.pn is not None:
             self.pn.setPos(self.model.getPos())
+        self.update_spatial_index()
 
     def update(self):
         self.move()
@@ -52,8 +65,4 @@ class CustomObject3D:
         self.model.setLight(light)
     
     def get_light_surroundings(self, distance_threshold: float) -> Generator[NodePath, None, None]:
-        for child in self.parent.children:
-            # To make sure that the light only affects objects within the same floor
-            # This also assumes the objects to be lit are above the light (the light is on the floor)
-            if self.model.get_distance(child) < distance_threshold:
-                yield child
\ No newline at end of file
+        yield from self.spatial_index.query_radius(self.model.getPos(), distance_threshold)
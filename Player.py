@@ -1,7 +1,9 @@
 from CustomObject3D import CustomObject3D
 from panda3d.core import *
-from typing import Generator, Tuple
+from typing import Generator, List, Tuple
 from labyrinth import Labyrinth, Parallelepiped
+from lighting import LightBindings
+from spatial import SpatialIndex
 from common import *
 
 N_LIGHTS = 1
@@ -15,11 +17,14 @@ class Player(CustomObject3D):
     ROTATION_SPEED = 20
     
     def __init__(self, model: NodePath, position: Tuple[float, float, float],
-                 parent: NodePath, scale: Tuple[float, float, float] = (1, 1, 1)):
+                 parent: NodePath, scale: Tuple[float, float, float] = (1, 1, 1), spatial_index: SpatialIndex = None,
+                 light_bindings: LightBindings = None):
         
-        super().__init__(model, position, parent, scale, is_flat=True)
+        super().__init__(model, position, parent, scale, is_flat=True, spatial_index=spatial_index, light_bindings=light_bindings)
         self.is_on_ground = False
         self.lights = [self.generate_light() for _ in range(N_LIGHTS)]
+        # The lights that were put, and where the player was when putting each one
+        self.placed_lights: List[Tuple[NodePath, Tuple[float, float, float]]] = []
         self.rotation = 0
     
     def update(self):
@@ -56,15 +61,17 @@ class Player(CustomObject3D):
         light_position = (self.position[0], self.position[1], self.position[2] + Labyrinth.DIMS_WALL_HEIGHT / 2)
         pn.setPos(light_position)
        
-        for node_to_illuminate in self.get_light_surroundings(distance_threshold=LIGHT_DISTANCE_THRESHOLD):
-            node_to_illuminate.setLight(pn)
-            node_to_illuminate.show()
+        self.light_bindings.update(pn, self.get_light_surroundings(distance_threshold=LIGHT_DISTANCE_THRESHOLD))
+        self.placed_lights.append((pn, tuple(self.model.getPos())))
 
-    def get_light_surroundings(self, distance_threshold: float) -> Generator[NodePath, None, None]:
-        for child in self.parent.children:
-            # To make sure that the light only affects objects within the same floor
-            # This also assumes the objects to be lit are above the light (the light is on the floor)
-            height_difference = child.getZ() - self.model.getZ()
-            if self.model.get_distance(child) < distance_threshold and height_difference <= Labyrinth.DIMS_WALL_HEIGHT and height_difference >= -Labyrinth.DIMS_FLOOR_HEIGHT:
-                yield child
+    def bind_placed_lights(self):
+        """Set the placed lights on the nodes around them again, such as the nodes of a floor that was unloaded and loaded back."""
+        for pn, position in self.placed_lights:
+            self.light_bindings.update(pn, self.get_light_surroundings(distance_threshold=LIGHT_DISTANCE_THRESHOLD, position=position))
 
+    def get_light_surroundings(self, distance_threshold: float, position: Tuple[float, float, float] = None) -> Generator[NodePath, None, None]:
+        """Get the nodes around the player, or around `position`."""
+        position = position if position is not None else self.model.getPos()
+        # To make sure that the light only affects objects within the same floor
+        # This also assumes the objects to be lit are above the light (the light is on the floor)
+        yield from self.spatial_index.query_radius(position, distance_threshold, height_range=(-Labyrinth.DIMS_FLOOR_HEIGHT, Labyrinth.DIMS_WALL_HEIGHT))
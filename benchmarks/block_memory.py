@@ -0,0 +1,50 @@
+"""
+Benchmark of the memory used per block, comparing the columnar `BlockTable` against one Python object per block.
+The vertices are measured separately, since the objects used to keep them around once generated.
+
+Run from the repository root:
+
+    python -m benchmarks.block_memory
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+
+from benchmarks.maps import grid_map
+from labyrinth import Labyrinth
+
+
+def traced_size(build) -> tuple:
+    """Get what `build` returns, along with the memory that remains allocated by it."""
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.block_memory')
+    parser.add_argument('--size', type=int, default=200, help='width and depth of the generated map, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated map')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        labyrinth = Labyrinth.from_map_string(grid_map(args.size, args.size, args.floors))
+    table = labyrinth.block_table
+    n_blocks = len(labyrinth.blocks)
+
+    blocks, objects_size = traced_size(table.to_blocks)
+    _, objects_vertices_size = traced_size(lambda: [block.get_vertices() for block in blocks])
+    del blocks
+
+    table_size = table.nbytes
+    table.bake_vertices()
+    table_vertices_size = table.vertices.nbytes
+
+    print(f'{n_blocks} blocks ({len(table)} including the merged parts)')
+    print(f'{"storage":>10} {"blocks (MiB)":>13} {"per block (B)":>14} {"+ vertices (MiB)":>17} {"per block (B)":>14}')
+    for storage, size, vertices_size in (('objects', objects_size, objects_vertices_size), ('table', table_size, table_vertices_size)):
+        total_size = size + vertices_size
+        print(f'{storage:>10} {size / 2**20:>13.2f} {size / n_blocks:>14.0f} {total_size / 2**20:>17.2f} {total_size / n_blocks:>14.0f}')
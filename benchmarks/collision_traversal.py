@@ -0,0 +1,83 @@
+"""
+Benchmark of the collision traversal per frame, comparing one collision node per block against the collision hierarchy
+(a bounding volume hierarchy for each floor and type of block). The player's capsule is moved to random positions over the map.
+Both must find the same collisions.
+
+Run from the repository root:
+
+    python -m benchmarks.collision_traversal
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from panda3d.core import *
+
+from benchmarks.maps import grid_map
+from common import collision_name, generateCollisionHierarchy, group_blocks_for_collisions
+from labyrinth import Labyrinth
+
+
+def build_per_block(labyrinth: Labyrinth) -> NodePath:
+    root = NodePath('Labyrinth')
+    for block in labyrinth.blocks:
+        collider_node = CollisionNode(collision_name(block))
+        center = Point3(block.position[0] + block.width / 2, block.position[1] + block.depth / 2, block.position[2] + block.height / 2)
+        collider_node.addSolid(CollisionBox(center, block.width / 2, block.depth / 2, block.height / 2))
+        root.attachNewNode(collider_node)
+    return root
+
+
+def build_hierarchy(labyrinth: Labyrinth) -> NodePath:
+    root = NodePath('Labyrinth')
+    for (floor_index, node_name), blocks in group_blocks_for_collisions(labyrinth.blocks).items():
+        generateCollisionHierarchy(blocks, f'labyrinth_collisions_{floor_index}_{node_name}', node_name).reparentTo(root)
+    return root
+
+
+def time_traversal(root: NodePath, positions: list) -> tuple:
+    """Get the average traversal time, and the collisions found at each position, by name."""
+    player = root.attachNewNode('Player')
+    player_collider_node = CollisionNode('Player')
+    player_collider_node.addSolid(CollisionCapsule(0, 0, 1, 0, 0, 2, 1))
+    player_collider = player.attachNewNode(player_collider_node)
+
+    traverser = CollisionTraverser()
+    queue = CollisionHandlerQueue()
+    traverser.addCollider(player_collider, queue)
+
+    collisions = []
+    total_time = 0
+    for position in positions:
+        player.setPos(position)
+        start = time.perf_counter()
+        traverser.traverse(root)
+        total_time += time.perf_counter() - start
+        collisions.append(sorted(entry.getIntoNode().getName() for entry in queue.entries))
+
+    player.removeNode()
+    return total_time / len(positions), collisions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.collision_traversal')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 40, 100], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    parser.add_argument('--frames', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f'{"map":>12} {"blocks":>8} {"per-block (ms)":>15} {"hierarchy (ms)":>15} {"speedup":>8}')
+    for size in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(grid_map(size, size, args.floors))
+
+        rng = random.Random(0)
+        positions = [(rng.uniform(0, labyrinth.width), rng.uniform(0, labyrinth.depth), rng.uniform(0, labyrinth.height)) for _ in range(args.frames)]
+
+        per_block_time, per_block_collisions = time_traversal(build_per_block(labyrinth), positions)
+        hierarchy_time, hierarchy_collisions = time_traversal(build_hierarchy(labyrinth), positions)
+        assert per_block_collisions == hierarchy_collisions, 'the collision hierarchy finds different collisions'
+
+        print(f'{f"{size}x{size}x{args.floors}":>12} {len(labyrinth.blocks):>8} {1000 * per_block_time:>15.3f} {1000 * hierarchy_time:>15.3f} {per_block_time / hierarchy_time:>7.1f}x')
@@ -0,0 +1,107 @@
+"""
+Benchmark of rendering the labyrinth through the flashlight's post-processing pass below the window's resolution.
+The scene is rendered into the FilterManager's buffers, lit by the shader generator, and upscaled and sharpened
+by the flashlight shader into an offscreen window, as in the game. It times the frames at a few fixed render scales,
+and then lets a `ResolutionScaler` choose the scale to hold the target frame rate, reporting the scale it settled on
+and the frame times once it did.
+
+Run from the repository root:
+
+    python -m benchmarks.dynamic_resolution
+"""
+import argparse
+import time
+
+from panda3d.core import *
+
+parser = argparse.ArgumentParser('benchmarks.dynamic_resolution')
+parser.add_argument('--map', type=str, default='maps/main.map', help='the map file to render')
+parser.add_argument('--resolution', type=str, default='1920x1080', help='size of the window')
+parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5], help='fixed render scales to time')
+parser.add_argument('--target-fps', type=float, default=30, help='frame rate that the resolution scaler should hold')
+parser.add_argument('--frames', type=int, default=20, help='number of frames timed at each fixed scale')
+parser.add_argument('--scaled-frames', type=int, default=300, help='number of frames rendered with the resolution scaler')
+args = parser.parse_args()
+
+loadPrcFileData('', f'''
+window-type offscreen
+audio-library-name null
+sync-video false
+win-size {args.resolution.replace('x', ' ')}
+''')
+
+from direct.filter.FilterManager import FilterManager
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.flashlight_fill import SHADER_FRAGMENT, SHADER_VERTEX
+from benchmarks.labyrinth_render import build_labyrinth, time_frames
+from labyrinth import Labyrinth
+from lighting import flicker_noise
+from resolution import RESOLUTION_SHARPNESS, ResolutionScaler
+
+
+def setup_filter(base: ShowBase):
+    base.render.setShaderAuto()
+    base.render.setAttrib(AuxBitplaneAttrib.make(AuxBitplaneAttrib.ABO_aux_normal))
+    manager = FilterManager(base.win, base.cam)
+    tex, dtex, ntex = Texture(), Texture(), Texture()
+    quad = manager.renderSceneInto(colortex=tex, depthtex=dtex, auxtex=ntex)
+    with open(SHADER_VERTEX) as vertex_file, open(SHADER_FRAGMENT) as fragment_file:
+        quad.setShader(Shader.make(Shader.SL_GLSL, vertex_file.read(), fragment_file.read()))
+    quad.setShaderInputs(
+        tex=tex,
+        dtex=dtex,
+        ntex=ntex,
+        u_mouse=(0, 0),
+        u_resolution=tuple(base.win.getSize()),
+        u_time=1.0,
+        lightRadius=0.5,
+        lightPower=1.0,
+        lightFlickerRatio=0.0,
+        lightFlickerNoise=float(flicker_noise(1.0)),
+        u_sharpness=0.0,
+    )
+    return manager, quad
+
+
+def set_scale(manager: FilterManager, quad: NodePath, scale: float):
+    # The same as `ExplorerApp.set_render_scale`
+    manager.sizes[0] = (scale, 1, 1)
+    manager.resizeBuffers()
+    quad.setShaderInput('u_sharpness', RESOLUTION_SHARPNESS if scale < 1 else 0.0)
+
+
+if __name__ == '__main__':
+    base = ShowBase()
+    base.disableMouse()
+    labyrinth = Labyrinth.from_map_file(args.map)
+    build_labyrinth(base, labyrinth, baked=True)
+    base.render.attachNewNode(DirectionalLight('light')).setHpr(30, -60, 0)
+    base.render.setLight(base.render.find('light'))
+    base.camera.setPos(0, -1.5 * max(labyrinth.width, labyrinth.depth), labyrinth.height + max(labyrinth.width, labyrinth.depth))
+    base.camera.lookAt(0, 0, 0)
+    manager, quad = setup_filter(base)
+    print(f'renderer: {base.win.getGsg().getDriverRenderer()}, window {args.resolution}')
+
+    print(f'{"scale":>6} {"scene size":>11} {"frame (ms)":>11}')
+    for scale in args.scales:
+        set_scale(manager, quad, scale)
+        frame_time = time_frames(base, args.frames)
+        width, height = manager.buffers[0].getSize()
+        print(f'{scale:>6.2f} {f"{width}x{height}":>11} {1000 * frame_time:>11.2f}')
+
+    set_scale(manager, quad, 1.0)
+    scaler = ResolutionScaler(target_fps=args.target_fps)
+    frame_times = []
+    last_change = 0
+    for frame in range(args.scaled_frames):
+        start = time.perf_counter()
+        base.graphicsEngine.renderFrame()
+        frame_times.append(time.perf_counter() - start)
+        if scaler.update(frame_times[-1]):
+            set_scale(manager, quad, scaler.scale)
+            last_change = frame + 1
+
+    settled = sorted(frame_times[last_change + 1:]) or [float('nan')]
+    print(f'target {args.target_fps:.0f} fps ({1000 / args.target_fps:.1f} ms): settled on scale {scaler.scale:.2f} after {last_change} frames, '
+          f'frame p50 {1000 * settled[len(settled) // 2]:.2f} ms, p95 {1000 * settled[int(0.95 * (len(settled) - 1))]:.2f} ms')
@@ -0,0 +1,176 @@
+"""
+Benchmark of the flashlight's post-processing shader, with the flicker noise computed for every pixel
+(10 octaves of value noise in the fragment shader, as the game used to) versus once per frame by `flicker_noise`
+and passed to the shader as a uniform. A fullscreen quad is shaded into an offscreen buffer at each resolution,
+so the frame time is dominated by the fragment shader (under software GL, its ALU cost).
+It also compares the two shaders' outputs at many times: the noise hashes with `fract(sin(x) * 43758.5453)`, which amplifies
+the last bits of `sin`, so they only match where the GPU's `sin` rounds like NumPy's (GPUs also differ from each other there).
+
+Run from the repository root:
+
+    python -m benchmarks.flashlight_fill
+"""
+import argparse
+
+import numpy as np
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.labyrinth_render import time_frames
+from lighting import FLICKER_GAIN, FLICKER_LACUNARITY, FLICKER_OCTAVES, FLICKER_OFFSET, flicker_noise
+
+
+SHADER_VERTEX = 'shaders/flashlight.vert'
+SHADER_FRAGMENT = 'shaders/flashlight.frag'
+
+# The flicker noise as the flashlight shader used to compute it for every pixel
+PER_PIXEL_FBM = f'''
+const int fbmNFuncs = {FLICKER_OCTAVES};
+const float fbmLacunarity = {FLICKER_LACUNARITY:.1f};
+const float fbmGain = {FLICKER_GAIN:.1f};
+const float fbmOffset = {FLICKER_OFFSET:.1f};
+
+float random(vec2 st) {{
+    return fract(sin(dot(st.xy, vec2(12.9898,78.233))) * 43758.5453123);
+}}
+
+float bilinearInterpolation(float v00, float v10, float v01, float v11, vec2 st) {{
+    float f1 = .01;
+    float f2 = 1. - f1;
+    float vx0 = mix(v00, v10, smoothstep(f1, f2, st.x));
+    float vx1 = mix(v01, v11, smoothstep(f1, f2, st.x));
+    return mix(vx0, vx1, smoothstep(f1, f2, st.y));
+}}
+
+float noise(vec2 st, float interval) {{
+    vec2 stStep = interval * floor(st / interval);
+    vec2 noiseInterp = fract(st / interval);
+    float random00 = random(stStep);
+    float random10 = random(vec2(stStep.x + interval, stStep.y));
+    float random01 = random(vec2(stStep.x, stStep.y + interval));
+    float random11 = random(stStep + interval);
+    return bilinearInterpolation(random00, random10, random01, random11, noiseInterp);
+}}
+
+float fbm(vec2 st, float lacunarity, float gain) {{
+    float res = 0.;
+    float frequency = 1.;
+    float amplitude = 1.;
+    for (int i = 0; i < fbmNFuncs; i++) {{
+        res += amplitude * (noise(st, 1. / frequency));
+        frequency *= lacunarity;
+        amplitude *= gain;
+    }}
+    return res;
+}}
+
+'''
+
+
+def per_pixel_fragment(fragment: str) -> str:
+    """The flashlight fragment shader, with the flicker noise computed in it instead of taken from the uniform."""
+    fragment = fragment.replace('vec3 filledCircle', PER_PIXEL_FBM + 'vec3 filledCircle', 1)
+    return fragment.replace('mix(1.0, lightFlickerNoise,', 'mix(1.0, fbm(vec2(u_time, 0), fbmLacunarity, fbmGain) - fbmOffset,')
+
+
+def make_texture(name: str, width: int, height: int, color: tuple) -> Texture:
+    texture = Texture(name)
+    texture.setup2dTexture(width, height, Texture.T_unsigned_byte, Texture.F_rgba)
+    texture.setClearColor(color)
+    return texture
+
+
+def make_quad(base: ShowBase, width: int, height: int):
+    """Create an offscreen buffer of the given size with a fullscreen quad in front of its camera."""
+    output = Texture('output')
+    buffer = base.win.makeTextureBuffer(f'fill_{width}x{height}', width, height, output)
+    scene = NodePath('scene')
+    lens = OrthographicLens()
+    lens.setFilmSize(2, 2)
+    lens.setNearFar(-1, 1)
+    camera = scene.attachNewNode(Camera('camera', lens))
+    buffer.makeDisplayRegion().setCamera(camera)
+
+    card = CardMaker('quad')
+    card.setFrameFullscreenQuad()
+    quad = scene.attachNewNode(card.generate())
+    quad.setShaderInputs(
+        tex=make_texture('tex', width, height, (0.3, 0.2, 0.1, 1)),
+        dtex=make_texture('dtex', width, height, (0.9, 0.9, 0.9, 1)),
+        ntex=make_texture('ntex', width, height, (0, 0.2, 0, 1)),
+        u_mouse=(0, 0),
+        u_resolution=(width, height),
+        u_time=0.0,
+        lightRadius=2.0,
+        lightPower=1.0,
+        lightFlickerRatio=1.0,
+        lightFlickerNoise=float(flicker_noise(0.0)),
+    )
+    return buffer, output, quad
+
+
+def set_time(quad: NodePath, shader_time: float):
+    quad.setShaderInput('u_time', shader_time)
+    quad.setShaderInput('lightFlickerNoise', float(flicker_noise(shader_time)))
+
+
+def render_pixels(base: ShowBase, buffer: GraphicsOutput, output: Texture) -> np.ndarray:
+    base.graphicsEngine.renderFrame()
+    base.graphicsEngine.extractTextureData(output, buffer.getGsg())
+    return np.frombuffer(output.getRamImage(), dtype=np.uint8).astype(np.int16)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.flashlight_fill')
+    parser.add_argument('--resolutions', type=str, nargs='+', default=['1920x1080', '3840x2160'])
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=200, help='number of times at which the outputs are compared')
+    parser.add_argument('--duration', type=float, default=600, help='the outputs are compared at times (in seconds since the start) up to this one')
+    args = parser.parse_args()
+
+    base = ShowBase()
+    with open(SHADER_VERTEX) as vertex_file, open(SHADER_FRAGMENT) as fragment_file:
+        vertex, fragment = vertex_file.read(), fragment_file.read()
+    shaders = {
+        'per pixel': Shader.make(Shader.SL_GLSL, vertex, per_pixel_fragment(fragment)),
+        'per frame': Shader.make(Shader.SL_GLSL, vertex, fragment),
+    }
+    print(f'renderer: {base.win.getGsg().getDriverRenderer()}')
+
+    # The flicker is the same for every pixel, so a small quad is enough to compare the outputs
+    buffer, output, quad = make_quad(base, 64, 36)
+    compare_times = np.linspace(0, args.duration, args.samples)
+    outputs = {}
+    for name, shader in shaders.items():
+        quad.setShader(shader)
+        outputs[name] = []
+        for shader_time in compare_times:
+            set_time(quad, shader_time)
+            outputs[name].append(render_pixels(base, buffer, output))
+    base.graphicsEngine.removeWindow(buffer)
+    differences = [np.abs(per_pixel - per_frame).max() for per_pixel, per_frame in zip(outputs['per pixel'], outputs['per frame'])]
+    print(f'identical outputs: {sum(difference == 0 for difference in differences)}/{len(differences)} times in {args.duration:.0f} s, '
+          f'largest difference {max(differences)}/255')
+
+    print(f'{"resolution":>11} {"flicker":>10} {"frame (ms)":>11} {"Mpixels/s":>10}')
+    for resolution in args.resolutions:
+        width, height = map(int, resolution.split('x'))
+        buffer, output, quad = make_quad(base, width, height)
+        set_time(quad, 1.0)
+
+        frame_times = {}
+        for name, shader in shaders.items():
+            quad.setShader(shader)
+            frame_times[name] = time_frames(base, args.frames)
+            print(f'{resolution:>11} {name:>10} {1000 * frame_times[name]:>11.2f} {width * height / frame_times[name] / 1e6:>10.1f}')
+        print(f'{"":>11} {"speedup":>10} {frame_times["per pixel"] / frame_times["per frame"]:>10.1f}x')
+
+        base.graphicsEngine.removeWindow(buffer)
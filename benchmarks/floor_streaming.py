@@ -0,0 +1,113 @@
+"""
+Benchmark of streaming the floors of a tall generated map with the `FloorStreamer`, versus building all of them at startup.
+It times building every floor's render and collision nodes up front, and only the floors around the player's, which is what
+streaming builds before the first frame. Then the player walks from the bottom floor to the top, one floor every few frames,
+while the streamer builds the floors on its thread and keeps them under the memory budget: it reports the main thread's
+time per frame spent in `update` (which attaches the built floors) and the most memory that the loaded floors took.
+
+Run from the repository root:
+
+    python -m benchmarks.floor_streaming
+"""
+import argparse
+import contextlib
+import gc
+import io
+import time
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type none
+audio-library-name null
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.maps import generate_map
+from labyrinth import Labyrinth
+from spatial import SpatialIndex
+from streaming import FloorStreamer, build_floor_collisions, build_floor_geometry, geometry_nbytes
+
+
+def floor_blocks(labyrinth: Labyrinth) -> dict:
+    blocks = {}
+    for idx, block in enumerate(labyrinth.blocks):
+        blocks.setdefault(block.floor_index, []).append((idx, block))
+    return blocks
+
+
+def build_floor(blocks: list, floor_index: int):
+    geometry = build_floor_geometry(blocks.get(floor_index, []), baked=True, indexed=False, cull_hidden_faces=True)
+    return [node for node, *_ in geometry], build_floor_collisions(blocks.get(floor_index, []))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.floor_streaming')
+    parser.add_argument('--size', type=int, default=30, help='width and depth of the generated map, in cells')
+    parser.add_argument('--floors', type=int, default=12, help='number of floors of the generated map')
+    parser.add_argument('--radius', type=int, default=1, help='number of floors above and below the player\'s that are always loaded')
+    parser.add_argument('--budget', type=float, default=4, help='memory budget of the loaded floors, in MB')
+    parser.add_argument('--frames-per-floor', type=int, default=20, help='number of frames that the player spends on each floor')
+    args = parser.parse_args()
+
+    base = ShowBase()
+    with contextlib.redirect_stdout(io.StringIO()):
+        labyrinth = Labyrinth.from_map_string(generate_map(args.size, args.size, args.floors))
+    labyrinth.block_table.bake_vertices()
+    blocks = floor_blocks(labyrinth)
+    n_floors = labyrinth.n_floors + 1
+    print(f'map: {args.size}x{args.size}x{args.floors}, {len(labyrinth.blocks)} blocks')
+
+    gc.collect()
+    start = time.perf_counter()
+    all_floors = [build_floor(blocks, floor_index) for floor_index in range(n_floors)]
+    eager_time = time.perf_counter() - start
+    total_bytes = sum(geometry_nbytes(nodes) for nodes, _ in all_floors)
+    del all_floors
+
+    root = base.render.attachNewNode('labyrinth')
+    attached = {}
+
+    def attach(floor_index, floor):
+        nodes, collisions = floor
+        for node in nodes + collisions:
+            node.reparentTo(root)
+        attached[floor_index] = nodes + collisions
+
+    def detach(floor_index):
+        for node in attached.pop(floor_index):
+            node.removeNode()
+
+    floor_height = SpatialIndex.FLOOR_HEIGHT
+    streamer = FloorStreamer(base.taskMgr,
+        floor_boxes=[(Point3(0, 0, floor_index * floor_height), Point3(labyrinth.width, labyrinth.depth, (floor_index + 1) * floor_height)) for floor_index in range(n_floors)],
+        build=lambda floor_index: build_floor(blocks, floor_index),
+        attach=attach,
+        detach=detach,
+        size=lambda floor: geometry_nbytes(floor[0]),
+        radius=args.radius,
+        budget_bytes=int(args.budget * 2**20))
+
+    gc.collect()
+    start = time.perf_counter()
+    streamer.load(streamer.floor_range(0))
+    streaming_time = time.perf_counter() - start
+
+    update_times = []
+    peak_bytes = streamer.loaded_bytes
+    for floor_index in range(n_floors):
+        for _ in range(args.frames_per_floor):
+            start = time.perf_counter()
+            streamer.update(floor_index)
+            update_times.append(time.perf_counter() - start)
+            base.taskMgr.step()
+            peak_bytes = max(peak_bytes, streamer.loaded_bytes)
+
+    update_times.sort()
+    print(f'{"threaded":>26}: {streamer.threaded}')
+    print(f'{"build all floors (ms)":>26}: {1000 * eager_time:.1f}')
+    print(f'{"build first floors (ms)":>26}: {1000 * streaming_time:.1f} ({eager_time / streaming_time:.1f}x faster)')
+    print(f'{"update p50 / max (ms)":>26}: {1000 * update_times[len(update_times) // 2]:.2f} / {1000 * update_times[-1]:.2f}')
+    print(f'{"all floors (MB)":>26}: {total_bytes / 2**20:.2f}')
+    print(f'{"peak loaded (MB)":>26}: {peak_bytes / 2**20:.2f} (budget {args.budget:.2f})')
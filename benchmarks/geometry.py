@@ -0,0 +1,106 @@
+"""
+Benchmark of the geometry generation, comparing the bulk path in `common.generateGeometry` against the original per-vertex writer loop.
+
+Run from the repository root:
+
+    python -m benchmarks.geometry
+"""
+import argparse
+import random
+import time
+
+from panda3d.core import *
+
+from common import NVP, generateGeometry, get_vertex_format
+from labyrinth import Parallelepiped, TEXTURE_WALL_TILING_FACTORS
+
+
+def generateGeometryLegacy(parallelepiped: Parallelepiped, name: str) -> GeomNode:
+    """The original implementation, which writes one vertex at a time with `GeomVertexWriter`s."""
+    vertex_data = GeomVertexData('v_' + name, get_vertex_format(), Geom.UHStatic)
+
+    vertices = parallelepiped.get_vertices()
+    vertex_data.setNumRows(len(vertices))
+
+    vertex_writer = GeomVertexWriter(vertex_data, 'vertex')
+    texcoord_writer = GeomVertexWriter(vertex_data, 'texcoord')
+    color_writer = GeomVertexWriter(vertex_data, 'color')
+    normal_writer = GeomVertexWriter(vertex_data, 'normal')
+    tangent_writer = GeomVertexWriter(vertex_data, 'tangent')
+    binormal_writer = GeomVertexWriter(vertex_data, 'binormal')
+
+    for vertex in vertices:
+        vertex_writer.addData3(*vertex[:NVP])
+        texcoord_writer.addData2(*vertex[NVP:NVP + 2])
+        color_writer.addData4(*vertex[NVP + 2:NVP + 6])
+        normal_writer.addData3(*vertex[NVP + 6:NVP + 9])
+        tangent_writer.addData3(*vertex[NVP + 9:NVP + 12])
+        binormal_writer.addData3(*vertex[NVP + 12:])
+
+    primitive = GeomTriangles(Geom.UHStatic)
+
+    for _ in range(len(vertices) // NVP):
+        primitive.add_next_vertices(NVP)
+        primitive.closePrimitive()
+
+    geom = Geom(vertex_data)
+    geom.addPrimitive(primitive)
+
+    node = GeomNode(name)
+    node.addGeom(geom)
+
+    return node
+
+
+def geometry_signature(node: GeomNode) -> tuple:
+    """Summarize everything that is uploaded to the GPU for a node, to check that two nodes are identical."""
+    signature = []
+    for geom in node.getGeoms():
+        vertex_data = geom.getVertexData()
+        arrays = tuple(bytes(memoryview(vertex_data.getArray(i))) for i in range(vertex_data.getNumArrays()))
+        primitives = []
+        for primitive in geom.getPrimitives():
+            indices = bytes(memoryview(primitive.getVertices())) if primitive.isIndexed() else None
+            primitives.append((primitive.getType(), primitive.getNumPrimitives(), primitive.getFirstVertex(), primitive.getNumVertices(), indices))
+        signature.append((vertex_data.getFormat(), arrays, tuple(primitives)))
+    return tuple(signature)
+
+
+def random_blocks(n_blocks: int, rng: random.Random):
+    return [
+        Parallelepiped(rng.uniform(0.5, 10), rng.uniform(0.5, 10), rng.uniform(0.5, 10),
+            color=(rng.random(), rng.random(), rng.random(), 1.0),
+            tiling_factors=TEXTURE_WALL_TILING_FACTORS if rng.random() < 0.5 else None)
+        for _ in range(n_blocks)
+    ]
+
+
+def time_generation(generate, blocks) -> float:
+    start = time.perf_counter()
+    for idx, block in enumerate(blocks):
+        generate(block, f'block_{idx}')
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.geometry')
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000, 5000], help='block counts to benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    # Check that both implementations produce exactly the same geometry
+    for idx, block in enumerate(random_blocks(50, rng)):
+        assert geometry_signature(generateGeometry(block, str(idx))) == geometry_signature(generateGeometryLegacy(block, str(idx))), 'Geometry mismatch'
+
+    print(f'{"blocks":>8} {"legacy (s)":>12} {"bulk (s)":>12} {"speedup":>8}')
+    for n_blocks in args.counts:
+        blocks = random_blocks(n_blocks, rng)
+        # Vertex generation is cached in the blocks, so it doesn't count towards the measurements
+        for block in blocks:
+            block.get_vertices()
+
+        legacy_time = time_generation(generateGeometryLegacy, blocks)
+        bulk_time = time_generation(generateGeometry, blocks)
+        print(f'{n_blocks:>8} {legacy_time:>12.4f} {bulk_time:>12.4f} {legacy_time / bulk_time:>7.1f}x')
@@ -0,0 +1,102 @@
+"""
+Benchmark of the grass under the labyrinth: a node for each of its tiles, each with its own texture stages (as the game used to),
+versus a single mesh from `generateGroundGeometry`, whose quads get larger away from the center.
+Both are textured, lit and fogged like in the game, and their frames are rendered into an offscreen buffer.
+
+Run from the repository root:
+
+    python -m benchmarks.grass
+"""
+import argparse
+import time
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.labyrinth_render import time_frames
+from common import generateGeometry, generateGroundGeometry
+from labyrinth import Parallelepiped
+from profiling import count_scene
+
+
+TILE_SIZE = 100
+HEIGHT = -30
+
+
+def make_texture(name: str) -> Texture:
+    texture = Texture(name)
+    texture.setup2dTexture(256, 256, Texture.T_unsigned_byte, Texture.F_rgb)
+    return texture
+
+
+def build_tiles(parent: NodePath, n_tiles: int, textures: tuple) -> NodePath:
+    color_texture, height_texture, normal_texture = textures
+    grass_np = parent.attachNewNode('grass_tiles')
+    for i in range(-n_tiles // 2, n_tiles // 2):
+        for j in range(-n_tiles // 2, n_tiles // 2):
+            grass = grass_np.attachNewNode(generateGeometry(Parallelepiped(TILE_SIZE, 0, TILE_SIZE), f'grass_{i}x{j}'))
+            grass.setPos(i * TILE_SIZE, j * TILE_SIZE, HEIGHT)
+            grass.setTexture(color_texture)
+            stage = TextureStage('Grass Height')
+            stage.setMode(TextureStage.MHeight)
+            grass.setTexture(stage, height_texture)
+            stage = TextureStage('Grass Normal')
+            stage.setMode(TextureStage.MNormal)
+            grass.setTexture(stage, normal_texture)
+    return grass_np
+
+
+def build_mesh(parent: NodePath, n_tiles: int, textures: tuple) -> NodePath:
+    color_texture, height_texture, normal_texture = textures
+    grass_np = parent.attachNewNode('grass_mesh')
+    grass = grass_np.attachNewNode(generateGroundGeometry(TILE_SIZE, n_tiles, 'grass'))
+    grass.setPos(-n_tiles / 2 * TILE_SIZE, -n_tiles / 2 * TILE_SIZE, HEIGHT)
+    grass.setTexture(color_texture)
+    height_stage = TextureStage('Grass Height')
+    height_stage.setMode(TextureStage.MHeight)
+    grass.setTexture(height_stage, height_texture)
+    normal_stage = TextureStage('Grass Normal')
+    normal_stage.setMode(TextureStage.MNormal)
+    grass.setTexture(normal_stage, normal_texture)
+    return grass_np
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.grass')
+    parser.add_argument('--tiles', type=int, nargs='+', default=[20, 40], help='numbers of tiles along each side of the grass')
+    parser.add_argument('--frames', type=int, default=100)
+    args = parser.parse_args()
+
+    base = ShowBase()
+    base.disableMouse()
+    base.render.setShaderAuto()
+    base.camera.setPos(0, -120, 60)
+    base.camera.lookAt(0, 0, HEIGHT)
+
+    textures = tuple(make_texture(name) for name in ('color', 'height', 'normal'))
+    light = base.render.attachNewNode(DirectionalLight('light'))
+    light.setHpr(0, -60, 0)
+    fog = Fog('fog')
+    fog.setExpDensity(0.002)
+
+    print(f'{"tiles":>8} {"grass":>6} {"build (ms)":>11} {"nodes":>6} {"geoms":>6} {"vertices":>9} {"frame (ms)":>11}')
+    for n_tiles in args.tiles:
+        for name, build in (('tiles', build_tiles), ('mesh', build_mesh)):
+            start = time.perf_counter()
+            grass_np = build(base.render, n_tiles, textures)
+            build_time = time.perf_counter() - start
+            for grass in grass_np.getChildren():
+                grass.setLight(light)
+                grass.setFog(fog)
+
+            frame_time = time_frames(base, args.frames)
+            scene = count_scene(grass_np)
+            print(f'{n_tiles:>8} {name:>6} {1000 * build_time:>11.2f} {scene["nodes"]:>6} {scene["geoms"]:>6} {scene["vertices"]:>9} {1000 * frame_time:>11.3f}')
+            grass_np.removeNode()
@@ -0,0 +1,94 @@
+"""
+Benchmark of the player's collision resolution per frame, comparing Panda3D's collision traverser (with the pusher and the
+labyrinth's collision hierarchy) against the grid collisions. The player walks and falls around the map from random positions.
+
+Run from the repository root:
+
+    python -m benchmarks.grid_collisions
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from panda3d.core import *
+
+from benchmarks.collision_traversal import build_hierarchy
+from benchmarks.maps import grid_map
+from grid_collisions import GridCollisions
+from labyrinth import Labyrinth
+
+
+PLAYER_SCALE = 0.5
+PLAYER_SPEED = 0.25
+
+
+def random_moves(labyrinth: Labyrinth, n_frames: int, seed: int = 0) -> list:
+    """Get a random walk of the player as `(start, velocity)` per frame, restarting at a new position every 50 frames."""
+    rng = random.Random(seed)
+    moves = []
+    for frame in range(n_frames):
+        if frame % 50 == 0:
+            start = (rng.uniform(0, labyrinth.width), rng.uniform(0, labyrinth.depth), rng.uniform(0, labyrinth.height))
+        moves.append((start if frame % 50 == 0 else None, (rng.uniform(-1, 1) * PLAYER_SPEED, rng.uniform(-1, 1) * PLAYER_SPEED, -0.1)))
+    return moves
+
+
+def time_traverser(labyrinth: Labyrinth, moves: list) -> float:
+    root = build_hierarchy(labyrinth)
+    player = root.attachNewNode('Player')
+    player.setScale(PLAYER_SCALE)
+    player_collider_node = CollisionNode('Player')
+    player_collider_node.addSolid(CollisionCapsule(0, 0, 1, 0, 0, 2, 1))
+    player_collider = player.attachNewNode(player_collider_node)
+
+    traverser = CollisionTraverser()
+    pusher = CollisionHandlerPusher()
+    pusher.addCollider(player_collider, player)
+    traverser.addCollider(player_collider, pusher)
+
+    total_time = 0
+    for start, velocity in moves:
+        if start is not None:
+            player.setPos(start)
+        start_time = time.perf_counter()
+        player.setPos(player.getPos() + LVector3f(*velocity))
+        traverser.traverse(root)
+        total_time += time.perf_counter() - start_time
+    return total_time / len(moves)
+
+
+def time_grid(labyrinth: Labyrinth, moves: list) -> float:
+    collisions = GridCollisions(labyrinth)
+    offset_min, offset_max = (-PLAYER_SCALE, -PLAYER_SCALE, 0), (PLAYER_SCALE, PLAYER_SCALE, 3 * PLAYER_SCALE)
+
+    total_time = 0
+    position = None
+    for start, velocity in moves:
+        if start is not None:
+            position = start
+        start_time = time.perf_counter()
+        new_position = tuple(position[axis] + velocity[axis] for axis in range(3))
+        position, _ = collisions.move(position, new_position, offset_min, offset_max)
+        total_time += time.perf_counter() - start_time
+    return total_time / len(moves)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.grid_collisions')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 40, 100], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    parser.add_argument('--frames', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'{"map":>12} {"blocks":>8} {"traverser (ms)":>15} {"grid (ms)":>10} {"speedup":>8}')
+    for size in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(grid_map(size, size, args.floors))
+        moves = random_moves(labyrinth, args.frames)
+
+        traverser_time = time_traverser(labyrinth, moves)
+        grid_time = time_grid(labyrinth, moves)
+
+        print(f'{f"{size}x{size}x{args.floors}":>12} {len(labyrinth.blocks):>8} {1000 * traverser_time:>15.3f} {1000 * grid_time:>10.3f} {traverser_time / grid_time:>7.1f}x')
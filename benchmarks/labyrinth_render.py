@@ -0,0 +1,106 @@
+"""
+Benchmark of the labyrinth rendering, comparing one node per block against the baked labyrinth (one node per floor and material),
+with and without indexed geometry (4 vertices per box face instead of 6).
+The frames are rendered into an offscreen buffer.
+
+Run from the repository root:
+
+    python -m benchmarks.labyrinth_render
+"""
+import argparse
+import time
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.maps import grid_map
+from common import generateBakedGeometry, generateGeometry, generateIndexedGeometry, group_blocks_for_baking
+from labyrinth import Labyrinth
+
+
+def build_labyrinth(base: ShowBase, labyrinth: Labyrinth, baked: bool, indexed: bool = False) -> NodePath:
+    labyrinth_np = base.render.attachNewNode('Labyrinth')
+    textures = {}
+
+    def set_material(node: NodePath, texture: str, is_transparent: bool):
+        if texture is not None:
+            if texture not in textures:
+                textures[texture] = base.loader.loadTexture(texture)
+            node.setTexture(textures[texture])
+        if is_transparent:
+            node.setTransparency(True)
+
+    if baked:
+        for (floor_index, texture, is_transparent, _), blocks in group_blocks_for_baking(labyrinth.blocks).items():
+            group_geom, _ = generateBakedGeometry(blocks, f'labyrinth_floor_{floor_index}', indexed)
+            set_material(labyrinth_np.attachNewNode(group_geom), texture, is_transparent)
+    else:
+        for idx, block in enumerate(labyrinth.blocks):
+            generate = generateIndexedGeometry if indexed else generateGeometry
+            block_node = labyrinth_np.attachNewNode(generate(block, f'labyrinth_block_{idx}'))
+            block_node.setPos(block.position)
+            set_material(block_node, block.texture, block.is_transparent())
+
+    labyrinth_np.setPos(-labyrinth.width / 2, -labyrinth.depth / 2, -labyrinth.height / 2)
+    return labyrinth_np
+
+
+def geometry_size(labyrinth_np: NodePath) -> int:
+    """Get the size in bytes of the vertex and index data of all the geometry under the node."""
+    size = 0
+    for node in labyrinth_np.findAllMatches('**/+GeomNode'):
+        for geom in node.node().getGeoms():
+            size += geom.getVertexData().getArray(0).getDataSizeBytes()
+            size += sum(geom.getPrimitive(i).getVertices().getDataSizeBytes() for i in range(geom.getNumPrimitives()))
+    return size
+
+
+def time_frames(base: ShowBase, n_frames: int) -> float:
+    # Warm up, so that textures and vertex buffers are already uploaded
+    base.graphicsEngine.renderFrame()
+    start = time.perf_counter()
+    for _ in range(n_frames):
+        base.graphicsEngine.renderFrame()
+    return (time.perf_counter() - start) / n_frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.labyrinth_render')
+    parser.add_argument('--map', type=str, default='maps/main.map', help='the map file to benchmark, besides the generated one')
+    parser.add_argument('--size', type=int, default=40, help='width and depth of the generated map, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated map')
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+
+    base = ShowBase()
+    base.disableMouse()
+
+    labyrinths = {
+        args.map: Labyrinth.from_map_file(args.map),
+        f'generated {args.size}x{args.size}x{args.floors}': Labyrinth.from_map_string(grid_map(args.size, args.size, args.floors)),
+    }
+
+    print(f'{"map":>24} {"mode":>14} {"nodes":>8} {"geoms":>8} {"geometry (KiB)":>15} {"build (s)":>10} {"frame (ms)":>11}')
+    for map_name, labyrinth in labyrinths.items():
+        for baked, indexed in ((False, False), (False, True), (True, False), (True, True)):
+            start = time.perf_counter()
+            labyrinth_np = build_labyrinth(base, labyrinth, baked, indexed)
+            build_time = time.perf_counter() - start
+
+            n_nodes = labyrinth_np.findAllMatches('**').getNumPaths()
+            n_geoms = sum(node.node().getNumGeoms() for node in labyrinth_np.findAllMatches('**/+GeomNode'))
+
+            base.camera.setPos(0, -1.5 * max(labyrinth.width, labyrinth.depth), labyrinth.height + max(labyrinth.width, labyrinth.depth))
+            base.camera.lookAt(0, 0, 0)
+            frame_time = time_frames(base, args.frames)
+
+            mode = ('baked' if baked else 'per-block') + ('+idx' if indexed else '')
+            print(f'{map_name:>24} {mode:>14} {n_nodes:>8} {n_geoms:>8} {geometry_size(labyrinth_np) / 1024:>15.1f} {build_time:>10.3f} {1000 * frame_time:>11.2f}')
+            labyrinth_np.removeNode()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the labyrinth startup with and without the compiled labyrinth cache.
+The cold start parses the map, generates the vertices and writes the cache, while the warm start loads the cache.
+
+Run from the repository root:
+
+    python -m benchmarks.map_cache
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.maps import grid_map
+from common import generateGeometry
+from labyrinth import CACHE_EXTENSION, Labyrinth
+
+
+def time_startup(map_path: str) -> tuple:
+    """Time loading the labyrinth, and then also generating the geometry of all of its blocks."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        labyrinth = Labyrinth.from_map_file(map_path)
+    load_time = time.perf_counter() - start
+
+    for idx, block in enumerate(labyrinth.blocks):
+        generateGeometry(block, f'labyrinth_block_{idx}')
+    return load_time, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.map_cache')
+    parser.add_argument('--map', type=str, default='maps/main.map', help='the map file to benchmark, besides the generated one')
+    parser.add_argument('--size', type=int, default=60, help='width and depth of the generated map, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated map')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        map_paths = {args.map: os.path.join(directory, os.path.basename(args.map))}
+        shutil.copy(args.map, map_paths[args.map])
+
+        generated_name = f'generated {args.size}x{args.size}x{args.floors}'
+        map_paths[generated_name] = os.path.join(directory, 'generated.map')
+        with open(map_paths[generated_name], 'wt') as map_file:
+            map_file.write(grid_map(args.size, args.size, args.floors))
+
+        print(f'{"map":>24} {"start":>6} {"load (s)":>10} {"+ geometry (s)":>15} {"cache size (KiB)":>17}')
+        for map_name, map_path in map_paths.items():
+            for start in ('cold', 'warm'):
+                if start == 'cold' and os.path.exists(map_path + CACHE_EXTENSION):
+                    os.remove(map_path + CACHE_EXTENSION)
+
+                load_time, total_time = time_startup(map_path)
+                cache_size = os.path.getsize(map_path + CACHE_EXTENSION) / 1024
+                print(f'{map_name:>24} {start:>6} {load_time:>10.3f} {total_time:>15.3f} {cache_size:>17.1f}')
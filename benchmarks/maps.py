@@ -0,0 +1,126 @@
+"""
+Synthetic labyrinth maps, to measure how things scale with the map size.
+Random maps can also be written to a file, from the repository root:
+
+    python -m benchmarks.maps 30 20 --floors 3 -o maps/generated.map
+"""
+import argparse
+import random
+
+
+def grid_map(width: int, depth: int, n_floors: int = 1, seed: int = 0) -> str:
+    """
+    Create a map of `width` x `depth` cells in each of the `n_floors` floors.
+    Every cell is walkable and each wall between two cells is randomly kept, removed or turned into a window.
+    """
+    rng = random.Random(seed)
+
+    floors = []
+    for floor_index in range(n_floors):
+        rows = []
+        for y in range(2 * depth + 1):
+            row = []
+            for x in range(2 * width + 1):
+                is_border = x in (0, 2 * width) or y in (0, 2 * depth)
+                if x % 2 == 0 and y % 2 == 0:
+                    row.append('+')
+                elif x % 2 == 1 and y % 2 == 1:
+                    row.append('S' if floor_index == 0 and (x, y) == (1, 1) else '.')
+                else:
+                    is_horizontal = y % 2 == 0
+                    roll = rng.random()
+                    if is_border or roll < 0.4:
+                        row.append('-' if is_horizontal else '|')
+                    elif roll < 0.5:
+                        row.append('_' if is_horizontal else '!')
+                    else:
+                        row.append('.')
+            rows.append(''.join(row))
+        floors.append('\n'.join(rows))
+
+    return '\n\n'.join(floors) + '\n'
+
+
+def generate_map(width: int, depth: int, n_floors: int = 1, density: float = 0.8, window_ratio: float = 0.1,
+                 pillar_ratio: float = 0.2, hole_ratio: float = 0.05, seed: int = 0) -> str:
+    """
+    Create a labyrinth of `width` x `depth` cells in each of the `n_floors` floors, as the text of a `.map` file.
+    Each floor starts as a maze where every cell is reachable, and each of its inner walls is kept with probability `density`
+    (the removed ones open up loops). Of the kept walls, a `window_ratio` of them are windows.
+    Corners without walls keep a free-standing pillar with probability `pillar_ratio`, and a `hole_ratio` of the cells
+    of the floors above the first are holes. The start is at the first cell of the first floor, and the finish is
+    on the outer wall at the opposite corner of the same floor.
+    """
+    rng = random.Random(seed)
+
+    floors = []
+    for floor_index in range(n_floors):
+        grid = [[' '] * (2 * width + 1) for _ in range(2 * depth + 1)]
+        for y in range(2 * depth + 1):
+            for x in range(2 * width + 1):
+                if x % 2 == 1 and y % 2 == 1:
+                    grid[y][x] = 'X' if floor_index > 0 and rng.random() < hole_ratio else '.'
+                elif x % 2 == 1 or y % 2 == 1:
+                    grid[y][x] = '-' if y % 2 == 0 else '|'
+
+        # Carve a maze with a randomized depth-first search, opening the wall between each cell and the one it came from
+        visited = [[False] * width for _ in range(depth)]
+        visited[0][0] = True
+        stack = [(0, 0)]
+        while stack:
+            cx, cy = stack[-1]
+            neighbours = [(cx + dx, cy + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if 0 <= cx + dx < width and 0 <= cy + dy < depth and not visited[cy + dy][cx + dx]]
+            if not neighbours:
+                stack.pop()
+                continue
+            nx, ny = rng.choice(neighbours)
+            visited[ny][nx] = True
+            grid[cy + ny + 1][cx + nx + 1] = '.'
+            stack.append((nx, ny))
+
+        # Thin out the inner walls, and turn some of the remaining ones into windows
+        for y in range(1, 2 * depth):
+            for x in range(1, 2 * width):
+                if grid[y][x] in ('-', '|'):
+                    if rng.random() >= density:
+                        grid[y][x] = '.'
+                    elif rng.random() < window_ratio:
+                        grid[y][x] = '_' if grid[y][x] == '-' else '!'
+
+        # Pillars on the corners that have walls next to them, and some free-standing ones
+        for y in range(0, 2 * depth + 1, 2):
+            for x in range(0, 2 * width + 1, 2):
+                is_border = x in (0, 2 * width) or y in (0, 2 * depth)
+                has_walls = any(0 <= x + dx <= 2 * width and 0 <= y + dy <= 2 * depth and grid[y + dy][x + dx] not in ('.', ' ')
+                    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)))
+                grid[y][x] = '+' if is_border or has_walls or rng.random() < pillar_ratio else '.'
+
+        if floor_index == 0:
+            grid[1][1] = 'S'
+            grid[2 * depth][2 * width - 1] = 'F'
+
+        floors.append('\n'.join(''.join(row) for row in grid))
+
+    return '\n\n'.join(floors) + '\n'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.maps', description='Generate a random labyrinth map.')
+    parser.add_argument('width', type=int, help='number of cells along X')
+    parser.add_argument('depth', type=int, help='number of cells along Y')
+    parser.add_argument('--floors', type=int, default=1, help='number of floors (default=1)')
+    parser.add_argument('--density', type=float, default=0.8, help='ratio of the maze\'s inner walls that are kept (default=0.8)')
+    parser.add_argument('--windows', type=float, default=0.1, help='ratio of the walls that are windows (default=0.1)')
+    parser.add_argument('--pillars', type=float, default=0.2, help='ratio of the corners without walls that have a pillar (default=0.2)')
+    parser.add_argument('--holes', type=float, default=0.05, help='ratio of the cells above the first floor that are holes (default=0.05)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', type=str, default=None, help='file to write the map to (default is the standard output)')
+    args = parser.parse_args()
+
+    map_str = generate_map(args.width, args.depth, args.floors, args.density, args.windows, args.pillars, args.holes, args.seed)
+    if args.output is not None:
+        with open(args.output, 'wt') as map_file:
+            map_file.write(map_str)
+    else:
+        print(map_str, end='')
@@ -0,0 +1,111 @@
+"""
+Benchmark of many spawned objects (tables and moving spiders), comparing a model loaded for each of them
+against the instances, batches and combined instances of the `ModelRegistry`.
+The frames are rendered into an offscreen buffer, with the spiders moving every frame.
+
+Run from the repository root:
+
+    python -m benchmarks.model_instancing
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+model-path .
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from mobs import Spider
+from models import ModelRegistry
+from objects import Table
+
+
+def random_transforms(n: int, area: float, scale: float, seed: int):
+    rng = np.random.default_rng(seed)
+    positions = np.column_stack([rng.uniform(-area, area, n), rng.uniform(-area, area, n), np.zeros(n)])
+    hprs = np.column_stack([rng.uniform(0, 360, n), np.full(n, 90.0), np.zeros(n)])
+    scales = np.full((n, 3), scale)
+    return positions, hprs, scales
+
+
+def build(base: ShowBase, mode: str, n: int, seed: int = 0):
+    """Get the root of the spawned objects, and the spider nodes to move."""
+    root = base.render.attachNewNode('objects')
+    tables = random_transforms(n, 50, 0.025, seed)
+    spiders = random_transforms(n, 50, Spider.SCALE, seed + 1)
+
+    if mode == 'load':
+        spider_nodes = []
+        for (positions, hprs, scales), path, nodes in ((tables, Table.MODEL_PATH, []), (spiders, Spider.MODEL_PATH, spider_nodes)):
+            for position, hpr, scale in zip(positions, hprs, scales):
+                model = base.loader.loadModel(path)
+                model.reparentTo(root)
+                model.setPosHprScale(*position, *hpr, *scale)
+                nodes.append(model)
+        return root, spider_nodes
+
+    models = ModelRegistry(base.loader)
+    if mode == 'instance':
+        models.instances(Table.MODEL_PATH, root, *tables)
+        return root, models.instances(Spider.MODEL_PATH, root, *spiders)
+
+    models.batch(Table.MODEL_PATH, root, *tables)
+    _, spider_nodes = models.combine(Spider.MODEL_PATH, root, *spiders)
+    return root, spider_nodes
+
+
+def count_geoms(root: NodePath) -> int:
+    """Count the Geoms that are drawn, which for a `RigidBodyCombiner` are the ones in its internal scene."""
+    n_geoms = 0
+    for node in root.findAllMatches('**/+GeomNode'):
+        if not any(isinstance(ancestor.node(), RigidBodyCombiner) for ancestor in node.getAncestors()):
+            n_geoms += node.node().getNumGeoms()
+    for combiner in root.findAllMatches('**/+RigidBodyCombiner'):
+        internal = NodePath(combiner.node().getInternalScene())
+        n_geoms += sum(node.node().getNumGeoms() for node in internal.findAllMatches('**/+GeomNode'))
+    return n_geoms
+
+
+def time_frames(base: ShowBase, spider_nodes: list, n_frames: int) -> float:
+    rng = random.Random(0)
+    base.graphicsEngine.renderFrame()
+    start = time.perf_counter()
+    for _ in range(n_frames):
+        for spider in spider_nodes:
+            spider.setPos(spider, rng.uniform(-1, 1), rng.uniform(-1, 1), 0)
+        base.graphicsEngine.renderFrame()
+    return (time.perf_counter() - start) / n_frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.model_instancing')
+    parser.add_argument('--counts', type=int, nargs='+', default=[50, 200], help='number of tables and of spiders')
+    parser.add_argument('--frames', type=int, default=30)
+    args = parser.parse_args()
+
+    base = ShowBase()
+    base.disableMouse()
+    base.camera.setPos(0, -150, 100)
+    base.camera.lookAt(0, 0, 0)
+
+    print(f'{"objects":>8} {"mode":>16} {"nodes":>7} {"geoms":>7} {"build (s)":>10} {"frame (ms)":>11}')
+    for count in args.counts:
+        for mode in ('load', 'instance', 'batch+combine'):
+            start = time.perf_counter()
+            root, spider_nodes = build(base, mode, count)
+            build_time = time.perf_counter() - start
+
+            n_nodes = root.findAllMatches('**').getNumPaths()
+            n_geoms = count_geoms(root)
+            frame_time = time_frames(base, spider_nodes, args.frames)
+            print(f'{2 * count:>8} {mode:>16} {n_nodes:>7} {n_geoms:>7} {build_time:>10.3f} {1000 * frame_time:>11.2f}')
+            root.removeNode()
@@ -0,0 +1,41 @@
+"""
+Benchmark of how the map parsing in `Labyrinth.from_map_string` scales with the map size.
+The time per cell should stay roughly constant, since parsing is linear in the size of the map.
+
+Run from the repository root:
+
+    python -m benchmarks.parsing
+    python -m benchmarks.parsing --sizes 10x10x1 100x100x5
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.maps import grid_map
+from labyrinth import Labyrinth
+
+
+def parse_size(size: str):
+    width, depth, n_floors = (int(dim) for dim in size.split('x'))
+    return width, depth, n_floors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.parsing')
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+        default=[(10, 10, 1), (50, 50, 2), (100, 100, 5), (200, 200, 10), (500, 500, 20)],
+        help='map sizes to benchmark, as WIDTHxDEPTHxFLOORS in cells')
+    args = parser.parse_args()
+
+    print(f'{"size":>12} {"cells":>10} {"blocks":>8} {"parse (s)":>10} {"per cell (us)":>14}')
+    for width, depth, n_floors in args.sizes:
+        map_str = grid_map(width, depth, n_floors)
+        n_cells = len(map_str)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(map_str)
+        parse_time = time.perf_counter() - start
+
+        print(f'{f"{width}x{depth}x{n_floors}":>12} {n_cells:>10} {len(labyrinth.blocks):>8} {parse_time:>10.3f} {1e6 * parse_time / n_cells:>14.2f}')
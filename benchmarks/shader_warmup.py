@@ -0,0 +1,120 @@
+"""
+Benchmark of the hitches caused by the shader generator, as moving lights are set on the labyrinth's nodes:
+each new combination of lights on a node needs a new shader, which is generated and compiled in the frame that first uses it.
+Shadow-casting point lights circle over a labyrinth of one node per block (lit by the shader generator, as in the game),
+bound to the nodes around them by `LightBindings`, once without warming up the shaders and once after `warm_up_shaders`.
+It reports the frames that took more than `HITCH_FACTOR` times the median frame, and the longest frame.
+Each run is in its own process, so that the second one doesn't reuse the shaders of the first.
+The shader generator's shaders are Cg, which not every renderer can compile (not software GL, or a Panda3D built without Cg):
+there, every run fails to compile them, each failure is a hitch, and warming up can't remove them.
+
+Run from the repository root:
+
+    python -m benchmarks.shader_warmup
+"""
+import argparse
+import json
+import math
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+''')
+
+
+HITCH_FACTOR = 2
+LIGHT_DISTANCE = 10
+SHADOW_RESOLUTION = 128
+
+
+def run(map_path: str, n_lights: int, n_frames: int, warm_up: bool) -> dict:
+    from direct.showbase.ShowBase import ShowBase
+
+    from benchmarks.labyrinth_render import build_labyrinth
+    from labyrinth import Labyrinth
+    from lighting import MAX_LIGHTS_PER_NODE, LightBindings
+    from shading import warm_up_shaders
+    from spatial import SpatialIndex
+
+    base = ShowBase()
+    base.disableMouse()
+    base.render.setShaderAuto()
+    labyrinth = Labyrinth.from_map_file(map_path)
+    labyrinth_np = build_labyrinth(base, labyrinth, baked=False)
+    labyrinth_np.setLight(base.render.attachNewNode(AmbientLight('ambient')))
+    base.camera.setPos(0, -1.5 * max(labyrinth.width, labyrinth.depth), labyrinth.height + max(labyrinth.width, labyrinth.depth))
+    base.camera.lookAt(0, 0, 0)
+
+    spatial_index = SpatialIndex()
+    for node in labyrinth_np.getChildren():
+        spatial_index.insert(node, node.getPos())
+    light_bindings = LightBindings()
+    lights = []
+    for idx in range(n_lights):
+        light = PointLight(f'light_{idx}')
+        light.setShadowCaster(True, SHADOW_RESOLUTION, SHADOW_RESOLUTION)
+        light.setAttenuation((1, 0, 1))
+        lights.append(labyrinth_np.attachNewNode(light))
+
+    warm_up_report = warm_up_shaders(base, labyrinth_np, lights, MAX_LIGHTS_PER_NODE) if warm_up else None
+    for _ in range(3):
+        base.graphicsEngine.renderFrame()
+
+    frame_times = []
+    for frame in range(n_frames):
+        start = time.perf_counter()
+        for idx, light in enumerate(lights):
+            # Each light circles around the labyrinth's center, on the first floor, at its own distance and speed
+            angle = 2 * math.pi * frame / n_frames * (idx + 1)
+            radius = (idx + 1) / (n_lights + 1) * min(labyrinth.width, labyrinth.depth) / 2
+            light.setPos(labyrinth.width / 2 + radius * math.cos(angle), labyrinth.depth / 2 + radius * math.sin(angle), 1)
+            light_bindings.update(light, spatial_index.query_radius(light.getPos(), LIGHT_DISTANCE))
+        base.graphicsEngine.renderFrame()
+        frame_times.append(time.perf_counter() - start)
+
+    frame_times = np.array(frame_times) * 1000
+    median = float(np.median(frame_times))
+    return {
+        'warm_up_seconds': warm_up_report['seconds'] if warm_up_report is not None else 0.0,
+        'median_ms': median,
+        'max_ms': float(frame_times.max()),
+        'hitches': int((frame_times > HITCH_FACTOR * median).sum()),
+    }
+
+
+def renderer() -> str:
+    from direct.showbase.ShowBase import ShowBase
+
+    base = ShowBase()
+    name = base.win.getGsg().getDriverRenderer()
+    base.destroy()
+    return name
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.shader_warmup')
+    parser.add_argument('--map', type=str, default='maps/main.map', help='the map file to render')
+    parser.add_argument('--lights', type=int, default=4, help='number of moving lights')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--run', choices=['cold', 'warm'], default=None, help='only do one run, and print its results as JSON')
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print(json.dumps(run(args.map, args.lights, args.frames, warm_up=args.run == 'warm')))
+        sys.exit(0)
+
+    print(f'renderer: {renderer()}')
+    print(f'{"shaders":>8} {"warm-up (s)":>12} {"median (ms)":>12} {"max (ms)":>9} {f"hitches (>{HITCH_FACTOR}x median)":>22}')
+    for mode in ('cold', 'warm'):
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.shader_warmup', '--map', args.map, '--lights', str(args.lights),
+            '--frames', str(args.frames), '--run', mode], capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f'{mode:>8} {result["warm_up_seconds"]:>12.2f} {result["median_ms"]:>12.2f} {result["max_ms"]:>9.2f} {result["hitches"]:>22}')
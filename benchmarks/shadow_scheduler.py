@@ -0,0 +1,134 @@
+"""
+Benchmark of the shadow passes as more lights are placed in the labyrinth, with every shadow buffer rendered in every frame (as Panda3D does)
+versus scheduled by `ShadowScheduler`. The lights are static, scattered over the labyrinth's first floor, and a few casters
+(standing in for the spiders) move around its center, so only the lights near them need their shadow maps updated.
+It reports the shadow buffers rendered per frame and the frame time.
+The shader generator's shadow buffers can't be created by every renderer (not by software GL), so the lights that have none
+get a stand-in: a cube map buffer of the same size, rendering the labyrinth's depth from the light, which is what a point light's shadow pass does.
+
+Run from the repository root:
+
+    python -m benchmarks.shadow_scheduler
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+sync-video false
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from benchmarks.labyrinth_render import build_labyrinth
+from labyrinth import Labyrinth
+from shadows import SHADOW_BUDGET, ShadowScheduler
+
+
+LIGHT_RADIUS = 10
+SHADOW_RESOLUTION = 128
+
+
+class StandInShadowScheduler(ShadowScheduler):
+    """Uses the stand-in buffers of the lights whose shadow buffers weren't created by the renderer."""
+
+    def __init__(self, *args, stand_ins: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stand_ins = stand_ins
+
+    def get_buffer(self, light: NodePath):
+        buffer = super().get_buffer(light)
+        return buffer if buffer is not None else self.stand_ins.get(light)
+
+
+def make_stand_in(base: ShowBase, light: NodePath) -> GraphicsOutput:
+    rig = light.attachNewNode('shadow_rig')
+    buffer = base.win.makeCubeMap(f'shadow_{light.getName()}', SHADOW_RESOLUTION, rig, PandaNode.getAllCameraMask(), False, FrameBufferProperties())
+    # Only the depth is rendered, as in Panda3D's shadow passes
+    state = RenderState.make(ColorWriteAttrib.make(ColorWriteAttrib.COff), LightAttrib.makeAllOff(), TextureAttrib.makeAllOff())
+    for camera in rig.findAllMatches('+Camera'):
+        camera.node().setInitialState(state)
+        camera.node().getLens().setNearFar(0.1, LIGHT_RADIUS)
+    return buffer
+
+
+def run(base: ShowBase, labyrinth: Labyrinth, labyrinth_np: NodePath, n_lights: int, casters: list, n_frames: int, scheduled: bool, budget: int) -> dict:
+    rng = np.random.default_rng(0)
+    lights, stand_ins = [], {}
+    for idx in range(n_lights):
+        light = PointLight(f'light_{idx}')
+        light.setShadowCaster(True, SHADOW_RESOLUTION, SHADOW_RESOLUTION)
+        light_np = labyrinth_np.attachNewNode(light)
+        light_np.setPos(rng.uniform(0, labyrinth.width), rng.uniform(0, labyrinth.depth), 1)
+        labyrinth_np.setLight(light_np)
+        lights.append(light_np)
+    # Once for the renderer to create the shadow buffers, if it can
+    base.graphicsEngine.renderFrame()
+    for light in lights:
+        if light.node().getShadowBuffer(base.win.getGsg()) is None:
+            stand_ins[light] = make_stand_in(base, light)
+
+    scheduler = StandInShadowScheduler(base.win.getGsg(), labyrinth_np, budget=budget, stand_ins=stand_ins) if scheduled else None
+    if scheduler is not None:
+        for light in lights:
+            scheduler.add(light, LIGHT_RADIUS)
+
+    frame_times, rendered = [], []
+    for frame in range(n_frames):
+        start = time.perf_counter()
+        for idx, caster in enumerate(casters):
+            angle = 2 * math.pi * frame / n_frames * (idx + 1)
+            caster.setPos(labyrinth.width / 2 + 3 * math.cos(angle), labyrinth.depth / 2 + 3 * math.sin(angle), 1)
+        if scheduler is not None:
+            rendered.append(len(scheduler.update([tuple(caster.getPos(labyrinth_np)) for caster in casters])))
+        else:
+            rendered.append(n_lights)
+        base.graphicsEngine.renderFrame()
+        frame_times.append(time.perf_counter() - start)
+
+    for light in lights:
+        labyrinth_np.clearLight(light)
+        light.node().setShadowCaster(False)
+        light.removeNode()
+    for buffer in stand_ins.values():
+        base.graphicsEngine.removeWindow(buffer)
+    return {
+        'buffers_per_frame': float(np.mean(rendered)),
+        'frame_ms': 1000 * float(np.mean(frame_times)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.shadow_scheduler')
+    parser.add_argument('--map', type=str, default='maps/main.map', help='the map file to render')
+    parser.add_argument('--lights', type=int, nargs='+', default=[1, 4, 16, 32], help='numbers of placed lights')
+    parser.add_argument('--casters', type=int, default=3, help='number of moving casters')
+    parser.add_argument('--budget', type=int, default=SHADOW_BUDGET, help='shadow buffers rendered per frame, at most')
+    parser.add_argument('--frames', type=int, default=100)
+    args = parser.parse_args()
+
+    base = ShowBase()
+    base.disableMouse()
+    base.render.setShaderAuto()
+    labyrinth = Labyrinth.from_map_file(args.map)
+    labyrinth_np = build_labyrinth(base, labyrinth, baked=True)
+    labyrinth_np.setLight(base.render.attachNewNode(AmbientLight('ambient')))
+    base.camera.setPos(0, -1.5 * max(labyrinth.width, labyrinth.depth), labyrinth.height + max(labyrinth.width, labyrinth.depth))
+    base.camera.lookAt(0, 0, 0)
+    casters = [base.loader.loadModel('smiley') for _ in range(args.casters)]
+    for caster in casters:
+        caster.reparentTo(labyrinth_np)
+        caster.setScale(0.5)
+    print(f'renderer: {base.win.getGsg().getDriverRenderer()}')
+
+    print(f'{"lights":>7} {"shadows":>10} {"buffers/frame":>14} {"frame (ms)":>11}')
+    for n_lights in args.lights:
+        for scheduled in (False, True):
+            result = run(base, labyrinth, labyrinth_np, n_lights, casters, args.frames, scheduled, args.budget)
+            print(f'{n_lights:>7} {"scheduled" if scheduled else "all":>10} {result["buffers_per_frame"]:>14.2f} {result["frame_ms"]:>11.2f}')
@@ -0,0 +1,63 @@
+"""
+Benchmark of the light surroundings queries, going through all of the labyrinth node's children versus the spatial index.
+The labyrinth blocks are empty nodes here, since only their positions matter for the queries.
+
+Run from the repository root:
+
+    python -m benchmarks.spatial_index
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from panda3d.core import NodePath
+
+from benchmarks.maps import grid_map
+from labyrinth import Labyrinth
+from spatial import SpatialIndex
+
+
+LIGHT_DISTANCE_THRESHOLD = 12
+
+
+def children_surroundings(parent: NodePath, light: NodePath, distance_threshold: float) -> list:
+    return [child for child in parent.children if light.get_distance(child) < distance_threshold]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.spatial_index')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 40, 100], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"map":>12} {"nodes":>8} {"children (ms)":>14} {"index (ms)":>11} {"speedup":>8}')
+    for size in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(grid_map(size, size, args.floors))
+
+        parent = NodePath('Labyrinth')
+        spatial_index = SpatialIndex()
+        for block in labyrinth.blocks:
+            block_node = parent.attachNewNode('block')
+            block_node.setPos(block.position)
+            spatial_index.insert(block_node, block.position)
+
+        rng = random.Random(0)
+        light = parent.attachNewNode('light')
+        positions = [(rng.uniform(0, labyrinth.width), rng.uniform(0, labyrinth.depth), rng.uniform(0, labyrinth.height)) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        for position in positions:
+            light.setPos(position)
+            children_surroundings(parent, light, LIGHT_DISTANCE_THRESHOLD)
+        children_time = (time.perf_counter() - start) / len(positions)
+
+        start = time.perf_counter()
+        for position in positions:
+            list(spatial_index.query_radius(position, LIGHT_DISTANCE_THRESHOLD))
+        index_time = (time.perf_counter() - start) / len(positions)
+
+        print(f'{f"{size}x{size}x{args.floors}":>12} {len(labyrinth.blocks):>8} {1000 * children_time:>14.3f} {1000 * index_time:>11.3f} {children_time / index_time:>7.1f}x')
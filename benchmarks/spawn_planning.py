@@ -0,0 +1,84 @@
+"""
+Benchmark of planning where the spiders and tables spawn, across generated maps of increasing size:
+going through the parts of every wall and rolling each side's spawns one at a time (as the game used to)
+versus `plan_spawns`, which gets every candidate site from the block table at once, and loading a cached plan.
+
+Run from the repository root:
+
+    python -m benchmarks.spawn_planning
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.maps import generate_map
+from labyrinth import Labyrinth, WallView
+from spawns import candidate_sites, load_or_plan_spawns, plan_spawns
+
+
+SPIDER_CHANCE = 0.2
+TABLE_CHANCE = 0.1
+TABLE_DISTANCE = 0.5
+
+
+def plan_each_wall(labyrinth: Labyrinth, seed: int) -> list:
+    """The spawns of each side of each wall, rolled one at a time."""
+    rng = random.Random(seed)
+    spawns = []
+    for block in labyrinth.blocks:
+        for wall in block.get_parts():
+            if not isinstance(wall, WallView):
+                continue
+            x, y, z = wall.position
+            sides = (
+                (wall.east_inside, (x + wall.width, y + wall.depth / 2), (x + wall.width + TABLE_DISTANCE, y + wall.depth / 2)),
+                (wall.west_inside, (x, y + wall.depth / 2), (x - TABLE_DISTANCE, y + wall.depth / 2)),
+                (wall.south_inside, (x + wall.width / 2, y + wall.depth), (x + wall.width / 2, y + wall.depth + TABLE_DISTANCE)),
+                (wall.north_inside, (x + wall.width / 2, y), (x + wall.width / 2, y - TABLE_DISTANCE)),
+            )
+            for is_inside, spider_position, table_position in sides:
+                if not is_inside:
+                    continue
+                if rng.random() < SPIDER_CHANCE:
+                    spawns.append(('spider', (*spider_position, z + wall.height / 2), (wall.width, wall.depth, wall.height)))
+                if rng.random() < TABLE_CHANCE:
+                    spawns.append(('table', (*table_position, z)))
+    return spawns
+
+
+def best_time(function, repeat: int) -> float:
+    gc.collect()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.spawn_planning')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 20, 40, 80], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs, of which the best time is kept')
+    args = parser.parse_args()
+
+    print(f'{"map":>10} {"sites":>8} {"per wall (ms)":>14} {"plan (ms)":>10} {"cached (ms)":>12} {"speedup":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                labyrinth = Labyrinth.from_map_string(generate_map(size, size, args.floors))
+            table = labyrinth.block_table
+            n_sites = len(candidate_sites(table)) // 2
+            cache_path = os.path.join(directory, f'{size}.spawns')
+            load_or_plan_spawns(table, 0, SPIDER_CHANCE, TABLE_CHANCE, cache_path)
+
+            per_wall_time = best_time(lambda: plan_each_wall(labyrinth, 0), args.repeat)
+            plan_time = best_time(lambda: plan_spawns(table, 0, SPIDER_CHANCE, TABLE_CHANCE), args.repeat)
+            cached_time = best_time(lambda: load_or_plan_spawns(table, 0, SPIDER_CHANCE, TABLE_CHANCE, cache_path), args.repeat)
+            print(f'{f"{size}x{size}x{args.floors}":>10} {n_sites:>8} {1000 * per_wall_time:>14.3f} {1000 * plan_time:>10.3f} {1000 * cached_time:>12.3f} {per_wall_time / plan_time:>7.1f}x')
@@ -0,0 +1,111 @@
+"""
+Benchmark of the spiders' update per frame, one spider at a time with `Spider.update` versus all at once with the `SpiderSwarm`,
+writing back the transforms of all the spiders that moved, or only of those in the view of a camera (as the game does).
+The spiders are spawned on random walls of a generated map, and registered in a spatial index as in the game.
+The camera looks down at the middle of the map from `--camera-distance` away (by default, the game's camera's initial zoom).
+
+Run from the repository root:
+
+    python -m benchmarks.spider_swarm
+"""
+import argparse
+import gc
+import random
+import time
+
+import numpy as np
+
+from panda3d.core import *
+
+loadPrcFileData('', '''
+window-type none
+audio-library-name null
+model-path .
+''')
+
+from direct.showbase.ShowBase import ShowBase
+
+from mobs import Spider, SpiderSwarm
+from models import ModelRegistry
+from spatial import SpatialIndex
+
+
+CAMERA_DISTANCE = 60
+
+
+def make_camera(root: NodePath, distance: float = CAMERA_DISTANCE) -> NodePath:
+    camera = root.attachNewNode(Camera('camera', PerspectiveLens()))
+    camera.setPos(150, 150 - distance * 0.7, distance * 0.7)
+    camera.lookAt(150, 150, 0)
+    return camera
+
+
+class Game:
+    """The parts of the game that the spiders use."""
+
+    def __init__(self, base: ShowBase):
+        self.loader = base.loader
+        self.models = ModelRegistry(base.loader)
+        self.spatial_index = SpatialIndex()
+
+
+def spawn_spiders(base: ShowBase, n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    game = Game(base)
+    root = base.render.attachNewNode('spiders')
+    spiders = []
+    for _ in range(n):
+        # Along a wall facing east or west (moving along Y and Z) or south or north (moving along X and Z)
+        is_x_wall = rng.random() < 0.5
+        position = [rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 18)]
+        wall_dimensions = (1, 5, 5) if is_x_wall else (5, 1, 5)
+        movement_axis = (0, 1, 1) if is_x_wall else (1, 0, 1)
+        spiders.append(Spider(position, root, game, scale=[Spider.SCALE] * 3, movement_axis=movement_axis, wall_dimensions=wall_dimensions))
+    return spiders
+
+
+def time_updates(update, n_frames: int) -> float:
+    # The garbage of the previous runs is not collected in the middle of this one
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(n_frames):
+        update()
+    return (time.perf_counter() - start) / n_frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.spider_swarm')
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 10000], help='numbers of spiders')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--camera-distance', type=float, default=CAMERA_DISTANCE, help='distance of the camera from the middle of the map')
+    args = parser.parse_args()
+
+    base = ShowBase()
+
+    print(f'{"spiders":>8} {"per spider (ms)":>16} {"swarm (ms)":>11} {"speedup":>8} {"in view":>8} {"swarm, in view (ms)":>20} {"speedup":>8} {"in bounds":>10}')
+    for count in args.counts:
+        spiders = spawn_spiders(base, count)
+
+        def update_each():
+            for spider in spiders:
+                spider.update()
+        per_spider_time = time_updates(update_each, args.frames)
+
+        swarm = SpiderSwarm(seed=0)
+        swarm.add(spawn_spiders(base, count))
+        swarm_time = time_updates(swarm.update, args.frames)
+
+        camera = make_camera(base.render, args.camera_distance)
+        root = swarm.models[0].getParent()
+        visible = []
+        def update_in_view():
+            visible.append(swarm.visible_from(camera, root))
+            swarm.update(visible[-1])
+        in_view_time = time_updates(update_in_view, args.frames)
+
+        # Both must keep every spider within a quarter of its wall from where it spawned
+        in_bounds = all(abs(spider.relative_position[i]) <= abs(spider.wall_dimensions[i] / 4) for spider in spiders for i in range(3))
+        in_bounds = in_bounds and bool((np.abs(swarm.offsets) <= swarm.bounds).all())
+        print(f'{count:>8} {1000 * per_spider_time:>16.3f} {1000 * swarm_time:>11.3f} {per_spider_time / swarm_time:>7.1f}x {np.mean(visible):>8.1%} '
+              f'{1000 * in_view_time:>20.3f} {per_spider_time / in_view_time:>7.1f}x {str(in_bounds):>10}')
+        base.render.getChildren().detach()
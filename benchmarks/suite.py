@@ -0,0 +1,175 @@
+"""
+Benchmark suite of the labyrinth's loading and rendering, across a sweep of generated maps of increasing size.
+For each map, it times the parsing (`Labyrinth.from_map_string`, including `merge_blocks`), the vertex generation,
+the geometry generation (one Geom per block with `generateGeometry`, and baked per floor and material)
+and the frames of the baked labyrinth rendered into an offscreen buffer.
+
+The results can be saved as a JSON baseline, and later runs compared against it, failing when any time
+got slower than the baseline by more than the tolerance.
+
+Run from the repository root:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --save benchmarks/baselines/default.json
+    python -m benchmarks.suite --compare benchmarks/baselines/default.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.labyrinth_render import build_labyrinth, time_frames
+from benchmarks.maps import generate_map
+from common import generateBakedGeometry, generateGeometry, group_blocks_for_baking
+from labyrinth import Labyrinth
+from panda3d.core import PandaSystem
+
+
+# Only these results are times, which are compared against the baseline
+TIMINGS = ('parse_s', 'merge_s', 'vertices_s', 'geometry_s', 'baked_geometry_s', 'frame_ms')
+
+
+def parse_timed(map_str: str):
+    """Parse the map, and get the labyrinth along with the total parsing time and the time spent in `merge_blocks`."""
+    merge_blocks = Labyrinth.__dict__['merge_blocks']
+    merge_time = 0.0
+
+    def timed_merge_blocks(blocks):
+        nonlocal merge_time
+        start = time.perf_counter()
+        merged = merge_blocks.__func__(Labyrinth, blocks)
+        merge_time = time.perf_counter() - start
+        return merged
+
+    Labyrinth.merge_blocks = timed_merge_blocks
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(map_str)
+        parse_time = time.perf_counter() - start
+    finally:
+        Labyrinth.merge_blocks = merge_blocks
+
+    return labyrinth, parse_time, merge_time
+
+
+def run_map(base, width: int, depth: int, n_floors: int, repeat: int, n_frames: int, seed: int) -> dict:
+    """Get the best time of `repeat` runs of each stage for a generated map, along with its size."""
+    map_str = generate_map(width, depth, n_floors, seed=seed)
+    best = {timing: float('inf') for timing in TIMINGS if timing != 'frame_ms'}
+
+    for _ in range(repeat):
+        labyrinth, parse_time, merge_time = parse_timed(map_str)
+
+        start = time.perf_counter()
+        labyrinth.block_table.bake_vertices()
+        vertices_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for idx, block in enumerate(labyrinth.blocks):
+            generateGeometry(block, f'labyrinth_block_{idx}')
+        geometry_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for (floor_index, _, _, _), blocks in group_blocks_for_baking(labyrinth.blocks).items():
+            generateBakedGeometry(blocks, f'labyrinth_floor_{floor_index}')
+        baked_geometry_time = time.perf_counter() - start
+
+        for timing, value in zip(best, (parse_time, merge_time, vertices_time, geometry_time, baked_geometry_time)):
+            best[timing] = min(best[timing], value)
+
+    result = {
+        'map': f'{width}x{depth}x{n_floors}',
+        'blocks': len(labyrinth.blocks),
+        'vertices': len(labyrinth.block_table.vertices),
+        **best,
+    }
+
+    if base is not None:
+        labyrinth_np = build_labyrinth(base, labyrinth, baked=True)
+        base.camera.setPos(0, -1.5 * max(labyrinth.width, labyrinth.depth), labyrinth.height + max(labyrinth.width, labyrinth.depth))
+        base.camera.lookAt(0, 0, 0)
+        result['frame_ms'] = 1000 * time_frames(base, n_frames)
+        labyrinth_np.removeNode()
+
+    return result
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Print each time against the baseline's, and get the ones that are slower than it by more than `tolerance`."""
+    baseline_results = {result['map']: result for result in baseline['results']}
+    regressions = []
+
+    print(f'{"map":>10} {"timing":>18} {"baseline":>10} {"current":>10} {"ratio":>7}')
+    for result in results:
+        baseline_result = baseline_results.get(result['map'])
+        if baseline_result is None:
+            continue
+        for timing in TIMINGS:
+            if timing not in result or timing not in baseline_result:
+                continue
+            ratio = result[timing] / baseline_result[timing] if baseline_result[timing] > 0 else float('inf')
+            is_regression = ratio > 1 + tolerance
+            if is_regression:
+                regressions.append((result['map'], timing, ratio))
+            print(f'{result["map"]:>10} {timing:>18} {baseline_result[timing]:>10.4f} {result[timing]:>10.4f} {ratio:>6.2f}x' + (' SLOWER' if is_regression else ''))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.suite')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 20, 40, 80], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated maps')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs of each stage, of which the best time is kept')
+    parser.add_argument('--frames', type=int, default=30, help='number of frames rendered for each map')
+    parser.add_argument('--no-render', action='store_true', help='skip the rendered frames')
+    parser.add_argument('--save', type=str, default=None, help='save the results as a JSON baseline to this file')
+    parser.add_argument('--compare', type=str, default=None, help='compare the results against the JSON baseline in this file')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='how much slower than the baseline a time can be, as a ratio (default=0.5)')
+    args = parser.parse_args()
+
+    base = None
+    if not args.no_render:
+        from direct.showbase.ShowBase import ShowBase
+        base = ShowBase()
+        base.disableMouse()
+
+    results = []
+    print(f'{"map":>10} {"blocks":>8} {"vertices":>10} ' + ' '.join(f'{timing:>16}' for timing in TIMINGS))
+    for size in args.sizes:
+        result = run_map(base, size, size, args.floors, args.repeat, args.frames, args.seed)
+        results.append(result)
+        print(f'{result["map"]:>10} {result["blocks"]:>8} {result["vertices"]:>10} '
+            + ' '.join(f'{result[timing]:>16.4f}' if timing in result else f'{"-":>16}' for timing in TIMINGS))
+
+    if args.save is not None:
+        with open(args.save, 'wt') as baseline_file:
+            json.dump({
+                'environment': {
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'processor': platform.processor(),
+                    'numpy': np.__version__,
+                    'panda3d': PandaSystem.getVersionString(),
+                },
+                'settings': {'floors': args.floors, 'seed': args.seed, 'repeat': args.repeat, 'frames': args.frames},
+                'results': results,
+            }, baseline_file, indent=2)
+        print('Saved the baseline to', args.save)
+
+    if args.compare is not None:
+        with open(args.compare, 'rt') as baseline_file:
+            baseline = json.load(baseline_file)
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} timings are more than {args.tolerance:.0%} slower than the baseline')
+            sys.exit(1)
+        print('No regressions against the baseline')
@@ -0,0 +1,175 @@
+"""
+Benchmark of the vertex generation of all the labyrinth's blocks, one block at a time (with the generator that the labyrinth
+used before the boxes were batched, kept here as the baseline) versus batched.
+Both buffers are also compared, since the batched generation must produce the same vertices bit for bit.
+
+Run from the repository root:
+
+    python -m benchmarks.vertex_batching
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from typing import Set, Tuple
+
+from benchmarks.maps import grid_map
+from labyrinth import BlockTable, Labyrinth, Parallelepiped
+
+
+def legacy_box_vertices(width: float, height: float, depth: float,
+        color: Tuple[float, float, float, float],
+        tiling_factors: Tuple[float, float],
+        hidden_faces: Set[str]) -> np.ndarray:
+    """The vertices of one box, generated as `Parallelepiped.box_vertices` did before the boxes were batched."""
+    r, g, b, a = color
+    # Panda3D uses the geographical coordinate system, where XY is on the floor and Z is the height
+    # (https://docs.panda3d.org/1.10/python/introduction/tutorial/loading-the-grassy-scenery)
+    x, y, z = width, depth, height
+
+    # Determine how textures should be tiled.
+    # If the tiling factors are not specified, then the whole texture is mapped to the face.
+    # Otherwise, the UVs are a factor of the object's dimensions.
+    if tiling_factors is not None:
+        u, v = tiling_factors
+        ux, uy = u*x, u*y
+        vy, vz = v*y, v*z
+    else:
+        ux, uy = 1, 1
+        vy, vz = 1, 1
+
+    # Clockwise order
+    vertices = np.array([
+        # BOTTOM
+        [0, 0, 0,  0, vy],
+        [0, y, 0,  0,  0],
+        [x, y, 0, ux,  0],
+
+        [0, 0, 0,  0, vy],
+        [x, y, 0, ux,  0],
+        [x, 0, 0, ux, vy],
+
+        # TOP
+        [0, 0, z,  0,  0],
+        [x, y, z, ux, vy],
+        [0, y, z,  0, vy],
+
+        [0, 0, z,  0,  0],
+        [x, 0, z, ux,  0],
+        [x, y, z, ux, vy],
+
+        # LEFT
+        [0, y, z,  0, vz],
+        [0, y, 0,  0,  0],
+        [0, 0, z, uy, vz],
+
+        [0, y, 0,  0,  0],
+        [0, 0, 0, uy,  0],
+        [0, 0, z, uy, vz],
+
+        # RIGHT
+        [x, 0, z,  0, vz],
+        [x, y, 0, uy,  0],
+        [x, y, z, uy, vz],
+
+        [x, 0, z,  0, vz],
+        [x, 0, 0,  0,  0],
+        [x, y, 0, uy,  0],
+
+        # BACK
+        [0, y, z, ux, vz],
+        [x, y, z,  0, vz],
+        [0, y, 0, ux,  0],
+
+        [x, y, z,  0, vz],
+        [x, y, 0,  0,  0],
+        [0, y, 0, ux,  0],
+
+        # FRONT
+        [0, 0, 0,  0,  0],
+        [x, 0, z, ux, vz],
+        [0, 0, z,  0, vz],
+
+        [0, 0, 0,  0,  0],
+        [x, 0, 0, ux,  0],
+        [x, 0, z, ux, vz],
+    ], 'f')
+
+    # Color each face with a different shade, mainly for debugging
+    color_cols = np.repeat([[r, g, b, a]], len(vertices), axis=0)
+
+    normals = [
+        [ 0,  0, -1],   # BOTTOM
+        [ 0,  0,  1],   # TOP
+        [-1,  0,  0],   # LEFT
+        [ 1,  0,  0],   # RIGHT
+        [ 0,  1,  0],   # BACK
+        [ 0, -1,  0],   # FRONT
+    ]
+    normal_cols = np.vstack( [np.repeat([normal], 6, axis=0) for normal in normals] )
+
+    # Tangent and binormal vectors are needed for bump mapping: https://discourse.panda3d.org/t/custom-geometry-and-bump-mapping-bts-space/24256/3
+    tangents = [
+        [ ux,   0,  0],   # BOTTOM
+        [ ux,   0,  0],   # TOP
+        [  0, -uy,  0],   # LEFT
+        [  0,  uy,  0],   # RIGHT
+        [-ux,   0,  0],   # BACK
+        [ ux,   0,  0],   # FRONT
+    ]
+    tangent_cols = np.vstack( [np.repeat([tangent], 6, axis=0) for tangent in tangents] )
+
+    binormals = [
+        [ 0, -vy,   0],   # BOTTOM
+        [ 0,  vy,   0],   # TOP
+        [ 0,   0, -vy],   # LEFT
+        [ 0,   0,  vy],   # RIGHT
+        [ 0,   0,  vy],   # BACK
+        [ 0,   0,  vy],   # FRONT
+    ]
+    binormal_cols = np.vstack( [np.repeat([binormal], 6, axis=0) for binormal in binormals] )
+
+    vertices = np.hstack([ vertices, color_cols, normal_cols, tangent_cols, binormal_cols ])
+
+    if hidden_faces:
+        visible_faces = [face not in hidden_faces for face in Parallelepiped.FACES]
+        vertices = vertices[np.repeat(visible_faces, 6)]
+
+    return vertices
+
+
+def legacy_block_vertices(table: BlockTable, index: int) -> np.ndarray:
+    width, height, depth = table.columns['dims'][index].tolist()
+    tiling_factors = table.columns['tiling_factors'][index].tolist()
+    return legacy_box_vertices(width, height, depth,
+        color=tuple(table.columns['color'][index].tolist()),
+        tiling_factors=tuple(tiling_factors) if not np.isnan(tiling_factors[0]) else None,
+        hidden_faces=table.hidden_faces(index))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('benchmarks.vertex_batching')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 60, 120], help='width and depth of the generated maps, in cells')
+    parser.add_argument('--floors', type=int, default=3, help='number of floors of the generated maps')
+    args = parser.parse_args()
+
+    print(f'{"map":>12} {"blocks":>8} {"vertices":>10} {"per block (s)":>14} {"batched (s)":>12} {"speedup":>8}')
+    for size in args.sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            labyrinth = Labyrinth.from_map_string(grid_map(size, size, args.floors))
+        table = labyrinth.block_table
+        top_level = np.flatnonzero(table.mask())
+
+        start = time.perf_counter()
+        per_block = np.concatenate([legacy_block_vertices(table, index) for index in top_level]).astype(np.float32)
+        per_block_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table.bake_vertices()
+        batched_time = time.perf_counter() - start
+
+        assert per_block.tobytes() == table.vertices.tobytes(), 'the batched vertices differ from the per-block vertices'
+        print(f'{f"{size}x{size}x{args.floors}":>12} {len(top_level):>8} {len(table.vertices):>10} {per_block_time:>14.3f} {batched_time:>12.3f} {per_block_time / batched_time:>7.1f}x')
@@ -1,48 +1,109 @@
 from panda3d.core import *
 import math
+import numpy as np
 
-from labyrinth import Parallelepiped
+from typing import Dict, List, Tuple
 
+from labyrinth import BlockView, FloorView, Parallelepiped, TriggerWallView
 
-def generateGeometry(parallelepiped: Parallelepiped, name: str) -> GeomNode:
-    # Number of vertices per primitive (triangles)
-    nvp = 3
-
-    # We have to build our own array format, since Panda3D's defaults don't include tangent and binormal vectors which we need for bump mapping
-    # https://docs.panda3d.org/1.10/python/programming/internal-structures/geometry-storage/geomvertexformat
-    vertex_format_array = GeomVertexArrayFormat()
-    vertex_format_array.addColumn('vertex', 3, Geom.NTFloat32, Geom.CPoint)
-    vertex_format_array.addColumn('normal', 3, Geom.NTFloat32, Geom.CNormal)
-    vertex_format_array.addColumn('color', 4, Geom.NTUint8, Geom.C_color)   # OpenGL color format
-    vertex_format_array.addColumn('texcoord', 2, Geom.NTFloat32, Geom.C_texcoord)
-    vertex_format_array.addColumn('tangent', 3, Geom.NTFloat32, Geom.C_vector)
-    vertex_format_array.addColumn('binormal', 3, Geom.NTFloat32, Geom.C_vector)
-    vertex_format = GeomVertexFormat.registerFormat(vertex_format_array)
+
+# Number of vertices per primitive (triangles)
+NVP = 3
+
+# Maximum number of collision boxes in each leaf of the labyrinth's collision hierarchy
+COLLISION_LEAF_SIZE = 8
+# The ground's quads are at most as large (in tiles) as their distance to the center (in tiles) divided by this
+GROUND_LOD_FACTOR = 1
+
+# Layout of the rows returned by Parallelepiped.get_vertices(), as (column name, first index, number of components)
+VERTEX_MATRIX_COLUMNS = (
+    ('vertex', 0, 3),
+    ('texcoord', 3, 2),
+    ('color', 5, 4),
+    ('normal', 9, 3),
+    ('tangent', 12, 3),
+    ('binormal', 15, 3),
+)
+
+_vertex_format = None
+
+
+def get_vertex_format() -> GeomVertexFormat:
+    """Get the vertex format used by the generated geometry, registering it on the first call."""
+    global _vertex_format
+
+    if _vertex_format is None:
+        # We have to build our own array format, since Panda3D's defaults don't include tangent and binormal vectors which we need for bump mapping
+        # https://docs.panda3d.org/1.10/python/programming/internal-structures/geometry-storage/geomvertexformat
+        vertex_format_array = GeomVertexArrayFormat()
+        vertex_format_array.addColumn('vertex', 3, Geom.NTFloat32, Geom.CPoint)
+        vertex_format_array.addColumn('normal', 3, Geom.NTFloat32, Geom.CNormal)
+        vertex_format_array.addColumn('color', 4, Geom.NTUint8, Geom.C_color)   # OpenGL color format
+        vertex_format_array.addColumn('texcoord', 2, Geom.NTFloat32, Geom.C_texcoord)
+        vertex_format_array.addColumn('tangent', 3, Geom.NTFloat32, Geom.C_vector)
+        vertex_format_array.addColumn('binormal', 3, Geom.NTFloat32, Geom.C_vector)
+        _vertex_format = GeomVertexFormat.registerFormat(vertex_format_array)
+
+    return _vertex_format
+
+
+def _vertex_dtype(vertex_format: GeomVertexFormat) -> np.dtype:
+    """Build a NumPy structured type that matches the interleaved layout of the vertex format's array."""
+    array_format = vertex_format.getArray(0)
+    names, formats, offsets = [], [], []
+    for name, _, n_components in VERTEX_MATRIX_COLUMNS:
+        column = array_format.getColumn(name)
+        names.append(name)
+        formats.append((np.uint8 if name == 'color' else np.float32, n_components))
+        offsets.append(column.getStart())
+
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': array_format.getStride()})
+
+
+def pack_vertices(vertices: np.ndarray, vertex_format: GeomVertexFormat = None) -> np.ndarray:
+    """Convert a matrix of vertices (one per row, as returned by `Parallelepiped.get_vertices()`) into the interleaved format's memory layout."""
+    if vertex_format is None:
+        vertex_format = get_vertex_format()
+
+    vertices = np.asarray(vertices)
+    packed = np.zeros(len(vertices), dtype=_vertex_dtype(vertex_format))
+    for name, start, n_components in VERTEX_MATRIX_COLUMNS:
+        values = vertices[:, start:start + n_components].astype(np.float32)
+        if name == 'color':
+            # Same conversion as GeomVertexWriter does for 8-bit colors (truncation)
+            values = np.clip(values * np.float32(255), 0, 255).astype(np.uint8)
+        packed[name] = values
+
+    return packed
+
+
+def generateGeometryFromVertices(vertices: np.ndarray, name: str, indices: np.ndarray = None) -> GeomNode:
+    """
+    Create a node with the triangles described by `vertices`, written in bulk into the vertex data.
+    If `indices` is not specified, then every consecutive `NVP` vertices form a triangle.
+    The index buffer is always written, which is what the primitive ends up with when built one triangle at a time.
+    """
+    vertex_format = get_vertex_format()
     vertex_data = GeomVertexData('v_' + name, vertex_format, Geom.UHStatic)
 
-    vertices = parallelepiped.get_vertices()
-    vertex_data.setNumRows(len(vertices))
+    packed = pack_vertices(vertices, vertex_format)
+    vertex_data.uncleanSetNumRows(len(packed))
+    if len(packed) > 0:
+        memoryview(vertex_data.modifyArray(0)).cast('B')[:] = packed.tobytes()
 
-    vertex_writer = GeomVertexWriter(vertex_data, 'vertex')
-    texcoord_writer = GeomVertexWriter(vertex_data, 'texcoord')
-    color_writer = GeomVertexWriter(vertex_data, 'color')
-    normal_writer = GeomVertexWriter(vertex_data, 'normal')
-    tangent_writer = GeomVertexWriter(vertex_data, 'tangent')
-    binormal_writer = GeomVertexWriter(vertex_data, 'binormal')
+    if indices is None:
+        indices = np.arange(len(packed) - len(packed) % NVP)
 
-    for vertex in vertices:
-        vertex_writer.addData3(*vertex[:nvp])
-        texcoord_writer.addData2(*vertex[nvp:nvp + 2])
-        color_writer.addData4(*vertex[nvp + 2:nvp + 6])
-        normal_writer.addData3(*vertex[nvp + 6:nvp + 9])
-        tangent_writer.addData3(*vertex[nvp + 9:nvp + 12])
-        binormal_writer.addData3(*vertex[nvp + 12:])
+    # Use the smallest index type that can address all the vertices
+    index_type, index_dtype = (Geom.NTUint16, np.uint16) if len(packed) <= 0xffff else (Geom.NTUint32, np.uint32)
+    indices = np.ascontiguousarray(indices, dtype=index_dtype).ravel()
 
     primitive = GeomTriangles(Geom.UHStatic)
-
-    for _ in range(len(vertices) // nvp):
-        primitive.add_next_vertices(nvp)
-        primitive.closePrimitive()
+    primitive.setIndexType(index_type)
+    index_data = primitive.modifyVertices()
+    index_data.uncleanSetNumRows(len(indices))
+    if len(indices) > 0:
+        memoryview(index_data).cast('B')[:] = indices.tobytes()
 
     geom = Geom(vertex_data)
     geom.addPrimitive(primitive)
@@ -53,6 +114,143 @@ def generateGeometry(parallelepiped: Parallelepiped, name: str) -> GeomNode:
     return node
 
 
+def generateGeometry(parallelepiped: Parallelepiped, name: str) -> GeomNode:
+    return generateGeometryFromVertices(parallelepiped.get_vertices(), name)
+
+
+def generateIndexedGeometry(parallelepiped: Parallelepiped, name: str, cull_hidden_faces: bool = True) -> GeomNode:
+    """Same as `generateGeometry`, but with the 4 vertices of each face shared by its triangles through the index buffer."""
+    vertices, indices = parallelepiped.get_indexed_vertices(cull_hidden_faces)
+    return generateGeometryFromVertices(vertices, name, indices)
+
+
+def generateBakedGeometry(blocks: List[BlockView], name: str, indexed: bool = False, cull_hidden_faces: bool = True) -> Tuple[GeomNode, Dict[BlockView, Tuple[int, int]]]:
+    """
+    Create a single node with the geometry of all the `blocks`, each one offset by its position.
+    Also return the range of vertex rows `(start, end)` that each block occupies in the node's vertex data.
+    If `indexed`, the blocks' geometry is indexed like in `generateIndexedGeometry`.
+    """
+    block_vertices = []
+    block_indices = []
+    vertex_ranges = {}
+    n_vertices = 0
+    for block in blocks:
+        if indexed:
+            vertices, indices = block.get_indexed_vertices(cull_hidden_faces)
+            block_indices.append(indices + n_vertices)
+        else:
+            vertices = block.get_vertices().copy()
+        vertices[:, :3] += block.position
+        block_vertices.append(vertices)
+
+        vertex_ranges[block] = (n_vertices, n_vertices + len(vertices))
+        n_vertices += len(vertices)
+
+    vertices = np.concatenate(block_vertices) if block_vertices else np.zeros((0, 18))
+    indices = (np.concatenate(block_indices) if block_indices else np.zeros(0, dtype=np.int64)) if indexed else None
+
+    return generateGeometryFromVertices(vertices, name, indices), vertex_ranges
+
+
+def group_blocks_for_baking(blocks: List[BlockView]) -> Dict[Tuple[int, str, bool, bool], List[BlockView]]:
+    """
+    Group the labyrinth blocks that can be rendered together, by `(floor index, texture, is transparent, is roof)`.
+    Roofs are kept apart since they are lit differently from the rest of the labyrinth.
+    """
+    groups = {}
+    for block in blocks:
+        is_roof = isinstance(block, FloorView) and block.strictly_roof
+        groups.setdefault((block.floor_index, block.texture, block.is_transparent(), is_roof), []).append(block)
+
+    return groups
+
+
+def collision_name(block: BlockView) -> str:
+    """Name of the block's collision node, which the collision events are named after (`Player-into-Ground`, for instance)."""
+    if isinstance(block, FloorView):
+        return 'Ground'
+    if isinstance(block, TriggerWallView):
+        return 'TriggerWall'
+    return 'Wall'
+
+
+def group_blocks_for_collisions(blocks: List[BlockView]) -> Dict[Tuple[int, str], List[BlockView]]:
+    """Group the labyrinth blocks by `(floor index, collision name)`, which are the static collision nodes of the labyrinth."""
+    groups = {}
+    for block in blocks:
+        groups.setdefault((block.floor_index, collision_name(block)), []).append(block)
+
+    return groups
+
+
+def generateCollisionHierarchy(blocks: List[BlockView], name: str, leaf_name: str, leaf_size: int = COLLISION_LEAF_SIZE) -> NodePath:
+    """
+    Create a bounding volume hierarchy with a collision box for each of the `blocks`, positioned relative to the labyrinth.
+    The blocks are split in half along the longest axis of their centers until there are at most `leaf_size` of them,
+    which are put in a collision node named `leaf_name`. The collision traverser skips the subtrees whose bounds are not reached.
+    """
+    centers = np.array([[block.position[0] + block.width / 2, block.position[1] + block.depth / 2, block.position[2] + block.height / 2] for block in blocks]).reshape(-1, 3)
+
+    def build(indices: np.ndarray) -> NodePath:
+        if len(indices) <= leaf_size:
+            collider_node = CollisionNode(leaf_name)
+            for idx in indices:
+                block = blocks[idx]
+                collider_node.addSolid(CollisionBox(Point3(*centers[idx]), block.width / 2, block.depth / 2, block.height / 2))
+            return NodePath(collider_node)
+
+        axis = np.argmax(np.ptp(centers[indices], axis=0))
+        indices = indices[np.argsort(centers[indices, axis], kind='stable')]
+        subtree = NodePath(name)
+        build(indices[:len(indices) // 2]).reparentTo(subtree)
+        build(indices[len(indices) // 2:]).reparentTo(subtree)
+        return subtree
+
+    return build(np.arange(len(blocks)))
+
+
+def ground_quads(n_tiles: int, lod_factor: float = GROUND_LOD_FACTOR) -> np.ndarray:
+    """
+    Cover a square of `n_tiles` by `n_tiles` tiles with quads, as rows of `(x, y, width, depth)` in tiles.
+    The tiles near the center are a quad each, while further away the quads are larger, splitting the square in halves
+    until each quad is at most `lod_factor` times smaller than its distance to the center.
+    """
+    center = n_tiles / 2
+    quads = []
+
+    def cover(x0: int, y0: int, x1: int, y1: int):
+        width, depth = x1 - x0, y1 - y0
+        distance = max(x0 - center, 0, center - x1, y0 - center, 0, center - y1)
+        if (width <= 1 and depth <= 1) or distance >= lod_factor * max(width, depth):
+            quads.append((x0, y0, width, depth))
+        elif width >= depth:
+            cover(x0, y0, x0 + width // 2, y1)
+            cover(x0 + width // 2, y0, x1, y1)
+        else:
+            cover(x0, y0, x1, y0 + depth // 2)
+            cover(x0, y0 + depth // 2, x1, y1)
+
+    cover(0, 0, n_tiles, n_tiles)
+    return np.array(quads, dtype=np.float64).reshape(-1, 4)
+
+
+def generateGroundGeometry(tile_size: float, n_tiles: int, name: str, lod_factor: float = GROUND_LOD_FACTOR) -> GeomNode:
+    """
+    Create a flat ground of `n_tiles` by `n_tiles` square tiles, starting at the origin, as a single Geom with the texture repeated on each tile.
+    The ground is split into the quads of `ground_quads`, which get larger away from the center, where there's no detail to keep.
+    """
+    quads = ground_quads(n_tiles, lod_factor) * tile_size
+    # Only the top face of flat boxes, whose texture is repeated every `tile_size`. The quads start at multiples of it, so the tiles line up
+    visible_faces = np.array([[face == 'top' for face in Parallelepiped.FACES]] * len(quads))
+    vertices, indices = Parallelepiped.batch_indexed_box_vertices(quads[:, 2], np.zeros(len(quads)), quads[:, 3],
+        colors=np.ones((len(quads), 4)),
+        tiling_factors=np.full((len(quads), 2), 1 / tile_size),
+        visible_faces=visible_faces)
+    vertices[:, :2] += np.repeat(quads[:, :2], 4, axis=0)
+
+    return generateGeometryFromVertices(vertices, name, indices)
+
+
 def update_orthographic_lens(camera_orthographic_lens, windowX: int, windowY: int, camera_zoom: float):
     """Set the orthographic lens' parameters with respect to the window size."""
     MULTIPLIER = 0.5
@@ -0,0 +1,148 @@
+import bisect
+
+import numpy as np
+
+from typing import Dict, List, Tuple
+from direct.showbase.MessengerGlobal import messenger
+from panda3d.core import NodePath, Point3
+
+from common import collision_name
+from labyrinth import Labyrinth
+
+
+Point = Tuple[float, float, float]
+
+# How far below the collider the ground is looked for, to know whether it's still standing on it
+GROUND_PROBE_DISTANCE = 1e-3
+
+
+class GridContact:
+    """Point of contact with a block, with the same interface as the `CollisionEntry` passed to the collision events."""
+
+    def __init__(self, parent: NodePath, point: Point):
+        self.parent = parent
+        self.point = Point3(*point)
+
+    def getSurfacePoint(self, node: NodePath) -> Point3:
+        return node.getRelativePoint(self.parent, self.point)
+
+
+class GridCollisions:
+    """
+    Collisions of an axis-aligned box against the labyrinth's blocks, found directly from the labyrinth's cell grid.
+    Each cell of each layer (the floor slab or the walls above it, for every floor) has the block part that occupies it,
+    so only the blocks in the cells that the box covers are tested. All positions are relative to the labyrinth's node.
+    """
+
+    def __init__(self, labyrinth: Labyrinth):
+        cell_length = Labyrinth.DIMS_WALL_THIN + Labyrinth.DIMS_WALL_LENGTH
+        floor_length = Labyrinth.DIMS_FLOOR_HEIGHT + Labyrinth.DIMS_WALL_HEIGHT
+        n_x_cells = 2 * round((labyrinth.width - Labyrinth.DIMS_WALL_THIN) / cell_length) + 1
+        n_y_cells = 2 * round((labyrinth.depth - Labyrinth.DIMS_WALL_THIN) / cell_length) + 1
+        # The last floor's roof is one floor above it
+        n_layers = 2 * (labyrinth.n_floors + 1)
+
+        # Boundaries of the cells along each axis, which alternate between thin and long cells (and floor slabs and walls)
+        self.edges = (
+            [(i // 2) * cell_length + (i % 2) * Labyrinth.DIMS_WALL_THIN for i in range(n_x_cells + 1)],
+            [(i // 2) * cell_length + (i % 2) * Labyrinth.DIMS_WALL_THIN for i in range(n_y_cells + 1)],
+            [(i // 2) * floor_length + (i % 2) * Labyrinth.DIMS_FLOOR_HEIGHT for i in range(n_layers + 1)],
+        )
+
+        parts = [part for block in labyrinth.blocks for part in block.get_parts()]
+        self.boxes_min = [tuple(part.position) for part in parts]
+        self.boxes_max = [(part.position[0] + part.width, part.position[1] + part.depth, part.position[2] + part.height) for part in parts]
+        # Same names as the collision nodes, which the collision events are named after
+        self.box_names = [collision_name(part) for part in parts]
+
+        self.grid = np.full((n_layers, n_y_cells, n_x_cells), -1, dtype=np.int32)
+        for box_idx, (box_min, box_max) in enumerate(zip(self.boxes_min, self.boxes_max)):
+            (x0, x1), (y0, y1), (z0, z1) = (self.cell_range(axis, box_min[axis], box_max[axis]) for axis in range(3))
+            self.grid[z0:z1, y0:y1, x0:x1] = box_idx
+
+    def cell_range(self, axis: int, low: float, high: float) -> Tuple[int, int]:
+        """Range `[start, end)` of the cells along `axis` that the open interval `(low, high)` overlaps."""
+        edges = self.edges[axis]
+        start = max(bisect.bisect_right(edges, low) - 1, 0)
+        end = min(bisect.bisect_left(edges, high), len(edges) - 1)
+        return start, max(start, end)
+
+    def overlapping(self, box_min: Point, box_max: Point) -> List[int]:
+        """Get the blocks that overlap the box (touching doesn't count), as indices into `boxes_min` and `boxes_max`."""
+        (x0, x1), (y0, y1), (z0, z1) = (self.cell_range(axis, box_min[axis], box_max[axis]) for axis in range(3))
+        candidates = set(self.grid[z0:z1, y0:y1, x0:x1].ravel().tolist())
+        candidates.discard(-1)
+
+        return [box_idx for box_idx in candidates
+            if all(self.boxes_min[box_idx][axis] < box_max[axis] and box_min[axis] < self.boxes_max[box_idx][axis] for axis in range(3))]
+
+    def closest_point(self, box_idx: int, point: Point) -> Point:
+        return tuple(min(max(point[axis], self.boxes_min[box_idx][axis]), self.boxes_max[box_idx][axis]) for axis in range(3))
+
+    def move(self, previous: Point, position: Point, offset_min: Point, offset_max: Point) -> Tuple[Point, Dict[str, Point]]:
+        """
+        Move a box (`offset_min` to `offset_max` around its position) from `previous` to `position`, one axis at a time,
+        stopping it at the faces of the blocks it runs into. Get the resolved position, and the blocks it's in contact with
+        (including the ground right below it), as the point of contact of each collision name.
+        """
+        resolved = list(previous)
+        contacts = {}
+
+        def add_contacts(box_indices: List[int]):
+            center = tuple(resolved[axis] + (offset_min[axis] + offset_max[axis]) / 2 for axis in range(3))
+            for box_idx in box_indices:
+                contacts.setdefault(self.box_names[box_idx], self.closest_point(box_idx, center))
+
+        for axis in range(3):
+            resolved[axis] = position[axis]
+            box_min = [resolved[i] + offset_min[i] for i in range(3)]
+            box_max = [resolved[i] + offset_max[i] for i in range(3)]
+            hit = self.overlapping(box_min, box_max)
+            if not hit:
+                continue
+
+            # Penetration is resolved against the direction of the movement
+            if position[axis] > previous[axis]:
+                resolved[axis] = min(self.boxes_min[box_idx][axis] for box_idx in hit) - offset_max[axis]
+            elif position[axis] < previous[axis]:
+                resolved[axis] = max(self.boxes_max[box_idx][axis] for box_idx in hit) - offset_min[axis]
+            add_contacts(hit)
+
+        # Standing on the ground also counts as being in contact with it
+        probe_min = (resolved[0] + offset_min[0], resolved[1] + offset_min[1], resolved[2] + offset_min[2] - GROUND_PROBE_DISTANCE)
+        probe_max = (resolved[0] + offset_max[0], resolved[1] + offset_max[1], resolved[2] + offset_min[2])
+        add_contacts(self.overlapping(probe_min, probe_max))
+
+        return tuple(resolved), contacts
+
+
+class GridCollisionHandler:
+    """
+    Moves a collider with `GridCollisions` and sends the same events as the `CollisionHandlerPusher`'s patterns
+    (`<collider>-into-<name>`, `<collider>-again-<name>` and `<collider>-out-<name>`), with a `GridContact` as argument.
+    """
+
+    def __init__(self, collisions: GridCollisions, name: str, offset_min: Point, offset_max: Point):
+        self.collisions = collisions
+        self.name = name
+        self.offset_min = offset_min
+        self.offset_max = offset_max
+        self.contacts: Dict[str, GridContact] = {}
+        self.previous_contacts: Dict[str, GridContact] = {}
+
+    def move(self, parent: NodePath, previous: Point, position: Point) -> Point:
+        """
+        Resolve the collider's movement and get its resolved position.
+        The events are only sent with `send_events`, after the collider is put at the resolved position.
+        """
+        resolved, contact_points = self.collisions.move(previous, position, self.offset_min, self.offset_max)
+        self.previous_contacts = self.contacts
+        self.contacts = {name: GridContact(parent, point) for name, point in contact_points.items()}
+        return resolved
+
+    def send_events(self):
+        for name, contact in self.contacts.items():
+            messenger.send(f'{self.name}-{"again" if name in self.previous_contacts else "into"}-{name}', [contact])
+        for name, contact in self.previous_contacts.items():
+            if name not in self.contacts:
+                messenger.send(f'{self.name}-out-{name}', [contact])
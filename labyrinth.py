@@ -1,7 +1,10 @@
 import copy
+import hashlib
+import json
+import os
 import numpy as np
 
-from typing import Any, Callable, Dict, Tuple, List, Union
+from typing import Any, Dict, Set, Tuple, List
 from dataclasses import dataclass
 
 
@@ -10,21 +13,42 @@ TEXTURE_WALL = 'textures/wall.png'
 TEXTURE_WALL_TILING_FACTORS = (0.3, 0.15)
 TEXTURE_WINDOW = 'textures/glass.png'
 
+# Compiled labyrinths are cached next to the map files, and rebuilt whenever the map or the block dimensions change
+CACHE_EXTENSION = '.cache'
+CACHE_MAGIC = b'LABYRINTH-CACHE\n'
+CACHE_VERSION = 1
+CACHE_ALIGNMENT = 64
+
 @dataclass(frozen=True)
 class Labyrinth:
-    blocks:         List['LabyrinthBlock']
+    block_table:    'BlockTable'
     width:          float
     height:         float
     depth:          float
     start_pos:      Tuple[float, float, float]
     finish_pos:     Tuple[float, float, float]
     n_floors:       int
-    
+
     # Convenience attributes
-    walls:          List['Wall']
-    windows:        List['Window']
-    floors:         List['Floor']
-    pillars:        List['Pillar']
+    @property
+    def blocks(self) -> List['BlockView']:
+        return self.block_table.views()
+
+    @property
+    def walls(self) -> List['WallView']:
+        return self.block_table.views(self.block_table.mask(block_type=Wall))
+
+    @property
+    def windows(self) -> List['WindowView']:
+        return self.block_table.views(self.block_table.mask(block_type=Window))
+
+    @property
+    def floors(self) -> List['FloorView']:
+        return self.block_table.views(self.block_table.mask(block_type=Floor))
+
+    @property
+    def pillars(self) -> List['PillarView']:
+        return self.block_table.views(self.block_table.mask(block_type=Pillar))
 
 
 
@@ -145,273 +169,557 @@ class Labyrinth:
         start_pos = None
         finish_pos = None
 
-        previous_layout = []
-        for idx, floor_layout in enumerate(floor_layouts):
-            for y_idx, row in enumerate(floor_layout):
-                for x_idx, object_type in enumerate(row):
-                    block = None
-                    block_args = {
-                        'cell': (x_idx, y_idx),
-                        'floor_index': idx,
-                    }
-
-                    object_underneath: bool = object_type != cls.NODE_HOLE \
-                        and previous_layout and previous_layout[y_idx][x_idx] != cls.NODE_EMPTY
-                    object_ontop: bool = any(floor_layout[y_idx][x_idx] != cls.NODE_EMPTY for floor_layout in floor_layouts[idx+1:])
-
-                    if object_type == cls.NODE_WALL_H:
-                        block = Wall(**block_args, **cls.ATTRIBUTES_WALL_H, color=wall_color)
-
-                    elif object_type == cls.NODE_WINDOW_H:
-                        block = Window(**block_args, **cls.ATTRIBUTES_WALL_H)
-
-                    elif object_type == cls.NODE_WALL_V:
-                        block = Wall(**block_args, **cls.ATTRIBUTES_WALL_V, color=wall_color)
-                    
-                    elif object_type == cls.NODE_WINDOW_V:
-                        block = Window(**block_args, **cls.ATTRIBUTES_WALL_V)
-
-                    elif object_type == cls.NODE_PILLAR:
-                        block = Pillar(**block_args, **cls.ATTRIBUTES_PILLAR, color=pillar_color)
-                    
-                    elif object_type == cls.NODE_START:
-                        position = get_position(x_idx, y_idx, idx)
-                        length_to_center = cls.DIMS_WALL_LENGTH / 2
-                        start_pos = (position[0] + length_to_center, position[1] + length_to_center, position[2] + cls.DIMS_FLOOR_HEIGHT)   # not sure why only center Y, but works
-                        # Create a floor underneath
-                        block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_MIDDLE, strictly_roof=False, color=floor_color)
-                    
-                    elif object_type == cls.NODE_FINISH:
-                        finish_pos = get_position(x_idx, y_idx, idx)
-
-                        if (x_idx % 2) == 1:
-                            block = TriggerWall(**block_args, **cls.ATTRIBUTES_WALL_H)
-                        
-                        elif (y_idx % 2) == 1:
-                            block = TriggerWall(**block_args, **cls.ATTRIBUTES_WALL_V)
-
-                    elif object_type == cls.NODE_FLOOR or object_underneath:
-                        
-                        # Whether or not this is strictly a roof, and so not meant to be a walkable floor
-                        block_args['strictly_roof'] = object_type not in cls.NODES_FLOOR and object_underneath and not object_ontop
-
-                        # Middle floor
-                        if (x_idx % 2) == 1 and (y_idx % 2) == 1:
-                            block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_MIDDLE)
-
-                        # Horizontal floor
-                        elif (x_idx % 2) == 1:
-                            block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_WALL_H)
-
-                        # Vertical floor
-                        elif (y_idx % 2) == 1:
-                            block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_WALL_V)
-
-                        # Pillar floor
-                        else:
-                            block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_PILLAR)
-
-                        block.color = floor_color
-
-                    if block is not None:
-                        position = get_position(x_idx, y_idx, idx)
-                        block.position = position
-                        
-                        if isinstance(block, Pillar) or isinstance(block, TriggerWall):
-                            # Add an extra floor block below
-                            blocks.append(Floor(
-                                **block_args,
-                                **cls.ATTRIBUTES_FLOOR_PILLAR,
-                                strictly_roof=False,
-                                position=position,
-                                color=floor_color,
-                            ))
-
-                            # Account for the fact that there is floor below
-                            block.position = (position[0], position[1], position[2] + cls.DIMS_FLOOR_HEIGHT)
-
-                        if isinstance(block, Wall):
-                            # Add an extra floor block below
-                            attrs = cls.ATTRIBUTES_FLOOR_WALL_H if object_type in cls.NODES_H else cls.ATTRIBUTES_FLOOR_WALL_V
-                            rampart_block = Floor(
-                                **block_args,
-                                **attrs,
-                                strictly_roof=False,
-                                position=position,
-                                color=floor_color,
-                            )
-                            blocks.append(rampart_block)
-
-                            # Account for the fact that there is floor below
-                            block.position = (position[0], position[1], position[2] + cls.DIMS_FLOOR_HEIGHT)
-
-                            # Determine which sides of the wall are facing inside the labyrinth
-                            block.east_inside  = x_idx < len(row) - 1          and row[x_idx + 1] in cls.NODES_INSIDE
-                            block.west_inside  = x_idx > 0                     and row[x_idx - 1] in cls.NODES_INSIDE
-                            block.south_inside = y_idx < len(floor_layout) - 1 and floor_layout[y_idx + 1][x_idx] in cls.NODES_INSIDE
-                            block.north_inside = y_idx > 0                     and floor_layout[y_idx - 1][x_idx] in cls.NODES_INSIDE
-
-                        blocks.append(block)
-
-            previous_layout = floor_layout
-        
-        # Roof
-        for y_idx, row in enumerate(previous_layout):
-            for x_idx, object_type in enumerate(row):
-                block = None
-                block_args = {
-                    'cell': (x_idx, y_idx),
-                    'floor_index': idx + 1,
-                    'strictly_roof': True,
-                }
-
-                # Cover any node with roof
-                if object_type != cls.NODE_EMPTY:
-                   
-                    # Middle floor
-                    if (x_idx % 2) == 1 and (y_idx % 2) == 1:
-                        block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_MIDDLE, color=floor_color)
-
-                    # Horizontal floor
-                    elif (x_idx % 2) == 1:
-                        block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_WALL_H, color=floor_color)
-
-                    # Vertical floor
-                    elif (y_idx % 2) == 1:
-                        block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_WALL_V, color=floor_color)
-
-                    # Pillar floor
-                    else:
-                        block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_PILLAR, color=floor_color)
+        # Character grid of the whole map, with shape (floors, rows, columns). Shorter lines are padded with empty space
+        grid = cls.map_grid(floor_layouts)
+        n_floors = len(grid)
+
+        occupied = grid != cls.NODE_EMPTY
+        # Whether there is anything on the same cell in any of the floors above (suffix OR over the floors)
+        occupied_above = np.zeros_like(occupied)
+        occupied_above[:-1] = np.logical_or.accumulate(occupied[::-1], axis=0)[::-1][1:]
+        # Whether there is anything on the same cell in the floor immediately below
+        occupied_below = np.zeros_like(occupied)
+        occupied_below[1:] = occupied[:-1]
+        object_underneath_grid = occupied_below & (grid != cls.NODE_HOLE)
+
+        # Whether each cell's neighbours are inside the labyrinth, used to determine which sides of the walls are facing inside
+        inside = np.isin(grid, list(cls.NODES_INSIDE))
+        east_inside_grid = np.zeros_like(inside)
+        east_inside_grid[:, :, :-1] = inside[:, :, 1:]
+        west_inside_grid = np.zeros_like(inside)
+        west_inside_grid[:, :, 1:] = inside[:, :, :-1]
+        south_inside_grid = np.zeros_like(inside)
+        south_inside_grid[:, :-1, :] = inside[:, 1:, :]
+        north_inside_grid = np.zeros_like(inside)
+        north_inside_grid[:, 1:, :] = inside[:, :-1, :]
+
+        # Only the cells that end up with a block need to be visited
+        for idx, y_idx, x_idx in zip(*np.nonzero(occupied | object_underneath_grid)):
+            idx, y_idx, x_idx = int(idx), int(y_idx), int(x_idx)
+            object_type = grid[idx, y_idx, x_idx]
+            block = None
+            block_args = {
+                'cell': (x_idx, y_idx),
+                'floor_index': idx,
+            }
+
+            object_underneath: bool = bool(object_underneath_grid[idx, y_idx, x_idx])
+            object_ontop: bool = bool(occupied_above[idx, y_idx, x_idx])
+
+            if object_type == cls.NODE_WALL_H:
+                block = Wall(**block_args, **cls.ATTRIBUTES_WALL_H, color=wall_color)
+
+            elif object_type == cls.NODE_WINDOW_H:
+                block = Window(**block_args, **cls.ATTRIBUTES_WALL_H)
+
+            elif object_type == cls.NODE_WALL_V:
+                block = Wall(**block_args, **cls.ATTRIBUTES_WALL_V, color=wall_color)
+            
+            elif object_type == cls.NODE_WINDOW_V:
+                block = Window(**block_args, **cls.ATTRIBUTES_WALL_V)
+
+            elif object_type == cls.NODE_PILLAR:
+                block = Pillar(**block_args, **cls.ATTRIBUTES_PILLAR, color=pillar_color)
+            
+            elif object_type == cls.NODE_START:
+                position = get_position(x_idx, y_idx, idx)
+                length_to_center = cls.DIMS_WALL_LENGTH / 2
+                start_pos = (position[0] + length_to_center, position[1] + length_to_center, position[2] + cls.DIMS_FLOOR_HEIGHT)   # not sure why only center Y, but works
+                # Create a floor underneath
+                block = Floor(**block_args, **cls.ATTRIBUTES_FLOOR_MIDDLE, strictly_roof=False, color=floor_color)
+            
+            elif object_type == cls.NODE_FINISH:
+                finish_pos = get_position(x_idx, y_idx, idx)
+
+                if (x_idx % 2) == 1:
+                    block = TriggerWall(**block_args, **cls.ATTRIBUTES_WALL_H)
                 
-                if block is not None:
-                    block.position = get_position(x_idx, y_idx, idx + 1)   # evil usage of 'idx' left from the previous loop
-                    blocks.append(block)
+                elif (y_idx % 2) == 1:
+                    block = TriggerWall(**block_args, **cls.ATTRIBUTES_WALL_V)
+
+            elif object_type == cls.NODE_FLOOR or object_underneath:
+                
+                # Whether or not this is strictly a roof, and so not meant to be a walkable floor
+                block_args['strictly_roof'] = object_type not in cls.NODES_FLOOR and object_underneath and not object_ontop
+                block = Floor(**block_args, **cls.floor_attributes(x_idx, y_idx))
+                block.color = floor_color
+
+            if block is not None:
+                position = get_position(x_idx, y_idx, idx)
+                block.position = position
+                
+                if isinstance(block, Pillar) or isinstance(block, TriggerWall):
+                    # Add an extra floor block below
+                    blocks.append(Floor(
+                        **block_args,
+                        **cls.ATTRIBUTES_FLOOR_PILLAR,
+                        strictly_roof=False,
+                        position=position,
+                        color=floor_color,
+                    ))
+
+                    # Account for the fact that there is floor below
+                    block.position = (position[0], position[1], position[2] + cls.DIMS_FLOOR_HEIGHT)
+
+                if isinstance(block, Wall):
+                    # Add an extra floor block below
+                    attrs = cls.ATTRIBUTES_FLOOR_WALL_H if object_type in cls.NODES_H else cls.ATTRIBUTES_FLOOR_WALL_V
+                    rampart_block = Floor(
+                        **block_args,
+                        **attrs,
+                        strictly_roof=False,
+                        position=position,
+                        color=floor_color,
+                    )
+                    blocks.append(rampart_block)
+
+                    # Account for the fact that there is floor below
+                    block.position = (position[0], position[1], position[2] + cls.DIMS_FLOOR_HEIGHT)
+
+                    # Determine which sides of the wall are facing inside the labyrinth
+                    block.east_inside  = bool(east_inside_grid[idx, y_idx, x_idx])
+                    block.west_inside  = bool(west_inside_grid[idx, y_idx, x_idx])
+                    block.south_inside = bool(south_inside_grid[idx, y_idx, x_idx])
+                    block.north_inside = bool(north_inside_grid[idx, y_idx, x_idx])
+
+                blocks.append(block)
+        
+        # Roof, covering any node of the last floor
+        idx = n_floors - 1
+        for y_idx, x_idx in zip(*np.nonzero(occupied[idx])):
+            y_idx, x_idx = int(y_idx), int(x_idx)
+            block = Floor(
+                cell=(x_idx, y_idx),
+                floor_index=idx + 1,
+                strictly_roof=True,
+                **cls.floor_attributes(x_idx, y_idx),
+                color=floor_color,
+            )
+            block.position = get_position(x_idx, y_idx, idx + 1)
+            blocks.append(block)
 
         # Optimize the blocks, to avoid many unnecessary repetitions
         blocks = cls.merge_blocks(blocks)
         print('Number of blocks:', len(blocks))
 
         return Labyrinth(
-            blocks=blocks,
+            block_table=BlockTable.from_blocks(blocks),
             width=labyrinth_width,
             height=labyrinth_height,
             depth=labyrinth_depth,
             start_pos=start_pos,
             finish_pos=finish_pos,
-            n_floors=idx + 1,
-            walls=[block for block in blocks if isinstance(block, Wall)],
-            windows=[block for block in blocks if isinstance(block, Window)],
-            floors=[block for block in blocks if isinstance(block, Floor)],
-            pillars=[block for block in blocks if isinstance(block, Pillar)],
+            n_floors=n_floors,
         )
 
 
     @classmethod
-    def from_map_file(cls, path: str, debug: bool=False) -> 'Labyrinth':
+    def map_grid(cls, floor_layouts: List[List[str]]) -> np.ndarray:
+        """Stack the floor layouts into a character grid with shape (floors, rows, columns), padded with empty nodes."""
+        n_rows = max(len(floor_layout) for floor_layout in floor_layouts)
+        n_cols = max(len(row) for floor_layout in floor_layouts for row in floor_layout)
+
+        grid = np.full((len(floor_layouts), n_rows, n_cols), cls.NODE_EMPTY, dtype='<U1')
+        for idx, floor_layout in enumerate(floor_layouts):
+            for y_idx, row in enumerate(floor_layout):
+                grid[idx, y_idx, :len(row)] = np.frombuffer(row.encode('utf-32-le'), dtype='<U1')
+
+        return grid
+
+
+    @classmethod
+    def floor_attributes(cls, x_idx: int, y_idx: int) -> Dict[str, float]:
+        """Get the dimensions of a floor block that fills the cell."""
+        # Middle floor
+        if (x_idx % 2) == 1 and (y_idx % 2) == 1:
+            return cls.ATTRIBUTES_FLOOR_MIDDLE
+
+        # Horizontal floor
+        elif (x_idx % 2) == 1:
+            return cls.ATTRIBUTES_FLOOR_WALL_H
+
+        # Vertical floor
+        elif (y_idx % 2) == 1:
+            return cls.ATTRIBUTES_FLOOR_WALL_V
+
+        # Pillar floor
+        else:
+            return cls.ATTRIBUTES_FLOOR_PILLAR
+
+
+    @classmethod
+    def from_map_file(cls, path: str, debug: bool=False, use_cache: bool=True) -> 'Labyrinth':
         content = None
         with open(path, 'rt') as map_file:
             content = map_file.read()
 
-        return Labyrinth.from_map_string(content, debug)
+        if not use_cache:
+            return Labyrinth.from_map_string(content, debug)
+
+        cache_path = path + CACHE_EXTENSION
+        cache_key = cls.cache_key(content, debug)
+
+        labyrinth = cls.load_cache(cache_path, cache_key)
+        if labyrinth is None:
+            labyrinth = Labyrinth.from_map_string(content, debug)
+            try:
+                labyrinth.save_cache(cache_path, cache_key)
+            except OSError as e:
+                print('Could not write the labyrinth cache:', e)
+
+        return labyrinth
+
+
+    @classmethod
+    def cache_key(cls, map_str: str, debug: bool=False) -> str:
+        """Hash of everything that the compiled labyrinth depends on: the map's content, the block dimensions and the debug colors."""
+        dims = {name: getattr(cls, name) for name in dir(cls) if name.startswith('DIMS_')}
+        key = json.dumps([CACHE_VERSION, dims, debug, map_str], sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+
+    def save_cache(self, path: str, key: str):
+        """
+        Write the compiled labyrinth into a binary file, which is made of a JSON header followed by the raw arrays:
+        the block table (see `BLOCK_TABLE_DTYPE`) and the vertex buffer with the baked vertices of the blocks.
+        """
+        block_table, vertices = self.block_table.to_structured()
+        arrays = {
+            'blocks': block_table,
+            'vertices': vertices,
+        }
+
+        header = {
+            'key': key,
+            'width': self.width,
+            'height': self.height,
+            'depth': self.depth,
+            'start_pos': self.start_pos,
+            'finish_pos': self.finish_pos,
+            'n_floors': self.n_floors,
+            'textures': self.block_table.textures,
+            'arrays': {},
+        }
+
+        # The header holds the offset of each array, which depends on the header's size, so leave enough room for it
+        header_size = len(json.dumps(header)) + 1024
+        offset = len(CACHE_MAGIC) + 8 + header_size
+        for name, array in arrays.items():
+            offset += -offset % CACHE_ALIGNMENT
+            header['arrays'][name] = {'dtype': np.lib.format.dtype_to_descr(array.dtype), 'shape': array.shape, 'offset': offset}
+            offset += array.nbytes
+        
+        header_bytes = json.dumps(header).encode().ljust(header_size)
+
+        # Write into a temporary file first, so that a cache is never left half-written
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as cache_file:
+            cache_file.write(CACHE_MAGIC)
+            cache_file.write(len(header_bytes).to_bytes(8, 'little'))
+            cache_file.write(header_bytes)
+            for name, array in arrays.items():
+                cache_file.write(b'\0' * (header['arrays'][name]['offset'] - cache_file.tell()))
+                cache_file.write(array.tobytes())
+        os.replace(temporary_path, path)
+
+
+    @classmethod
+    def load_cache(cls, path: str, key: str) -> 'Labyrinth':
+        """
+        Load a compiled labyrinth, memory-mapping its arrays. Returns `None` if there is no cache, if it doesn't match the `key`,
+        or if it can't be read (such as a truncated file), in which case the map should be parsed again.
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as cache_file:
+                if cache_file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return None
+                header_size = int.from_bytes(cache_file.read(8), 'little')
+                header = json.loads(cache_file.read(header_size))
+
+            if header['key'] != key:
+                return None
+
+            arrays = {
+                name: np.memmap(path, mode='r', dtype=np.lib.format.descr_to_dtype(info['dtype']), shape=tuple(info['shape']), offset=info['offset'])
+                for name, info in header['arrays'].items()
+            }
+
+            return Labyrinth(
+                block_table=BlockTable.from_structured(arrays['blocks'], header['textures'], arrays['vertices']),
+                width=header['width'],
+                height=header['height'],
+                depth=header['depth'],
+                start_pos=tuple(header['start_pos']) if header['start_pos'] is not None else None,
+                finish_pos=tuple(header['finish_pos']) if header['finish_pos'] is not None else None,
+                n_floors=header['n_floors'],
+            )
+        except (ValueError, KeyError, OSError):
+            return None
 
 
     @classmethod
     def merge_blocks(cls, blocks: List['LabyrinthBlock']) -> List['LabyrinthBlock']:
+        """
+        Greedily merge adjacent blocks of the same kind and with the same attributes into larger rectangles, in both axes.
+        Faces that are completely covered by neighbouring opaque blocks are hidden as well, since they can never be seen.
+        """
         merged = []
 
-        # Merge the floors
-        floors: Dict[int, List[Floor]] = {}
+        # Blocks on the same layer span the same heights, and each one occupies a single cell
+        layers: Dict[int, Dict[Tuple[int, int], LabyrinthBlock]] = {}
+        # Cells that are completely filled by an opaque block, which hides the faces of the blocks that touch them
+        opaque_cells: Dict[int, Set[Tuple[int, int]]] = {}
         for block in blocks:
-            if isinstance(block, Floor):
-                floors.setdefault(block.floor_index, []).append(block)
+            layer = cls.block_layer(block)
+            layer_cells = layers.setdefault(layer, {})
+            
+            if not cls.fills_cell(block) or block.cell in layer_cells:
+                # Don't merge the blocks that don't fit the map grid
+                merged.append(block)
+                continue
 
-        merged.extend(cls.merge_horizontal_blocks(floors,
-            # they have to be in adjacent cells and have the same attributes
-            merge_key=lambda x_block1, x_block0: (x_block1[0] - x_block0[0]) == 1 and x_block1[1].same_attributes(x_block0[1]),
-            # get the span of cell x coordinates, and also a model block whose attributes will be used
-            merge_method=lambda x_blocks: (set(x for x, block in x_blocks), x_blocks[0][1]),
-        ))
+            layer_cells[block.cell] = block
+            if not block.is_transparent():
+                opaque_cells.setdefault(layer, set()).add(block.cell)
 
-        # Don't merge the rest
-        for block in blocks:
-            floors_to_merge = floors[block.floor_index] if block.floor_index in floors else []
-            if block not in floors_to_merge:
-                merged.append(block)
+        for layer, layer_cells in layers.items():
+            used = set()
+            for cell in sorted(layer_cells, key=lambda cell: (cell[1], cell[0])):
+                if cell in used:
+                    continue
+                
+                x0, y0 = cell
+                model_block = layer_cells[cell]
+                is_free = lambda cell: cell in layer_cells and cell not in used
+
+                # Extend along X as far as possible
+                x1 = x0
+                while is_free((x1 + 1, y0)) and cls.can_merge(model_block, layer_cells[(x1 + 1, y0)]):
+                    x1 += 1
+                    model_block = cls.merge_model(model_block, layer_cells[(x1, y0)])
+
+                # Extend along Y while the whole row can be merged
+                y1 = y0
+                while True:
+                    row_model_block = model_block
+                    for x in range(x0, x1 + 1):
+                        if not is_free((x, y1 + 1)) or not cls.can_merge(row_model_block, layer_cells[(x, y1 + 1)]):
+                            row_model_block = None
+                            break
+                        row_model_block = cls.merge_model(row_model_block, layer_cells[(x, y1 + 1)])
+
+                    if row_model_block is None:
+                        break
+                    y1 += 1
+                    model_block = row_model_block
+                
+                parts = [layer_cells[(x, y)] for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+                used.update(part.cell for part in parts)
+
+                if len(parts) == 1:
+                    merged_block = parts[0]
+                else:
+                    first_block = layer_cells[(x0, y0)]
+                    merged_block = copy.copy(model_block)
+                    merged_block.cell = first_block.cell
+                    merged_block.width = sum(layer_cells[(x, y0)].width for x in range(x0, x1 + 1))
+                    merged_block.depth = sum(layer_cells[(x0, y)].depth for y in range(y0, y1 + 1))
+                    merged_block.position = first_block.position
+                    merged_block.parts = parts
+                    merged_block._vertices = None
+
+                merged_block.hidden_faces = cls.hidden_faces(x0, x1, y0, y1, opaque_cells.get(layer, set()), opaque_cells.get(layer - 1, set()), opaque_cells.get(layer + 1, set()))
+                merged.append(merged_block)
 
         return merged
 
 
     @classmethod
-    def merge_horizontal_blocks(cls, blocks_at_floor: Dict[int, List['Parallelepiped']], merge_key, merge_method) -> List['Parallelepiped']:
-        merged = []
-        for _, floor_blocks in blocks_at_floor.items():
-            # Try to create horizontal strips
-            horizontal_strips = []
-
-            horizontal_spans = {}
-            for block in floor_blocks:
-                x, y = block.cell
-                horizontal_spans.setdefault(y, []).append((x, block))
-
-            # Resolve breaks, as there may be holes in the spans
-            for y, x_blocks in horizontal_spans.items():
-                horizontal_spans[y] = cls.merge_values(
-                    values=x_blocks,
-                    # sort by the cell x coordinate
-                    sort_key=lambda x_block: x_block[0],
-                    merge_key=merge_key,
-                    merge_method=merge_method,
-                )
-
-            for y, x_spans in horizontal_spans.items():
-                for x_span, model_block in x_spans:
-                    floor_blocks_at_span = [block for block in floor_blocks if block.cell[0] in x_span and block.cell[1] == y]
-
-                    merged_floor = copy.copy(model_block)
-                    merged_floor.width = sum(block.width for block in floor_blocks_at_span)
-                    merged_floor.position = (min(block.position[0] for block in floor_blocks_at_span), model_block.position[1], model_block.position[2])
-                    horizontal_strips.append(merged_floor)
-
-            merged.extend(horizontal_strips)
-        
-        return merged
+    def block_layer(cls, block: 'LabyrinthBlock') -> int:
+        """The layer of heights that the block spans: the floor slab of each floor, and then the walls above it."""
+        return 2 * block.floor_index + (0 if isinstance(block, Floor) else 1)
 
 
     @classmethod
-    def merge_values(cls, values: List[Any],
-            sort_key: Callable[[Any, Any], bool],
-            merge_key: Callable[[Any, Any], bool],
-            merge_method: Callable[[List[Any]], Any]) -> List[Any]:
-        """
-        Merge a continuous stream of values sorted according to `sort_key`.
-        Values are considered mergeable according to `merge_key`, and each list of values to merge will be merged according to `merge_method`.
-        """
-        
-        merged = []
-        to_merge = []
-        prev_v = None
-        for v in sorted(values, key=sort_key):
-            if prev_v is not None and not merge_key(v, prev_v):
-                merged.append(merge_method(to_merge))
-                to_merge.clear()
-            to_merge.append(v)
-            prev_v = v
-        
-        # Leftover
-        merged.append(merge_method(to_merge))
+    def fills_cell(cls, block: 'LabyrinthBlock') -> bool:
+        x, y = block.cell
+        cell_width = cls.DIMS_WALL_THIN if x % 2 == 0 else cls.DIMS_WALL_LENGTH
+        cell_depth = cls.DIMS_WALL_THIN if y % 2 == 0 else cls.DIMS_WALL_LENGTH
+        return block.width == cell_width and block.depth == cell_depth
 
-        return merged
+
+    @classmethod
+    def can_merge(cls, block1: 'LabyrinthBlock', block2: 'LabyrinthBlock') -> bool:
+        merge_kind = block1.merge_kind()
+        return merge_kind is not None and merge_kind == block2.merge_kind() \
+            and block1.texture == block2.texture \
+            and block1.color == block2.color \
+            and block1.tiling_factors == block2.tiling_factors \
+            and block1.same_attributes(block2)
+
+
+    @classmethod
+    def merge_model(cls, model_block: 'LabyrinthBlock', block: 'LabyrinthBlock') -> 'LabyrinthBlock':
+        """Choose which block's attributes the merged block will have. Pillars give way to walls, since they don't have attributes of their own."""
+        return block if isinstance(model_block, Pillar) and not isinstance(block, Pillar) else model_block
+
+
+    @classmethod
+    def hidden_faces(cls, x0: int, x1: int, y0: int, y1: int,
+            opaque_cells: Set[Tuple[int, int]],
+            opaque_cells_below: Set[Tuple[int, int]],
+            opaque_cells_above: Set[Tuple[int, int]]) -> Set[str]:
+        """Get the faces of the rectangle of cells `[x0, x1] x [y0, y1]` that are completely covered by opaque cells."""
+        xs, ys = range(x0, x1 + 1), range(y0, y1 + 1)
+        rectangle = [(x, y) for y in ys for x in xs]
+        covered = {
+            'bottom':   all(cell in opaque_cells_below for cell in rectangle),
+            'top':      all(cell in opaque_cells_above for cell in rectangle),
+            'left':     all((x0 - 1, y) in opaque_cells for y in ys),
+            'right':    all((x1 + 1, y) in opaque_cells for y in ys),
+            'back':     all((x, y1 + 1) in opaque_cells for x in xs),
+            'front':    all((x, y0 - 1) in opaque_cells for x in xs),
+        }
+        return {face for face, is_covered in covered.items() if is_covered}
+
+
+
+# Templates of the unit box's vertices, whose entries are indices into a palette of values that is built for each box
+# (see Parallelepiped.batch_box_vertices). They are built only once, and then gathered for all boxes at the same time.
+_O, _I, _NI, _X, _Y, _Z, _UX, _UY, _VY, _VZ, _NUX, _NUY, _NVY, _R, _G, _B, _A = range(17)
+
+# Clockwise order
+_BOX_TEMPLATE_VERTICES = [
+    # BOTTOM
+    [_O, _O, _O,  _O, _VY],
+    [_O, _Y, _O,  _O,  _O],
+    [_X, _Y, _O, _UX,  _O],
+
+    [_O, _O, _O,  _O, _VY],
+    [_X, _Y, _O, _UX,  _O],
+    [_X, _O, _O, _UX, _VY],
+
+    # TOP
+    [_O, _O, _Z,  _O,  _O],
+    [_X, _Y, _Z, _UX, _VY],
+    [_O, _Y, _Z,  _O, _VY],
+
+    [_O, _O, _Z,  _O,  _O],
+    [_X, _O, _Z, _UX,  _O],
+    [_X, _Y, _Z, _UX, _VY],
+
+    # LEFT
+    [_O, _Y, _Z,  _O, _VZ],
+    [_O, _Y, _O,  _O,  _O],
+    [_O, _O, _Z, _UY, _VZ],
+
+    [_O, _Y, _O,  _O,  _O],
+    [_O, _O, _O, _UY,  _O],
+    [_O, _O, _Z, _UY, _VZ],
+
+    # RIGHT
+    [_X, _O, _Z,  _O, _VZ],
+    [_X, _Y, _O, _UY,  _O],
+    [_X, _Y, _Z, _UY, _VZ],
+
+    [_X, _O, _Z,  _O, _VZ],
+    [_X, _O, _O,  _O,  _O],
+    [_X, _Y, _O, _UY,  _O],
+
+    # BACK
+    [_O, _Y, _Z, _UX, _VZ],
+    [_X, _Y, _Z,  _O, _VZ],
+    [_O, _Y, _O, _UX,  _O],
+
+    [_X, _Y, _Z,  _O, _VZ],
+    [_X, _Y, _O,  _O,  _O],
+    [_O, _Y, _O, _UX,  _O],
+
+    # FRONT
+    [_O, _O, _O,  _O,  _O],
+    [_X, _O, _Z, _UX, _VZ],
+    [_O, _O, _Z,  _O, _VZ],
+
+    [_O, _O, _O,  _O,  _O],
+    [_X, _O, _O, _UX,  _O],
+    [_X, _O, _Z, _UX, _VZ],
+]
+
+_BOX_TEMPLATE_NORMALS = [
+    [ _O,  _O, _NI],   # BOTTOM
+    [ _O,  _O,  _I],   # TOP
+    [_NI,  _O,  _O],   # LEFT
+    [ _I,  _O,  _O],   # RIGHT
+    [ _O,  _I,  _O],   # BACK
+    [ _O, _NI,  _O],   # FRONT
+]
+
+# Tangent and binormal vectors are needed for bump mapping: https://discourse.panda3d.org/t/custom-geometry-and-bump-mapping-bts-space/24256/3
+_BOX_TEMPLATE_TANGENTS = [
+    [ _UX,    _O, _O],   # BOTTOM
+    [ _UX,    _O, _O],   # TOP
+    [  _O, _NUY,  _O],   # LEFT
+    [  _O,  _UY,  _O],   # RIGHT
+    [_NUX,    _O, _O],   # BACK
+    [ _UX,    _O, _O],   # FRONT
+]
+
+_BOX_TEMPLATE_BINORMALS = [
+    [_O, _NVY,    _O],   # BOTTOM
+    [_O,  _VY,    _O],   # TOP
+    [_O,    _O, _NVY],   # LEFT
+    [_O,    _O,  _VY],   # RIGHT
+    [_O,    _O,  _VY],   # BACK
+    [_O,    _O,  _VY],   # FRONT
+]
+
+# Same columns as the vertices generated for each box: position, texture coordinates, color, normal, tangent and binormal
+BOX_TEMPLATE = np.hstack([
+    _BOX_TEMPLATE_VERTICES,
+    np.repeat([[_R, _G, _B, _A]], len(_BOX_TEMPLATE_VERTICES), axis=0),
+    np.repeat(_BOX_TEMPLATE_NORMALS, 6, axis=0),
+    np.repeat(_BOX_TEMPLATE_TANGENTS, 6, axis=0),
+    np.repeat(_BOX_TEMPLATE_BINORMALS, 6, axis=0),
+])
+
+
+def _index_box_template() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the 4 distinct vertices of each face of the box template, as rows of `BOX_TEMPLATE`,
+    and the face's 2 triangles as indices into its own 4 vertices, for each face.
+    """
+    face_vertices, face_triangles = [], []
+    for face_start in range(0, len(BOX_TEMPLATE), 6):
+        distinct = {}
+        triangles = []
+        for row in range(face_start, face_start + 6):
+            distinct.setdefault(tuple(BOX_TEMPLATE[row]), row)
+            triangles.append(list(distinct).index(tuple(BOX_TEMPLATE[row])))
+        face_vertices.extend(distinct.values())
+        face_triangles.append(triangles)
+    return np.array(face_vertices), np.array(face_triangles)
+
+
+# Indexed version of the box template, with 24 vertices instead of 36
+BOX_INDEXED_VERTICES, BOX_INDEXED_TRIANGLES = _index_box_template()
+BOX_INDEXED_TEMPLATE = BOX_TEMPLATE[BOX_INDEXED_VERTICES]
 
 
 
 class Parallelepiped:
-    width:      float
-    height:     float
-    depth:      float
-    vertices:   np.ndarray
-    position:   Tuple[float, float, float]
-    texture:    str
+    width:          float
+    height:         float
+    depth:          float
+    vertices:       np.ndarray
+    position:       Tuple[float, float, float]
+    texture:        str
+    hidden_faces:   Set[str]
+
+    # In the same order as they are generated
+    FACES = ('bottom', 'top', 'left', 'right', 'back', 'front')
 
 
     def __init__(self, width: float, height: float, depth: float,
@@ -427,130 +735,106 @@ class Parallelepiped:
         self.texture = texture
         self.color = color
         self.tiling_factors = tiling_factors
+        self.hidden_faces = set()
     
         self._vertices = None
 
 
     def generate_vertices(self) -> np.ndarray:
-        r, g, b, a = self.color
+        self._vertices = self.box_vertices(self.width, self.height, self.depth, self.color, self.tiling_factors, self.hidden_faces)
+
+
+    @classmethod
+    def box_vertices(cls, width: float, height: float, depth: float,
+            color: Tuple[float, float, float, float],
+            tiling_factors: Tuple[float, float],
+            hidden_faces: Set[str]) -> np.ndarray:
+        tiling_factors = tiling_factors if tiling_factors is not None else (np.nan, np.nan)
+        vertices = cls.batch_box_vertices([width], [height], [depth], [color], [tiling_factors])[0]
+
+        if hidden_faces:
+            vertices = vertices[cls.visible_vertices_mask([hidden_faces])[0]]
+
+        return vertices
+
+
+    @classmethod
+    def batch_box_vertices(cls, widths: np.ndarray, heights: np.ndarray, depths: np.ndarray,
+            colors: np.ndarray,
+            tiling_factors: np.ndarray,
+            template: np.ndarray=BOX_TEMPLATE) -> np.ndarray:
+        """
+        Generate the vertices of N boxes at once, as an array with shape (N, 36, 18) (or as many vertices as the `template` has).
+        The tiling factors have shape (N, 2), and are NaN for the boxes whose textures are not tiled.
+        """
         # Panda3D uses the geographical coordinate system, where XY is on the floor and Z is the height
         # (https://docs.panda3d.org/1.10/python/introduction/tutorial/loading-the-grassy-scenery)
-        x, y, z = self.width, self.depth, self.height
-        
+        x = np.asarray(widths, dtype=np.float64)
+        y = np.asarray(depths, dtype=np.float64)
+        z = np.asarray(heights, dtype=np.float64)
+        colors = np.asarray(colors, dtype=np.float64).reshape(-1, 4)
+        tiling_factors = np.asarray(tiling_factors, dtype=np.float64).reshape(-1, 2)
+
         # Determine how textures should be tiled.
         # If the tiling factors are not specified, then the whole texture is mapped to the face.
         # Otherwise, the UVs are a factor of the object's dimensions.
-        if self.tiling_factors is not None:
-            u, v = self.tiling_factors
-            ux, uy = u*x, u*y
-            vy, vz = v*y, v*z
-        else:
-            ux, uy = 1, 1
-            vy, vz = 1, 1
-
-        # Clockwise order
-        vertices = np.array([
-            # BOTTOM
-            [0, 0, 0,  0, vy],
-            [0, y, 0,  0,  0],
-            [x, y, 0, ux,  0],
-
-            [0, 0, 0,  0, vy],
-            [x, y, 0, ux,  0],
-            [x, 0, 0, ux, vy],
-
-            # TOP
-            [0, 0, z,  0,  0],
-            [x, y, z, ux, vy],
-            [0, y, z,  0, vy],
-
-            [0, 0, z,  0,  0],
-            [x, 0, z, ux,  0],
-            [x, y, z, ux, vy],
-
-            # LEFT
-            [0, y, z,  0, vz],
-            [0, y, 0,  0,  0],
-            [0, 0, z, uy, vz],
-
-            [0, y, 0,  0,  0],
-            [0, 0, 0, uy,  0],
-            [0, 0, z, uy, vz],
-
-            # RIGHT
-            [x, 0, z,  0, vz],
-            [x, y, 0, uy,  0],
-            [x, y, z, uy, vz],
-
-            [x, 0, z,  0, vz],
-            [x, 0, 0,  0,  0],
-            [x, y, 0, uy,  0],
-
-            # BACK
-            [0, y, z, ux, vz],
-            [x, y, z,  0, vz],
-            [0, y, 0, ux,  0],
-
-            [x, y, z,  0, vz],
-            [x, y, 0,  0,  0],
-            [0, y, 0, ux,  0],
-
-            # FRONT
-            [0, 0, 0,  0,  0],
-            [x, 0, z, ux, vz],
-            [0, 0, z,  0, vz],
-
-            [0, 0, 0,  0,  0],
-            [x, 0, 0, ux,  0],
-            [x, 0, z, ux, vz],
-        ], 'f')
-
-        # Color each face with a different shade, mainly for debugging
-        color_cols = np.repeat([[r, g, b, a]], len(vertices), axis=0)
-        
-        normals = [
-            [ 0,  0, -1],   # BOTTOM
-            [ 0,  0,  1],   # TOP
-            [-1,  0,  0],   # LEFT
-            [ 1,  0,  0],   # RIGHT
-            [ 0,  1,  0],   # BACK
-            [ 0, -1,  0],   # FRONT
-        ]
-        normal_cols = np.vstack( [np.repeat([normal], 6, axis=0) for normal in normals] )
-
-        # Tangent and binormal vectors are needed for bump mapping: https://discourse.panda3d.org/t/custom-geometry-and-bump-mapping-bts-space/24256/3
-        tangents = [
-            [ ux,   0,  0],   # BOTTOM
-            [ ux,   0,  0],   # TOP
-            [  0, -uy,  0],   # LEFT
-            [  0,  uy,  0],   # RIGHT
-            [-ux,   0,  0],   # BACK
-            [ ux,   0,  0],   # FRONT
-        ]
-        tangent_cols = np.vstack( [np.repeat([tangent], 6, axis=0) for tangent in tangents] )
-
-        binormals = [
-            [ 0, -vy,   0],   # BOTTOM
-            [ 0,  vy,   0],   # TOP
-            [ 0,   0, -vy],   # LEFT
-            [ 0,   0,  vy],   # RIGHT
-            [ 0,   0,  vy],   # BACK
-            [ 0,   0,  vy],   # FRONT
-        ]
-        binormal_cols = np.vstack( [np.repeat([binormal], 6, axis=0) for binormal in binormals] )
-
-        self._vertices = np.hstack([ vertices, color_cols, normal_cols, tangent_cols, binormal_cols ])
+        u, v = tiling_factors[:, 0], tiling_factors[:, 1]
+        is_tiled = ~np.isnan(u)
+        ux, uy = np.where(is_tiled, u*x, 1), np.where(is_tiled, u*y, 1)
+        vy, vz = np.where(is_tiled, v*y, 1), np.where(is_tiled, v*z, 1)
+
+        zeros, ones = np.zeros_like(x), np.ones_like(x)
+        palette = np.stack([zeros, ones, -ones, x, y, z, ux, uy, vy, vz, -ux, -uy, -vy, *colors.T], axis=1)
+
+        vertices = palette[:, template]
+        # Positions and texture coordinates are single precision, like the rest ends up being on the GPU
+        vertices[:, :, :5] = vertices[:, :, :5].astype(np.float32)
+
+        return vertices
+
+
+    @classmethod
+    def batch_indexed_box_vertices(cls, widths: np.ndarray, heights: np.ndarray, depths: np.ndarray,
+            colors: np.ndarray,
+            tiling_factors: np.ndarray,
+            visible_faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Generate the vertices of N boxes at once with 4 vertices per face, along with the indices of their triangles.
+        Only the faces in `visible_faces`, with shape (N, 6), are generated.
+        """
+        vertices = cls.batch_box_vertices(widths, heights, depths, colors, tiling_factors, template=BOX_INDEXED_TEMPLATE)
+        vertices = vertices.reshape(len(vertices), len(cls.FACES), 4, -1)[visible_faces].reshape(-1, BOX_TEMPLATE.shape[1])
+
+        face_kinds = np.broadcast_to(np.arange(len(cls.FACES)), visible_faces.shape)[visible_faces]
+        indices = 4 * np.arange(len(face_kinds))[:, None] + BOX_INDEXED_TRIANGLES[face_kinds]
+
+        return vertices, indices.ravel()
+
+
+    @classmethod
+    def visible_vertices_mask(cls, hidden_faces: List[Set[str]]) -> np.ndarray:
+        """Get which of the 36 vertices of each box are not in the hidden faces, as an array with shape (N, 36)."""
+        visible_faces = np.array([[face not in faces for face in cls.FACES] for faces in hidden_faces], dtype=bool).reshape(-1, len(cls.FACES))
+        return np.repeat(visible_faces, 6, axis=1)
 
 
     def get_vertices(self) -> np.ndarray:
         if self._vertices is None:
             self.generate_vertices()
         return self._vertices
+
+
+    def get_indexed_vertices(self, cull_hidden_faces: bool=True) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the box's vertices with 4 per face, along with the indices of its triangles. The hidden faces can optionally be kept."""
+        tiling_factors = self.tiling_factors if self.tiling_factors is not None else (np.nan, np.nan)
+        visible_faces = np.array([[not cull_hidden_faces or face not in self.hidden_faces for face in self.FACES]])
+        return self.batch_indexed_box_vertices([self.width], [self.height], [self.depth], [self.color], [tiling_factors], visible_faces)
     
 
 class LabyrinthBlock(Parallelepiped):
     cell:           Tuple[int, int]
     floor_index:    int
+    parts:          List['LabyrinthBlock']
 
     def __init__(self,
             cell: Tuple[int, int],
@@ -561,6 +845,22 @@ class LabyrinthBlock(Parallelepiped):
 
         self.cell = cell
         self.floor_index = floor_index
+        # The blocks of the map that were merged into this one, if any
+        self.parts = None
+
+    def get_parts(self) -> List['LabyrinthBlock']:
+        """Get the blocks of the map that make up this block."""
+        return self.parts if self.parts is not None else [self]
+
+    def is_transparent(self) -> bool:
+        return False
+
+    def merge_kind(self) -> str:
+        """Blocks can only be merged with others of the same kind. If `None`, the block is never merged."""
+        return None
+
+    def same_attributes(self, other: 'LabyrinthBlock') -> bool:
+        return True
 
 
 class Floor(LabyrinthBlock):
@@ -577,6 +877,9 @@ class Floor(LabyrinthBlock):
 
         self.strictly_roof = strictly_roof
 
+    def merge_kind(self) -> str:
+        return 'floor'
+
     def same_attributes(self, other: 'Floor') -> bool:
         return self.strictly_roof == other.strictly_roof
 
@@ -604,7 +907,14 @@ class Wall(LabyrinthBlock):
         self.south_inside = south_inside
         self.north_inside = north_inside
     
-    def same_attributes(self, other: 'Wall') -> bool:
+    def merge_kind(self) -> str:
+        return 'wall'
+
+    def same_attributes(self, other: 'LabyrinthBlock') -> bool:
+        # Pillars join walls together, and don't face any side
+        if isinstance(other, Pillar):
+            return True
+
         return self.east_inside == other.east_inside \
             and self.west_inside == other.west_inside \
             and self.south_inside == other.south_inside \
@@ -618,6 +928,9 @@ class TriggerWall(LabyrinthBlock):
 
         super().__init__(*args, **kwargs)
 
+    def is_transparent(self) -> bool:
+        return True
+
 
 class Pillar(LabyrinthBlock):
 
@@ -627,6 +940,9 @@ class Pillar(LabyrinthBlock):
 
         super().__init__(*args, **kwargs)
 
+    def merge_kind(self) -> str:
+        return 'wall'
+
 
 class Window(Wall):
 
@@ -636,7 +952,381 @@ class Window(Wall):
 
         super().__init__(*args, **kwargs)
 
+    def is_transparent(self) -> bool:
+        return True
+
+    def merge_kind(self) -> str:
+        return 'window'
+
+
+
+# Order in which the block types are encoded in the compiled labyrinth
+BLOCK_TYPES = (Floor, Wall, Window, Pillar, TriggerWall)
+
+BLOCK_TABLE_DTYPE = np.dtype([
+    ('type',            np.uint8),
+    ('parent',          np.int32),      # index of the block that this one was merged into, or -1
+    ('cell',            np.int32, 2),
+    ('floor_index',     np.int32),
+    ('position',        np.float64, 3),
+    ('dims',            np.float64, 3), # width, height and depth
+    ('color',           np.float64, 4),
+    ('tiling_factors',  np.float64, 2), # NaN if there are no tiling factors
+    ('texture',         np.int16),      # index into the header's textures, or -1
+    ('hidden_faces',    np.uint8),      # bitmask over Parallelepiped.FACES
+    ('strictly_roof',   np.bool_),
+    ('inside',          np.bool_, 4),   # east, west, south and north
+    ('vertices',        np.int64, 2),   # start and number of rows in the vertex buffer
+])
+
+
+
+class BlockTable:
+    """
+    Columnar storage of the labyrinth's blocks, with one NumPy array per field of `BLOCK_TABLE_DTYPE`.
+    Each block that makes up the labyrinth is followed by the blocks of the map that were merged into it (its parts).
+    """
+    columns:    Dict[str, np.ndarray]
+    textures:   List[str]
+    vertices:   np.ndarray
+
+
+    def __init__(self, columns: Dict[str, np.ndarray], textures: List[str], vertices: np.ndarray=None):
+        self.columns = columns
+        self.textures = textures
+        # Baked vertices of the blocks, indexed by the 'vertices' column. If not present, they are generated on demand
+        self.vertices = vertices
+
+        n_rows = len(self)
+        self._top_level = np.flatnonzero(columns['parent'] == -1)
+        # Rows up to which the parts of each block go (exclusive). Parts don't have parts of their own
+        self._parts_end = np.arange(1, n_rows + 1)
+        self._parts_end[self._top_level] = np.append(self._top_level[1:], n_rows)
+
+
+    def __len__(self) -> int:
+        return len(self.columns['type'])
+
+
+    @classmethod
+    def from_blocks(cls, blocks: List['LabyrinthBlock']) -> 'BlockTable':
+        rows = []
+        for block in blocks:
+            parent = len(rows)
+            rows.append((block, -1))
+            if block.parts is not None:
+                rows.extend((part, parent) for part in block.parts)
+
+        textures = sorted({block.texture for block, _ in rows if block.texture is not None})
+        face_bits = {face: 1 << face_idx for face_idx, face in enumerate(Parallelepiped.FACES)}
+        
+        values = {name: [] for name in BLOCK_TABLE_DTYPE.names}
+        for block, parent in rows:
+            values['type'].append(BLOCK_TYPES.index(type(block)))
+            values['parent'].append(parent)
+            values['cell'].append(block.cell)
+            values['floor_index'].append(block.floor_index)
+            values['position'].append(block.position)
+            values['dims'].append((block.width, block.height, block.depth))
+            values['color'].append(block.color)
+            values['tiling_factors'].append(block.tiling_factors if block.tiling_factors is not None else (np.nan, np.nan))
+            values['texture'].append(textures.index(block.texture) if block.texture is not None else -1)
+            values['hidden_faces'].append(sum(face_bits[face] for face in block.hidden_faces))
+            values['strictly_roof'].append(isinstance(block, Floor) and block.strictly_roof)
+            values['inside'].append((block.east_inside, block.west_inside, block.south_inside, block.north_inside) if isinstance(block, Wall) else (False,) * 4)
+            values['vertices'].append((0, 0))
+
+        columns = {
+            name: np.array(values[name], dtype=BLOCK_TABLE_DTYPE[name].base).reshape((len(rows),) + BLOCK_TABLE_DTYPE[name].shape)
+            for name in BLOCK_TABLE_DTYPE.names
+        }
+
+        return BlockTable(columns, textures)
+
+
+    @classmethod
+    def from_structured(cls, block_table: np.ndarray, textures: List[str], vertices: np.ndarray=None) -> 'BlockTable':
+        return BlockTable({name: np.array(block_table[name]) for name in BLOCK_TABLE_DTYPE.names}, textures, vertices)
+
+
+    def to_structured(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the table as a structured array, along with the baked vertices that its 'vertices' column refers to."""
+        if self.vertices is None:
+            self.bake_vertices()
+
+        block_table = np.zeros(len(self), dtype=BLOCK_TABLE_DTYPE)
+        for name, column in self.columns.items():
+            block_table[name] = column
+
+        return block_table, self.vertices
+
+
+    def to_blocks(self) -> List['LabyrinthBlock']:
+        """Build the full block objects again, for code that needs them."""
+        blocks = []
+        for view in self.views():
+            block = view.to_block()
+            if view.has_parts():
+                block.parts = [part.to_block() for part in view.get_parts()]
+            blocks.append(block)
+
+        return blocks
+
+
+    def bake_vertices(self, chunk_size: int=4096):
+        """
+        Generate the vertices of all the labyrinth's blocks into a single buffer.
+        The boxes are generated in batches, gathering the vertices of many blocks at once from the box templates.
+        """
+        top_level = self._top_level
+        visible = self.visible_vertices_mask(top_level)
+        n_vertices = visible.sum(axis=1, dtype=np.int64)
+
+        self.columns['vertices'][top_level, 0] = np.cumsum(n_vertices) - n_vertices
+        self.columns['vertices'][top_level, 1] = n_vertices
+        self.vertices = np.empty((int(n_vertices.sum()), BOX_TEMPLATE.shape[1]), dtype=np.float32)
+
+        vertex_start = 0
+        for chunk_start in range(0, len(top_level), chunk_size):
+            chunk = top_level[chunk_start:chunk_start + chunk_size]
+            dims = self.columns['dims'][chunk]
+            vertices = Parallelepiped.batch_box_vertices(dims[:, 0], dims[:, 1], dims[:, 2],
+                colors=self.columns['color'][chunk],
+                tiling_factors=self.columns['tiling_factors'][chunk])
+            vertices = vertices[visible[chunk_start:chunk_start + chunk_size]]
+            self.vertices[vertex_start:vertex_start + len(vertices)] = vertices
+            vertex_start += len(vertices)
+
+
+    def visible_faces(self, indices: np.ndarray) -> np.ndarray:
+        """Get which of the faces of each of the given blocks are not hidden, with shape (N, 6)."""
+        face_bits = 1 << np.arange(len(Parallelepiped.FACES), dtype=np.uint8)
+        return (self.columns['hidden_faces'][indices, None] & face_bits) == 0
+
+
+    def visible_vertices_mask(self, indices: np.ndarray) -> np.ndarray:
+        """Get which of the 36 box vertices of each of the given blocks are not in hidden faces, with shape (N, 36)."""
+        return np.repeat(self.visible_faces(indices), 6, axis=1)
+
+
+    def generate_vertices(self, index: int) -> np.ndarray:
+        width, height, depth = self.columns['dims'][index].tolist()
+        tiling_factors = self.columns['tiling_factors'][index].tolist()
+        return Parallelepiped.box_vertices(width, height, depth,
+            color=tuple(self.columns['color'][index].tolist()),
+            tiling_factors=tuple(tiling_factors) if not np.isnan(tiling_factors[0]) else None,
+            hidden_faces=self.hidden_faces(index))
+
+
+    def get_vertices(self, index: int) -> np.ndarray:
+        """Get the vertices of a block, which is a view into the baked buffer for the top-level blocks."""
+        if self.columns['parent'][index] == -1:
+            if self.vertices is None:
+                self.bake_vertices()
+            vertex_start, n_vertices = self.columns['vertices'][index].tolist()
+            return self.vertices[vertex_start:vertex_start + n_vertices]
+        return self.generate_vertices(index)
+
+
+    def get_indexed_vertices(self, index: int, cull_hidden_faces: bool=True) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the vertices of a block with 4 per face, along with the indices of its triangles. The hidden faces can optionally be kept."""
+        dims = self.columns['dims'][index:index + 1]
+        visible_faces = self.visible_faces([index]) if cull_hidden_faces else np.ones((1, len(Parallelepiped.FACES)), dtype=bool)
+        vertices, indices = Parallelepiped.batch_indexed_box_vertices(dims[:, 0], dims[:, 1], dims[:, 2],
+            colors=self.columns['color'][index:index + 1],
+            tiling_factors=self.columns['tiling_factors'][index:index + 1],
+            visible_faces=visible_faces)
+        return vertices.astype(np.float32), indices
+
+
+    def hidden_faces(self, index: int) -> Set[str]:
+        hidden_faces = int(self.columns['hidden_faces'][index])
+        return {face for face_idx, face in enumerate(Parallelepiped.FACES) if hidden_faces & (1 << face_idx)}
+
+
+    def mask(self, block_type: type=None, floor_index: int=None, include_parts: bool=False) -> np.ndarray:
+        """Select the rows with blocks of the given type (including subclasses) and at the given floor."""
+        mask = np.ones(len(self), dtype=bool) if include_parts else self.columns['parent'] == -1
+        if block_type is not None:
+            mask &= np.isin(self.columns['type'], [code for code, table_type in enumerate(BLOCK_TYPES) if issubclass(table_type, block_type)])
+        if floor_index is not None:
+            mask &= self.columns['floor_index'] == floor_index
+        return mask
+
+
+    def view(self, index: int) -> 'BlockView':
+        return BLOCK_VIEW_TYPES[self.columns['type'][index]](self, int(index))
+
+
+    def views(self, mask: np.ndarray=None) -> List['BlockView']:
+        indices = self._top_level if mask is None else np.flatnonzero(mask)
+        return [self.view(index) for index in indices]
+
+
+    def parts(self, index: int) -> range:
+        return range(index + 1, self._parts_end[index])
+
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values()) + (self.vertices.nbytes if self.vertices is not None else 0)
+
+
+
+class BlockView:
+    """Lightweight view of a row of a `BlockTable`, with the same attributes as the block that it was built from."""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: BlockTable, index: int):
+        self.table = table
+        self.index = index
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BlockView) and other.table is self.table and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.table), self.index))
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(index={self.index}, cell={self.cell}, floor_index={self.floor_index})'
+
+    @property
+    def cell(self) -> Tuple[int, int]:
+        return tuple(self.table.columns['cell'][self.index].tolist())
+
+    @property
+    def floor_index(self) -> int:
+        return int(self.table.columns['floor_index'][self.index])
+
+    @property
+    def position(self) -> Tuple[float, float, float]:
+        return tuple(self.table.columns['position'][self.index].tolist())
+
+    @property
+    def width(self) -> float:
+        return float(self.table.columns['dims'][self.index, 0])
+
+    @property
+    def height(self) -> float:
+        return float(self.table.columns['dims'][self.index, 1])
+
+    @property
+    def depth(self) -> float:
+        return float(self.table.columns['dims'][self.index, 2])
+
+    @property
+    def color(self) -> Tuple[float, float, float, float]:
+        return tuple(self.table.columns['color'][self.index].tolist())
+
+    @property
+    def tiling_factors(self) -> Tuple[float, float]:
+        tiling_factors = self.table.columns['tiling_factors'][self.index].tolist()
+        return tuple(tiling_factors) if not np.isnan(tiling_factors[0]) else None
+
+    @property
+    def texture(self) -> str:
+        texture = self.table.columns['texture'][self.index]
+        return self.table.textures[texture] if texture >= 0 else None
+
+    @property
+    def hidden_faces(self) -> Set[str]:
+        return self.table.hidden_faces(self.index)
+
+    def has_parts(self) -> bool:
+        return len(self.table.parts(self.index)) > 0
+
+    def get_parts(self) -> List['BlockView']:
+        """Get the blocks of the map that make up this block."""
+        return [self.table.view(index) for index in self.table.parts(self.index)] if self.has_parts() else [self]
+
+    def get_vertices(self) -> np.ndarray:
+        return self.table.get_vertices(self.index)
+
+    def get_indexed_vertices(self, cull_hidden_faces: bool=True) -> Tuple[np.ndarray, np.ndarray]:
+        return self.table.get_indexed_vertices(self.index, cull_hidden_faces)
+
+    def is_transparent(self) -> bool:
+        return False
+
+    def block_kwargs(self) -> Dict[str, Any]:
+        return {
+            'cell': self.cell,
+            'floor_index': self.floor_index,
+            'width': self.width,
+            'height': self.height,
+            'depth': self.depth,
+            'position': self.position,
+            'color': self.color,
+            'tiling_factors': self.tiling_factors,
+            'texture': self.texture,
+        }
+
+    def to_block(self) -> 'LabyrinthBlock':
+        block = BLOCK_TYPES[self.table.columns['type'][self.index]](**self.block_kwargs())
+        block.hidden_faces = self.hidden_faces
+        return block
+
+
+class FloorView(BlockView):
+    __slots__ = ()
+
+    @property
+    def strictly_roof(self) -> bool:
+        return bool(self.table.columns['strictly_roof'][self.index])
+
+    def block_kwargs(self) -> Dict[str, Any]:
+        return {**super().block_kwargs(), 'strictly_roof': self.strictly_roof}
+
+
+class WallView(BlockView):
+    __slots__ = ()
+
+    @property
+    def east_inside(self) -> bool:
+        return bool(self.table.columns['inside'][self.index, 0])
+
+    @property
+    def west_inside(self) -> bool:
+        return bool(self.table.columns['inside'][self.index, 1])
+
+    @property
+    def south_inside(self) -> bool:
+        return bool(self.table.columns['inside'][self.index, 2])
+
+    @property
+    def north_inside(self) -> bool:
+        return bool(self.table.columns['inside'][self.index, 3])
+
+    def block_kwargs(self) -> Dict[str, Any]:
+        return {
+            **super().block_kwargs(),
+            'east_inside': self.east_inside,
+            'west_inside': self.west_inside,
+            'south_inside': self.south_inside,
+            'north_inside': self.north_inside,
+        }
+
+
+class WindowView(WallView):
+    __slots__ = ()
+
+    def is_transparent(self) -> bool:
+        return True
+
+
+class PillarView(BlockView):
+    __slots__ = ()
+
+
+class TriggerWallView(BlockView):
+    __slots__ = ()
+
+    def is_transparent(self) -> bool:
+        return True
+
 
+# Views of each of the BLOCK_TYPES
+BLOCK_VIEW_TYPES = (FloorView, WallView, WindowView, PillarView, TriggerWallView)
 
 if __name__ == '__main__':
     scene = Labyrinth.from_map_string('test1.map')
\ No newline at end of file
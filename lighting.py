@@ -0,0 +1,123 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+from panda3d.core import NodePath
+
+import numpy as np
+
+
+# The auto shader generates a shader for each combination of lights, so the number of lights on a node is kept small
+MAX_LIGHTS_PER_NODE = 4
+
+# Fractal Brownian motion of value noise that makes the flashlight flicker, as it was in the flashlight shader
+FLICKER_OCTAVES = 10
+FLICKER_LACUNARITY = 8.0
+FLICKER_GAIN = 0.5
+FLICKER_OFFSET = 0.9
+
+
+class LightBindings:
+    """
+    Keeps track of the nodes that each light is set on, so that a moving light only changes the nodes it enters or leaves.
+    Each node has at most `max_lights_per_node` of these lights. When a node is full, the lights that reach it wait for it,
+    and are set on it in the order they arrived as soon as another light leaves it (even the lights that don't move anymore).
+    """
+
+    def __init__(self, max_lights_per_node: int = MAX_LIGHTS_PER_NODE):
+        self.max_lights_per_node = max_lights_per_node
+        self.light_nodes: Dict[NodePath, Set[NodePath]] = defaultdict(set)
+        self.node_lights: Dict[NodePath, List[NodePath]] = defaultdict(list)
+        # The lights that reached a full node, and the nodes that each light is waiting for
+        self.node_waiting: Dict[NodePath, List[NodePath]] = defaultdict(list)
+        self.light_waiting: Dict[NodePath, Set[NodePath]] = defaultdict(set)
+
+    def update(self, light: NodePath, nodes: Iterable[NodePath]):
+        """Make `light` affect the `nodes`, and no longer the ones it affected before."""
+        lit_nodes = self.light_nodes[light]
+        waiting_nodes = self.light_waiting[light]
+        nodes = set(nodes)
+
+        for node in waiting_nodes - nodes:
+            self.stop_waiting(light, node)
+
+        for node in lit_nodes - nodes:
+            self.unbind(light, node)
+
+        for node in nodes - lit_nodes - waiting_nodes:
+            if len(self.node_lights[node]) < self.max_lights_per_node:
+                self.bind(light, node)
+            else:
+                self.node_waiting[node].append(light)
+                waiting_nodes.add(node)
+
+    def remove(self, light: NodePath):
+        for node in list(self.light_waiting.get(light, ())):
+            self.stop_waiting(light, node)
+        for node in list(self.light_nodes.get(light, ())):
+            self.unbind(light, node)
+        self.light_nodes.pop(light, None)
+        self.light_waiting.pop(light, None)
+
+    def forget(self, node: NodePath):
+        """Stop keeping track of a node that was removed from the scene, freeing it from the lights that affected it."""
+        for light in self.node_lights.pop(node, []):
+            self.light_nodes[light].discard(node)
+        for light in self.node_waiting.pop(node, []):
+            self.light_waiting[light].discard(node)
+
+    def bind(self, light: NodePath, node: NodePath):
+        node.setLight(light)
+        node.show()
+        self.light_nodes[light].add(node)
+        self.node_lights[node].append(light)
+
+    def unbind(self, light: NodePath, node: NodePath):
+        node.clearLight(light)
+        self.light_nodes[light].discard(node)
+        self.node_lights[node].remove(light)
+        # The light that has been waiting the longest takes its place
+        waiting = self.node_waiting.get(node)
+        if waiting:
+            next_light = waiting.pop(0)
+            self.light_waiting[next_light].discard(node)
+            if not waiting:
+                del self.node_waiting[node]
+            self.bind(next_light, node)
+        elif not self.node_lights[node]:
+            del self.node_lights[node]
+
+    def stop_waiting(self, light: NodePath, node: NodePath):
+        self.light_waiting[light].discard(node)
+        self.node_waiting[node].remove(light)
+        if not self.node_waiting[node]:
+            del self.node_waiting[node]
+
+
+def _smoothstep(edge0: float, edge1: float, x: np.ndarray) -> np.ndarray:
+    t = np.clip((x - edge0) / np.float32(edge1 - edge0), 0, 1)
+    return t * t * (3 - 2 * t)
+
+
+def _random(x: np.ndarray) -> np.ndarray:
+    # From the book of shaders: https://thebookofshaders.com/10/, for points (x, 0)
+    value = np.sin(x * np.float32(12.9898)) * np.float32(43758.5453123)
+    return value - np.floor(value)
+
+
+def flicker_noise(time) -> np.ndarray:
+    """
+    Noise of the flashlight's flicker at `time` (in seconds since the start, a number or an array), once per frame
+    instead of once per pixel in the shader. It is computed in single precision like the shader did, at the point (time, 0),
+    where the noise only interpolates between the corners of each cell on the x axis. Its hash amplifies the rounding of `sin`,
+    so it doesn't always give the same noise as a GPU would, but GPUs don't agree with each other there either.
+    """
+    time = np.asarray(time, dtype=np.float32)[..., np.newaxis]
+    frequency = np.float32(FLICKER_LACUNARITY) ** np.arange(FLICKER_OCTAVES, dtype=np.float32)
+    amplitude = np.float32(FLICKER_GAIN) ** np.arange(FLICKER_OCTAVES, dtype=np.float32)
+    interval = np.float32(1) / frequency
+
+    step = interval * np.floor(time / interval)
+    interp = time / interval
+    interp -= np.floor(interp)
+    weight = _smoothstep(0.01, 0.99, interp)
+    noise = _random(step) * (1 - weight) + _random(step + interval) * weight
+    return (amplitude * noise).sum(axis=-1, dtype=np.float32) - np.float32(FLICKER_OFFSET)
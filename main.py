@@ -1,20 +1,38 @@
+import contextlib
+import hashlib
+import json
 import os
+import struct
 import time
 import argparse
 import random
+import sys
 
-from typing import Dict, Tuple
+import numpy as np
+
+from typing import Callable, Dict, List, Tuple
 from direct.showbase.ShowBase import ShowBase
 from direct.filter.FilterManager import FilterManager
 from direct.task import Task
 from panda3d.core import *
 
 from CustomObject3D import CustomObject3D
-from Player import Player
-from mobs import Bird, Spider
-from labyrinth import TEXTURE_WALL, Floor, Parallelepiped, Labyrinth, TriggerWall, Wall, Window
+from Player import LIGHT_DISTANCE_THRESHOLD, Player
+from mobs import Bird, Spider, SpiderSwarm
+from labyrinth import TEXTURE_WALL, BlockView, Parallelepiped, Labyrinth
 
 from common import *
+from grid_collisions import GridCollisionHandler, GridCollisions
+from lighting import MAX_LIGHTS_PER_NODE, LightBindings, flicker_noise
+from models import ModelRegistry
+from profiling import FrameProfiler, StartupProfiler
+from resolution import RESOLUTION_MIN_SCALE, RESOLUTION_SHARPNESS, RESOLUTION_TARGET_FPS, ResolutionScaler
+from shading import ShaderCache, warm_up_shaders
+from shadows import SHADOW_BUDGET, ShadowScheduler
+from simulation import SIMULATION_TIMESTEP, KeyboardInput, ScriptedInput
+from spatial import SpatialIndex
+from spawns import SPAWN_PLAN_EXTENSION, SPAWN_SPIDER, SPAWN_TABLE, load_or_plan_spawns
+from streaming import STREAMING_BUDGET, STREAMING_RADIUS, FloorGeometry, FloorStreamer, build_floor_collisions, build_floor_geometry, geometry_nbytes
 from objects import Table, SpotlightOBJ
 
 WIDTH = 800
@@ -67,6 +85,8 @@ MOON_PATH = "models/moon/moon2.obj"
 MOON_LIGHT_INTENSITY = 0.25
 MOON_SELF_LIGHT_INTENSITY = 0.9
 GRASS_SCALE = 100
+# Number of tiles along each side of the grass
+GRASS_TILES = 20
 GRASS_FOG_DENSITY = 0.002
 GRASS_HEIGHT = -30
 
@@ -86,10 +106,43 @@ depth-bits 24
 
 class ExplorerApp(ShowBase):
 
-    labyrinth_block_nodes: Dict[Parallelepiped, NodePath] = {}
-
-    def __init__(self, labyrinth_file: str, debug_opts: dict):
+    labyrinth_block_nodes: Dict[BlockView, NodePath] = {}
+    # Only filled for the baked labyrinth, where many blocks share the same node: the node and the range of vertex rows of each block
+    labyrinth_block_ranges: Dict[BlockView, Tuple[NodePath, int, int]] = {}
+
+    def __init__(self, labyrinth_file: str, debug_opts: dict, baked: bool = False, use_map_cache: bool = True, indexed: bool = False, face_culling: bool = True, grid_collisions: bool = False,
+                 seed: int = None, spawn_seed: int = None, stream_opts: dict = None, render_opts: dict = None, profiler: StartupProfiler = None, frame_profiler: FrameProfiler = None):
+        # Everything random (the spawns, the spiders' movement and the random events) uses the same generator
+        if seed is not None:
+            random.seed(seed)
+
+        # Measures the phases of the startup, if enabled
+        self.profiler = profiler if profiler is not None else StartupProfiler(enabled=False)
+        # Measures the sections of each frame, if enabled
+        self.frame_profiler = frame_profiler if frame_profiler is not None else FrameProfiler(enabled=False)
+        self.profiler.start('showbase')
         ShowBase.__init__(self)
+        self.profiler.track_loader(self.loader)
+        # Each model is loaded once, and the spawned objects are instances of it
+        self.models = ModelRegistry(self.loader)
+
+        self.BAKED_LABYRINTH = baked
+        self.USE_MAP_CACHE = use_map_cache
+        self.INDEXED_GEOMETRY = indexed
+        self.CULL_HIDDEN_FACES = face_culling
+        self.GRID_COLLISIONS = grid_collisions
+        # The spawns are random each time, unless their seed is fixed
+        self.SPAWN_SEED = spawn_seed
+        # The floors of the labyrinth are loaded as the player gets near them, instead of all at startup
+        self.STREAMING_OPTS = stream_opts or {}
+        self.STREAMING = self.STREAMING_OPTS.get('floors', False)
+        # The scene is rendered below the window's resolution when the frames take too long, and sharpened when upscaled
+        self.RENDER_OPTS = render_opts or {}
+        self.DYNAMIC_RESOLUTION = self.RENDER_OPTS.get('dynamic_resolution', False)
+        # Set on the roofs as they are attached, once the lights are created
+        self.roof_light = None
+        # The floors that are attached again once the player exists get the lights that the player placed on them
+        self.player = None
 
         self.previous_mouse_pos = None
         self.set_background_color(*SKY_COLOR)
@@ -106,7 +159,9 @@ class ExplorerApp(ShowBase):
         # set window size
         props = WindowProperties()
         props.setSize(WIDTH, HEIGHT)
-        self.win.requestProperties(props)
+        # The headless simulation renders into an offscreen buffer instead, which is sized in the configuration
+        if isinstance(self.win, GraphicsWindow):
+            self.win.requestProperties(props)
 
         # camera variables
         self.camera_pos = [0, 180, 0]
@@ -137,6 +192,7 @@ class ExplorerApp(ShowBase):
 
         self.init_models()
 
+        self.profiler.start('lights')
         # Lighting
         # Create Ambient Light
         ambient_light_intensity = AMBIENT_LIGHT_INTENSITY
@@ -151,8 +207,9 @@ class ExplorerApp(ShowBase):
         directional_light.direction = Vec3(0, 0, -0.5)
         dlnp = self.render.attachNewNode(directional_light)
 
+        self.roof_light = dlnp
         for floor in self.labyrinth.floors:
-            if floor.strictly_roof:
+            if floor.strictly_roof and floor in self.labyrinth_block_nodes:
                 self.labyrinth_block_nodes[floor].setLight(dlnp)
         self.bird.model.setLight(dlnp)
         
@@ -173,15 +230,35 @@ class ExplorerApp(ShowBase):
 
         # Task management
         self.mouse_coords = [0, 0]
+        self.keyboard_input = KeyboardInput(self.mouseWatcherNode)
+        self.is_finished = False
         self.accept('tab', self.change_camera_focus)
         self.taskMgr.add(self.update_mouse_coords_task, 'update_mouse_coords_task')
         self.taskMgr.add(self.read_inputs_task, 'read_inputs_task')
+        if self.STREAMING:
+            self.taskMgr.add(self.stream_floors_task, 'stream_floors_task')
 
         self.quad_filter = None
         self.flashlight_power = FLASHLIGHT_POWER
         self.flashlight_flicker = 0
         self.start_time = time.time()   # avoid providing extremelly large numbers to the shaders, since GLSL acts funky with those (in sin() for instance), so send time since app launch
+        self.profiler.start('shaders')
+        self.shader_cache = ShaderCache()
         self.setupShaders()
+        self.shader_warm_up = None
+        if self.RENDER_OPTS.get('shader_warm_up', False):
+            self.profiler.start('shader_warm_up')
+            # The player's lights are the ones that are set on the labyrinth's nodes as the game goes
+            self.shader_warm_up = warm_up_shaders(self, self.labyrinth_np, [light for _, light in self.player.lights], MAX_LIGHTS_PER_NODE)
+            self.render.prepareScene(self.win.getGsg())
+            self.shader_cache.prepare(self.win.getGsg())
+        # The shadow maps of the player's lights are only rendered when something moves near them
+        self.shadow_scheduler = ShadowScheduler(self.win.getGsg(), self.labyrinth_np, budget=self.RENDER_OPTS.get('shadow_budget', SHADOW_BUDGET))
+        for _, light in self.player.lights:
+            self.shadow_scheduler.add(light, LIGHT_DISTANCE_THRESHOLD)
+        # Before the frame is rendered
+        self.taskMgr.add(self.shadow_schedule_task, 'shadow_schedule_task', sort=45)
+        self.profiler.stop()
 
         # inputs
         self.is_light_toogle = False
@@ -228,6 +305,7 @@ class ExplorerApp(ShowBase):
         return task.cont
         
     def init_models(self):
+        self.profiler.start('player')
         player_model: NodePath = self.loader.loadModel(self.path_p3d / 'models/player/amongus_flat.obj')
         for material in player_model.find_all_materials():
             material.set_ambient(material.get_diffuse())
@@ -238,23 +316,36 @@ class ExplorerApp(ShowBase):
         # Create collision node
         player_collider_node = CollisionNode("Player")
         
-        player_collider_node.addSolid(CollisionCapsule(0, 0, 1, 0, 0, 2, 1))
+        capsule_bottom, capsule_top, capsule_radius = 1, 2, 1
+        player_collider_node.addSolid(CollisionCapsule(0, 0, capsule_bottom, 0, 0, capsule_top, capsule_radius))
         player_collider = player_model.attachNewNode(player_collider_node)
         player_collider.setHpr(0, -90, 0)
         if self.DEBUG_COLLISIONS:
             player_collider.show()
 
-        self.player = Player(player_model, player_position, self.labyrinth_np, scale=player_scale)
+        self.player = Player(player_model, player_position, self.labyrinth_np, scale=player_scale, spatial_index=self.spatial_index, light_bindings=self.light_bindings)
         self.player_position = player_position
         
-        self.pusher.addCollider(player_collider, self.player.model)
-        self.cTrav.addCollider(player_collider, self.pusher)
+        if self.GRID_COLLISIONS:
+            # Bounding box of the capsule, which is upright since the collider's and the model's rotations cancel out
+            radius = capsule_radius * player_scale[0]
+            self.player_collision_handler = GridCollisionHandler(GridCollisions(self.labyrinth), 'Player',
+                offset_min=(-radius, -radius, (capsule_bottom - capsule_radius) * player_scale[2]),
+                offset_max=(radius, radius, (capsule_top + capsule_radius) * player_scale[2]))
+            self.player_previous_pos = tuple(self.player.model.getPos())
+            # After the player is moved by the inputs
+            self.taskMgr.add(self.grid_collisions_task, 'grid_collisions_task', sort=1)
+        else:
+            self.pusher.addCollider(player_collider, self.player.model)
+            self.cTrav.addCollider(player_collider, self.pusher)
         move_camera(self.camera, self.camera_zoom, self.camera_pos, self.camera_focus)
     
         # create bird
+        self.profiler.start('bird')
         self.bird = Bird([player_position[0] + 5, player_position[1], player_position[2]], self.labyrinth_np, self)
         
         # create moon
+        self.profiler.start('moon')
         moon_model = self.loader.loadModel(self.path_p3d / MOON_PATH)
         moon_position = LPoint3(-125, 300, 75)
         moon_scale = [5 for _ in range(3)]
@@ -275,32 +366,28 @@ class ExplorerApp(ShowBase):
         self.moon.model.setLight(pn)
         
         # create grass
+        self.profiler.start('grass')
         self.grasses = []
         
         grass_color_texture = self.loader.loadTexture(self.path_p3d / GRASS_COLOR_TEXTURE_PATH)
         grass_height_texture = self.loader.loadTexture(self.path_p3d / GRASS_HEIGHT_TEXTURE_PATH)
         grass_normal_texture = self.loader.loadTexture(self.path_p3d / GRASS_NORMAL_TEXTURE_PATH)
 
-        for i in range(-10, 10):
-            for j in range(-10, 10):
-                grass_plane = generateGeometry(Parallelepiped(GRASS_SCALE, 0, GRASS_SCALE), f'grass_{i}x{j}')
-
-                grass = self.labyrinth_np.attachNewNode(grass_plane)
-                grass.setPos(i * GRASS_SCALE, j * GRASS_SCALE, GRASS_HEIGHT)
-
-                grass.setTexture(grass_color_texture)
-
-                ts = TextureStage('Grass Height')
-                ts.setMode(TextureStage.MHeight)
-                grass.setTexture(ts, grass_height_texture)
-
-                ts = TextureStage('Grass Normal')
-                ts.setMode(TextureStage.MNormal)
-                grass.setTexture(ts, grass_normal_texture)
-                
-                self.grasses.append(grass)
+        grass_height_stage = TextureStage('Grass Height')
+        grass_height_stage.setMode(TextureStage.MHeight)
+        grass_normal_stage = TextureStage('Grass Normal')
+        grass_normal_stage.setMode(TextureStage.MNormal)
+
+        # A single mesh, with the textures repeated on each of its tiles
+        grass = self.labyrinth_np.attachNewNode(generateGroundGeometry(GRASS_SCALE, GRASS_TILES, 'grass'))
+        grass.setPos(-GRASS_TILES / 2 * GRASS_SCALE, -GRASS_TILES / 2 * GRASS_SCALE, GRASS_HEIGHT)
+        grass.setTexture(grass_color_texture)
+        grass.setTexture(grass_height_stage, grass_height_texture)
+        grass.setTexture(grass_normal_stage, grass_normal_texture)
+        self.grasses.append(grass)
         
         # create the lightning strike background
+        self.profiler.start('lightning_background')
         lightning_image = self.loader.loadTexture(self.path_p3d / LIGHTNING_BACKGROUND_TEXTURE_PATH)
         cm = CardMaker('lightning maker')
         cm.set_frame(0, LIGHTNING_BACKGROUND_SIZE, 0, LIGHTNING_BACKGROUND_SIZE * lightning_image.get_y_size() / lightning_image.get_x_size())
@@ -311,46 +398,46 @@ class ExplorerApp(ShowBase):
         self.lightning_strike_background.setTexture(lightning_image)
 
         # create spotlight object
+        self.profiler.start('spotlight')
         self.spotlight_obj = SpotlightOBJ([player_position[0] - 50, player_position[1] - 50, GRASS_HEIGHT], self.labyrinth_np, self,
                                           scale=[SPOTLIGHT_SCALE for _ in range(3)], look_at=LPoint3(0, 0, 0), grass_height=GRASS_HEIGHT, test=self.render)
     
         self.spotlight_obj.look_at(LPoint3(0, 0, GRASS_HEIGHT))
         
-    def init_objs(self, wall_obj: Wall, labyrinth_np: NodePath):
-        spider_scale = [Spider.SCALE * 1 for _ in range(3)]
-        table_scale = [0.025 for _ in range(3)]
-        table_distance = table_scale[0] * 20
-        if wall_obj.east_inside:
-            self.spawn_spider(wall_obj.position[0] + wall_obj.width, wall_obj.position[1] + wall_obj.depth / 2, wall_obj.position[2] + wall_obj.height / 2, 90, -90, 0, labyrinth_np, spider_scale, (0,1,1), wall_obj)
-            self.spawn_obj(wall_obj.position[0] + wall_obj.width + table_distance, wall_obj.position[1] + wall_obj.depth / 2, wall_obj.position[2], -90, 90, 0, labyrinth_np, table_scale)            
-
-        if wall_obj.west_inside:
-            self.spawn_spider(wall_obj.position[0], wall_obj.position[1] + wall_obj.depth / 2, wall_obj.position[2] + wall_obj.height / 2, 90, -90, 0, labyrinth_np, spider_scale, (0,1,1), wall_obj)
-            self.spawn_obj(wall_obj.position[0] - table_distance, wall_obj.position[1] + wall_obj.depth / 2, wall_obj.position[2], -90, 90, 0, labyrinth_np, table_scale)
-
-        if wall_obj.south_inside:
-            self.spawn_spider(wall_obj.position[0] + wall_obj.width / 2, wall_obj.position[1] + wall_obj.depth, wall_obj.position[2] + wall_obj.height / 2, 0, -90, 0, labyrinth_np, spider_scale, (1,0,1), wall_obj)
-            self.spawn_obj(wall_obj.position[0] + wall_obj.width / 2, wall_obj.position[1] + wall_obj.depth + table_distance, wall_obj.position[2], 180, 90, 0, labyrinth_np, table_scale)
-
-        if wall_obj.north_inside:
-            self.spawn_spider(wall_obj.position[0] + wall_obj.width / 2, wall_obj.position[1], wall_obj.position[2] + wall_obj.height / 2, 180, -90, 0, labyrinth_np, spider_scale, (1,0,1), wall_obj)
-            self.spawn_obj(wall_obj.position[0] + wall_obj.width / 2, wall_obj.position[1] - table_distance, wall_obj.position[2], 0, 90, 0, labyrinth_np, table_scale)
-
-    def spawn_spider(self, x, y, z, h, p, r, labyrinth_np, scale, movement_axis, wall):
-        spawn_chance = random.random()
-        if spawn_chance < SPIDER_SPAWN_CHANCE:
-            spider = Spider([x, y, z], labyrinth_np, self, scale=scale, movement_axis=movement_axis, wall_dimensions=(wall.width, wall.depth, wall.height))
-            spider.model.setHpr(h, p, r)
-
-            self.spiders.append(spider)
-            return spider
-    
-    def spawn_obj(self, x, y, z, h, p, r, labyrinth_np, scale):
-        spawn_chance = random.random()
-        if spawn_chance < OBJECT_SPAWN_CHANCE:
-            table = Table([x, y, z], labyrinth_np, self, scale=scale)
-            table.model.setHpr(h, p, r)
-            
+    def spawn_objects(self, floor_index: int, labyrinth_np: NodePath):
+        """Instantiate the spawn plan of a floor: the spiders one by one, and the tables in a node for each cell, which is lit as a whole by the lights near any of its tables."""
+        plan = self.spawn_plan[self.spawn_plan['floor_index'] == floor_index]
+        spiders = []
+        for spawn in plan[plan['kind'] == SPAWN_SPIDER]:
+            spider = Spider(spawn['position'].tolist(), labyrinth_np, self, scale=spawn['scale'].tolist(), movement_axis=tuple(spawn['movement_axis'].tolist()),
+                            wall_dimensions=tuple(spawn['wall_dims'].tolist()), vary_scale=False)
+            spider.model.setHpr(*spawn['hpr'].tolist())
+            spiders.append(spider)
+        self.spiders.extend(spiders)
+        self.floor_spiders[floor_index] = spiders
+        self.spider_swarm.add(spiders)
+
+        # The tables of each cell of the spatial index are batched together, so that a light only lights the tables near it
+        table_spawns = plan[plan['kind'] == SPAWN_TABLE]
+        table_cells = [self.spatial_index.box_cells(position, position)[0] for position in table_spawns['position'].tolist()]
+        for cell in dict.fromkeys(table_cells):
+            cell_spawns = table_spawns[[table_cell == cell for table_cell in table_cells]]
+            tables = self.models.batch(Table.MODEL_PATH, labyrinth_np, cell_spawns['position'], cell_spawns['hpr'], cell_spawns['scale'],
+                name=f'tables_{cell[0]}_{cell[1]}_floor_{floor_index}')
+            self.spatial_index.insert(tables, cell_spawns['position'].min(axis=0), cell_spawns['position'].max(axis=0))
+            self.floor_nodes.setdefault(floor_index, []).append(tables)
+
+    def grid_collisions_task(self, task):
+        self.resolve_grid_collisions()
+        return task.cont
+
+    def resolve_grid_collisions(self):
+        position = self.player.model.getPos()
+        resolved = self.player_collision_handler.move(self.labyrinth_np, self.player_previous_pos, position)
+        self.player.set_pos(*resolved)
+        self.player_previous_pos = resolved
+        self.player_collision_handler.send_events()
+
     def player_hit_ground(self, entity):
         is_bellow_player = entity.getSurfacePoint(self.player.model).getY() <= 0
         self.player.velocity[2] = 0
@@ -389,9 +476,11 @@ class ExplorerApp(ShowBase):
         self.quad_filter.setShaderInput('lightRadius', 1 / (self.camera_zoom**2 * (1 / FLASHLIGHT_RADIUS) / ZOOM_INITIAL**2))
 
     def read_inputs_task(self, task):
-        isDown = self.mouseWatcherNode.is_button_down
-        MouseWatcher
+        self.update_entities(self.keyboard_input.is_down, task.time)
+        return Task.cont
 
+    def update_entities(self, isDown: Callable[[str], bool], sim_time: float):
+        """Move the player according to the keys that are held down, and update the other entities up to `sim_time`."""
         #Player
         self.player.velocity[0] = 0
         self.player.velocity[1] = 0
@@ -405,17 +494,17 @@ class ExplorerApp(ShowBase):
         player_rotation = 0
         had_player_input = False
         
-        if isDown(KeyboardButton.asciiKey("a")):
+        if isDown('a'):
             self.player.velocity[horizontal_idx] -= PLAYER_SPEED * player_cos
             self.player.velocity[rev_horizontal_idx] -= PLAYER_SPEED * player_sin
             player_rotation += 90
             had_player_input = True
-        if isDown(KeyboardButton.asciiKey("d")):
+        if isDown('d'):
             self.player.velocity[horizontal_idx] += PLAYER_SPEED * player_cos 
             self.player.velocity[rev_horizontal_idx] += PLAYER_SPEED * player_sin
             player_rotation -= 90
             had_player_input = True
-        if isDown(KeyboardButton.asciiKey("w")):
+        if isDown('w'):
             self.player.velocity[vertical_idx] += PLAYER_SPEED * player_cos 
             self.player.velocity[rev_vertical_idx] -= PLAYER_SPEED * player_sin
             if player_rotation < 0:
@@ -423,7 +512,7 @@ class ExplorerApp(ShowBase):
             elif player_rotation > 0:
                 player_rotation -= 45
             had_player_input = True
-        if isDown(KeyboardButton.asciiKey("s")):
+        if isDown('s'):
             self.player.velocity[vertical_idx] -= PLAYER_SPEED * player_cos 
             self.player.velocity[rev_vertical_idx] += PLAYER_SPEED * player_sin
             if player_rotation > 0:
@@ -436,26 +525,29 @@ class ExplorerApp(ShowBase):
 
         self.player.rotation = self.camera_pos[0] + player_rotation if had_player_input else self.player.rotation
         
-        if isDown(KeyboardButton.space()):
+        if isDown('space'):
             if self.player.is_on_ground:
                 self.player.velocity[2] = PLAYER_JUMP_SPEED
                 self.player.is_on_ground = False
-        if isDown(KeyboardButton.asciiKey("f")):
+        if isDown('f'):
             if self.DEBUG_HIDE_UNLIT:
-                for np in self.labyrinth_np.children:
-                    np.hide()
+                for child in self.labyrinth_np.children:
+                    child.hide()
             self.player.put_light()
         
         # Update entities
+        self.frame_profiler.start('player')
         self.player.update()
         
-        for spider in self.spiders:
-            spider.update()
+        self.frame_profiler.start('spiders')
+        # Only the spiders in view have their transforms written back
+        self.spider_swarm.update(self.spider_swarm.visible_from(self.cam, self.labyrinth_np))
         
-        self.bird.update(task.time)
+        self.frame_profiler.start('bird')
+        self.bird.update(sim_time)
+        self.frame_profiler.start('spotlight')
         self.spotlight_obj.update()
-
-        return Task.cont
+        self.frame_profiler.stop()
 
     def toggle_light(self):
         self.flashlight_flicker = 1 - self.flashlight_flicker
@@ -494,49 +586,79 @@ class ExplorerApp(ShowBase):
 
     def generateLabyrinth(self, parent_node: NodePath, labyrinth_file: str) -> Tuple[NodePath, Labyrinth]:
         self.labyrinth_block_nodes.clear()
+        self.labyrinth_block_ranges.clear()
         # Keep track of textures used by the labyrinth's blocks, so we don't have to tell Panda3D to repeatedly load them
-        textures = {
+        self.labyrinth_textures = {
             LABYRINTH_WALL_HEIGHT_TEXTURE_PATH: self.loader.loadTexture(self.path_p3d / LABYRINTH_WALL_HEIGHT_TEXTURE_PATH)
         } 
+        # The same stage is shared by all blocks, so that they end up with the same render state
+        self.wall_height_stage = TextureStage('Wall Height')
+        self.wall_height_stage.setMode(TextureStage.MHeight)
         self.spiders = []
+        # Everything that was put in the scene for each floor, so that it can be unloaded when streaming the floors
+        self.floor_nodes: Dict[int, List[NodePath]] = {}
+        self.floor_spiders: Dict[int, List[Spider]] = {}
+        # Index of the nodes in the labyrinth, so that lights only go through their neighbouring cells
+        self.spatial_index = SpatialIndex()
+        self.light_bindings = LightBindings()
         labyrinth_np = parent_node.attachNewNode('Labyrinth')
-        labyrinth = Labyrinth.from_map_file(labyrinth_file, self.DEBUG_MAP)
-        labyrinth_blocks = [(block, generateGeometry(block, f'labyrinth_block_{idx}')) for idx, block in enumerate(labyrinth.blocks)]
-        if self.DEBUG_LOG: print('Number of walls:', len(labyrinth_blocks))
-        for block, block_geom in labyrinth_blocks:
-            block_node = labyrinth_np.attachNewNode(block_geom)
-            self.labyrinth_block_nodes[block] = block_node
-            
-            if block.texture is not None:
-                if block.texture not in textures:
-                    textures[block.texture] = self.loader.loadTexture(self.path_p3d / block.texture)
-                block_node.setTexture(textures[block.texture])
-                if block.texture == TEXTURE_WALL:
-                    ts = TextureStage('Wall Height')
-                    ts.setMode(TextureStage.MHeight)
-                    block_node.setTexture(ts, textures[LABYRINTH_WALL_HEIGHT_TEXTURE_PATH])
-            block_node.setPos(block.position)
-            
-            if isinstance(block, Window) or isinstance(block, TriggerWall):
-                block_node.setTransparency(True)
-            
-            if isinstance(block, Wall):
-                self.init_objs(block, labyrinth_np)
-            
-            is_ground = isinstance(block, Floor)
-            is_trigger = isinstance(block, TriggerWall)
-            node_name = "Ground" if is_ground else "TriggerWall" if is_trigger else "Wall"
-            wall_collider_node = CollisionNode(node_name)
-            wall_collider_node
-            # get center of the wall
-            wall_center = Point3(block.width / 2, block.depth / 2, block.height / 2)
-            wall_collider_node.addSolid(CollisionBox(wall_center,
-                                                    block.width / 2,
-                                                    block.depth / 2,
-                                                    block.height / 2))
-            wall_collider = block_node.attachNewNode(wall_collider_node)
-            if self.DEBUG_COLLISIONS:
-                wall_collider.show()
+        self.profiler.start('map_parsing')
+        labyrinth = Labyrinth.from_map_file(labyrinth_file, self.DEBUG_MAP, use_cache=self.USE_MAP_CACHE)
+        # The blocks of each floor, along with their index in the labyrinth
+        self.floor_blocks: Dict[int, List[Tuple[int, BlockView]]] = {}
+        for idx, block in enumerate(labyrinth.blocks):
+            self.floor_blocks.setdefault(block.floor_index, []).append((idx, block))
+
+        self.profiler.start('spawn_planning')
+        # Objects spawn along each of the map's walls, even if they were merged together.
+        # The plan only depends on the walls and the seed, so it's cached next to the map when the seed is fixed
+        spawn_seed = self.SPAWN_SEED if self.SPAWN_SEED is not None else random.getrandbits(64)
+        spawn_plan_path = labyrinth_file + SPAWN_PLAN_EXTENSION if self.SPAWN_SEED is not None and self.USE_MAP_CACHE else None
+        self.spawn_plan = load_or_plan_spawns(labyrinth.block_table, spawn_seed, SPIDER_SPAWN_CHANCE, OBJECT_SPAWN_CHANCE, spawn_plan_path)
+        # The spiders are all updated at once
+        self.spider_swarm = SpiderSwarm()
+
+        # Static collision geometry, as a bounding volume hierarchy for each floor and type of block.
+        # The leaves keep the names "Ground", "Wall" and "TriggerWall", which the collision events are named after.
+        # The grid collisions use the labyrinth's cells instead
+        if not self.GRID_COLLISIONS:
+            self.collisions_np = labyrinth_np.attachNewNode('labyrinth_collisions')
+
+        if self.STREAMING:
+            # The floors are built on another thread, which only reads the block table
+            if labyrinth.block_table.vertices is None:
+                labyrinth.block_table.bake_vertices()
+            floor_height = self.spatial_index.floor_height
+            self.floor_streamer = FloorStreamer(self.taskMgr,
+                floor_boxes=[(Point3(0, 0, floor_index * floor_height), Point3(labyrinth.width, labyrinth.depth, (floor_index + 1) * floor_height)) for floor_index in range(labyrinth.n_floors + 1)],
+                build=self.build_floor,
+                attach=lambda floor_index, floor: self.attach_floor(floor_index, floor, labyrinth_np),
+                detach=self.detach_floor,
+                size=lambda floor: geometry_nbytes([node for node, *_ in floor[0]]),
+                radius=self.STREAMING_OPTS.get('radius', STREAMING_RADIUS),
+                budget_bytes=self.STREAMING_OPTS.get('budget', STREAMING_BUDGET) * 2**20,
+                threaded=not self.STREAMING_OPTS.get('no_thread', False))
+
+            # Only the floors around the player are loaded before the first frame
+            self.profiler.start('labyrinth_geometry')
+            start_height = labyrinth.start_pos[2] if labyrinth.start_pos is not None else labyrinth.height
+            self.floor_streamer.load(self.floor_streamer.floor_range(self.spatial_index.floor_of(start_height)))
+
+        else:
+            self.profiler.start('labyrinth_geometry')
+            for floor_index, blocks in self.floor_blocks.items():
+                self.attach_floor_geometry(floor_index, build_floor_geometry(blocks, self.BAKED_LABYRINTH, self.INDEXED_GEOMETRY, self.CULL_HIDDEN_FACES), labyrinth_np)
+
+            if self.DEBUG_LOG: print('Number of labyrinth nodes:' if self.BAKED_LABYRINTH else 'Number of walls:', sum(len(nodes) for nodes in self.floor_nodes.values()))
+
+            self.profiler.start('object_spawning')
+            for floor_index in self.floor_blocks:
+                self.spawn_objects(floor_index, labyrinth_np)
+
+            self.profiler.start('collisions')
+            if not self.GRID_COLLISIONS:
+                for floor_index, blocks in self.floor_blocks.items():
+                    self.attach_floor_collisions(floor_index, build_floor_collisions(blocks))
 
         # Center the labyrinth to the origin
         labyrinth_np.setPos(
@@ -547,7 +669,77 @@ class ExplorerApp(ShowBase):
 
         return labyrinth_np, labyrinth
 
+    def build_floor(self, floor_index: int) -> Tuple[FloorGeometry, List[NodePath]]:
+        """Create the render and collision nodes of a floor, without touching the scene, so that it can run on the streaming thread."""
+        blocks = self.floor_blocks.get(floor_index, [])
+        geometry = build_floor_geometry(blocks, self.BAKED_LABYRINTH, self.INDEXED_GEOMETRY, self.CULL_HIDDEN_FACES)
+        collisions = build_floor_collisions(blocks) if not self.GRID_COLLISIONS else []
+        return geometry, collisions
+
+    def attach_floor(self, floor_index: int, floor: Tuple[FloorGeometry, List[NodePath]], labyrinth_np: NodePath):
+        geometry, collisions = floor
+        self.attach_floor_geometry(floor_index, geometry, labyrinth_np)
+        self.spawn_objects(floor_index, labyrinth_np)
+        self.attach_floor_collisions(floor_index, collisions)
+        # The placed lights don't move, so they are only bound to the floor's new nodes here
+        if self.player is not None:
+            self.player.bind_placed_lights()
+
+    def attach_floor_geometry(self, floor_index: int, geometry: FloorGeometry, labyrinth_np: NodePath):
+        def block_end(block: BlockView) -> Tuple[float, float, float]:
+            return (block.position[0] + block.width, block.position[1] + block.depth, block.position[2] + block.height)
+
+        for node, texture, is_transparent, is_roof, block_ranges in geometry:
+            node.reparentTo(labyrinth_np)
+            if texture is not None:
+                if texture not in self.labyrinth_textures:
+                    self.labyrinth_textures[texture] = self.loader.loadTexture(self.path_p3d / texture)
+                node.setTexture(self.labyrinth_textures[texture])
+                if texture == TEXTURE_WALL:
+                    node.setTexture(self.wall_height_stage, self.labyrinth_textures[LABYRINTH_WALL_HEIGHT_TEXTURE_PATH])
+            if is_transparent:
+                node.setTransparency(True)
+            # Roofs are lit by the moon
+            if is_roof and self.roof_light is not None:
+                node.setLight(self.roof_light)
+
+            for block, vertex_range in block_ranges.items():
+                self.labyrinth_block_nodes[block] = node
+                self.spatial_index.insert(node, block.position, block_end(block))
+                if vertex_range is not None:
+                    self.labyrinth_block_ranges[block] = (node, *vertex_range)
+            self.floor_nodes.setdefault(floor_index, []).append(node)
+
+    def attach_floor_collisions(self, floor_index: int, collisions: List[NodePath]):
+        for collision_np in collisions:
+            collision_np.reparentTo(self.collisions_np)
+            if self.DEBUG_COLLISIONS:
+                collision_np.findAllMatches('**/+CollisionNode').show()
+            self.floor_nodes.setdefault(floor_index, []).append(collision_np)
+
+    def detach_floor(self, floor_index: int):
+        """Remove everything of a floor from the scene, which can be built and attached again later."""
+        for _, block in self.floor_blocks.get(floor_index, []):
+            self.labyrinth_block_nodes.pop(block, None)
+            self.labyrinth_block_ranges.pop(block, None)
+        spiders = self.floor_spiders.pop(floor_index, [])
+        self.spider_swarm.remove(spiders)
+        for spider in spiders:
+            self.spiders.remove(spider)
+            self.light_bindings.forget(spider.model)
+            spider.model.removeNode()
+        for node in self.floor_nodes.pop(floor_index, []):
+            self.spatial_index.remove(node)
+            self.light_bindings.forget(node)
+            node.removeNode()
+
+    def stream_floors_task(self, task):
+        player_floor = self.spatial_index.floor_of(self.player.model.getZ())
+        self.floor_streamer.update(player_floor, self.floor_streamer.visible_floors(self.cam, self.cam.node().getLens(), self.labyrinth_np))
+        return Task.cont
+
     def windowResized(self):
+        # The flashlight's pass is rendered at the window's size, whatever the scene's render scale (the FilterManager resizes the scene's buffers)
         newX, newY = self.win.getSize()
         self.quad_filter.setShaderInput('u_resolution', (newX, newY))
         update_orthographic_lens(self.camera_orthographic_lens, newX, newY, self.camera_zoom)
@@ -558,18 +750,20 @@ class ExplorerApp(ShowBase):
         self.render.setShaderAuto()
         
         # Apply the flashlight effect, and others, using deferred lighting
-        flashlight_shader = Shader.load(Shader.SL_GLSL,
-            vertex=FLASHLIGHT_SHADER_VERTEX,
-            fragment=FLASHLIGHT_SHADER_FRAGMENT)
+        flashlight_shader = self.shader_cache.load(FLASHLIGHT_SHADER_VERTEX, FLASHLIGHT_SHADER_FRAGMENT)
+        # Loaded now, so that switching to them doesn't read them from disk
+        if self.DEBUG_FRAGMENT_SHADER:
+            for fragment in DEBUG_SHADER_FRAGMENTS:
+                self.shader_cache.load(FLASHLIGHT_SHADER_VERTEX, fragment)
 
         # Save the normal buffer into the auxiliary bitplane
         self.render.setAttrib(AuxBitplaneAttrib.make(AuxBitplaneAttrib.ABO_aux_normal))
 
-        manager = FilterManager(self.win, self.cam)
+        self.filter_manager = FilterManager(self.win, self.cam)
         tex = Texture()
         dtex = Texture()
         ntex = Texture()
-        self.quad_filter = manager.renderSceneInto(colortex=tex, depthtex=dtex, auxtex=ntex)
+        self.quad_filter = self.filter_manager.renderSceneInto(colortex=tex, depthtex=dtex, auxtex=ntex)
         self.quad_filter.setShader(flashlight_shader)
         self.quad_filter.setShaderInputs(
             tex=tex,
@@ -581,13 +775,43 @@ class ExplorerApp(ShowBase):
             lightRadius=FLASHLIGHT_RADIUS,
             lightPower=self.flashlight_power,
             lightFlickerRatio=self.flashlight_flicker,
+            lightFlickerNoise=float(flicker_noise(time.time() - self.start_time)),
+            u_sharpness=0.0,
         )
 
         self.accept('aspectRatioChanged', self.windowResized)
         self.taskMgr.add(self.update_shader_time_task, 'update_shader_time_task')
 
+        if self.DYNAMIC_RESOLUTION:
+            self.resolution_scaler = ResolutionScaler(
+                target_fps=self.RENDER_OPTS.get('target_fps', RESOLUTION_TARGET_FPS),
+                min_scale=self.RENDER_OPTS.get('min_scale', RESOLUTION_MIN_SCALE))
+            self.taskMgr.add(self.dynamic_resolution_task, 'dynamic_resolution_task')
+
     def update_shader_time_task(self, task):
-        self.quad_filter.setShaderInput('u_time', time.time() - self.start_time)
+        shader_time = time.time() - self.start_time
+        self.quad_filter.setShaderInput('u_time', shader_time)
+        self.quad_filter.setShaderInput('lightFlickerNoise', float(flicker_noise(shader_time)))
+        return Task.cont
+
+    def set_render_scale(self, scale: float):
+        """Render the scene at `scale` times the window's width and height, which the flashlight's pass upscales to the window."""
+        # The scene's buffer is the FilterManager's first, and it keeps this size relative to the window's when the window is resized
+        self.filter_manager.sizes[0] = (scale, 1, 1)
+        self.filter_manager.resizeBuffers()
+        self.quad_filter.setShaderInput('u_sharpness', self.RENDER_OPTS.get('sharpness', RESOLUTION_SHARPNESS) if scale < 1 else 0.0)
+
+    def dynamic_resolution_task(self, task):
+        if self.resolution_scaler.update(globalClock.getDt()):
+            self.set_render_scale(self.resolution_scaler.scale)
+            if self.DEBUG_LOG:
+                print(f'Render scale: {self.resolution_scaler.scale:.2f}')
+        return Task.cont
+
+    def shadow_schedule_task(self, task):
+        # The player and the spiders are the only casters that move
+        casters = np.concatenate([[tuple(self.player.model.getPos(self.labyrinth_np))], self.spider_swarm.positions])
+        self.shadow_scheduler.update(casters)
         return Task.cont
 
     def create3dAxis(self, heads: bool = False):
@@ -675,16 +899,11 @@ class ExplorerApp(ShowBase):
         return Task.cont
     
     def change_fragment_shader(self, fragment_path: str):
-        self.quad_filter.setShader(
-            Shader.load(
-                Shader.SL_GLSL,
-                vertex=FLASHLIGHT_SHADER_VERTEX,
-                fragment=fragment_path,
-            )
-        )
+        self.quad_filter.setShader(self.shader_cache.load(FLASHLIGHT_SHADER_VERTEX, fragment_path))
         print('Loaded shader', fragment_path)
 
     def finish(self, entity):
+        self.is_finished = True
         # Stop both player input and chaos
         self.taskMgr.remove('read_inputs_task')
         self.taskMgr.remove('generate_random_event')
@@ -694,50 +913,252 @@ class ExplorerApp(ShowBase):
     def exit_game(self, task):
         exit(0)
 
-
-parser = argparse.ArgumentParser('cv-proj')
-parser.add_argument('--map', '-m',
-    type=str,
-    default='main.map',
-    help='the labyrinth map file to be loaded (default=\'main.map\')')
-
-parser_debug = parser.add_argument_group('debug', 'Add debug info to the game.')
-parser_debug.add_argument('--debug.map',
-    action='store_true',
-    help='activate the debug environment for the labyrinth scene (colored walls, for instance)')
-parser_debug.add_argument('--debug.mouse-camera',
-    action='store_true',
-    help='let the camera be freely controllable with the mouse using Panda3D\'s default controls')
-parser_debug.add_argument('--debug.3d-axis',
-    action='store_true',
-    help='place a 3D axis in the scene at the origin')
-parser_debug.add_argument('--debug.collisions',
-    action='store_true',
-    help='show the collision boundaries')
-parser_debug.add_argument('--debug.hide-unlit',
-    action='store_true',
-    help='when putting a light, only show the labyrinth nodes that were lit')
-parser_debug.add_argument('--debug.fps',
-    action='store_true',
-    help='show an FPS counter at the top right')
-parser_debug.add_argument('--debug.log',
-    action='store_true',
-    help='print debug messages (reduces performance)')
-parser_debug.add_argument('--debug.no-chaos',
-    action='store_true',
-    help='the random events are fired manually instead of automatically (keys \'c\', \'v\' and \'b\')')
-parser_debug.add_argument('--debug.frag',
-    action='store_true',
-    help='enable manual change into the debug fragment shaders (alt + number)')
-
-
-args = parser.parse_args()
-
-debug_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('debug.')}
-
-app = ExplorerApp(
-    labyrinth_file='maps/' + args.map,
-    debug_opts=debug_opts,
-)
-app.setFrameRateMeter(debug_opts['fps'])
-app.run()
+    def simulate(self, n_steps: int, inputs: ScriptedInput) -> dict:
+        """
+        Run the game without rendering, for `n_steps` steps of `SIMULATION_TIMESTEP` or until the labyrinth is finished,
+        with the player's input coming from `inputs`. The entities and collisions advance by one step at a time
+        (the random visual events are not run), so the same seed and inputs always lead to the same result.
+        Get a summary of the run, including a digest of the player's trajectory to compare runs.
+        """
+        for task_name in ('read_inputs_task', 'generate_random_event', 'update_mouse_coords_task',
+                          'update_camera_rotation_task', 'update_shader_time_task', 'grid_collisions_task', 'stream_floors_task', 'dynamic_resolution_task',
+                          'shadow_schedule_task'):
+            self.taskMgr.remove(task_name)
+        # The floors are built right away instead of on another thread, so that they are always there at the same step
+        if self.STREAMING:
+            self.floor_streamer.threaded = False
+
+        trajectory = hashlib.sha256()
+        start = time.perf_counter()
+        step = 0
+        while step < n_steps and not self.is_finished:
+            if self.STREAMING:
+                self.floor_streamer.update(self.spatial_index.floor_of(self.player.model.getZ()))
+            self.update_entities(inputs.is_down, step * SIMULATION_TIMESTEP)
+
+            if self.GRID_COLLISIONS:
+                self.resolve_grid_collisions()
+            else:
+                self.cTrav.traverse(self.render)
+                # The pusher's events are queued, unlike the grid collisions'
+                self.eventMgr.doEvents()
+
+            trajectory.update(struct.pack('<3d', *self.player.model.getPos()))
+            inputs.advance()
+            step += 1
+        wall_time = time.perf_counter() - start
+
+        return {
+            'steps': step,
+            'simulated_time': step * SIMULATION_TIMESTEP,
+            'wall_time': wall_time,
+            'speedup': step * SIMULATION_TIMESTEP / wall_time if wall_time > 0 else None,
+            'finished': self.is_finished,
+            'player_position': list(self.player.model.getPos()),
+            'player_on_ground': self.player.is_on_ground,
+            'trajectory_digest': trajectory.hexdigest(),
+        }
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('cv-proj')
+    parser.add_argument('--map', '-m',
+        type=str,
+        default='main.map',
+        help='the labyrinth map file to be loaded (default=\'main.map\')')
+
+    parser.add_argument('--baked',
+        action='store_true',
+        help='render the labyrinth as a few merged meshes per floor, instead of one node per block')
+    parser.add_argument('--no-map-cache',
+        action='store_true',
+        help='always parse the map file, instead of loading the compiled labyrinth cached next to it')
+    parser.add_argument('--indexed',
+        action='store_true',
+        help='share the vertices of each face of the labyrinth blocks through an index buffer (4 vertices per face instead of 6)')
+    parser.add_argument('--no-face-culling',
+        action='store_true',
+        help='with --indexed, also generate the faces of the labyrinth blocks that are covered by neighbouring blocks')
+    parser.add_argument('--collisions',
+        choices=['traverser', 'grid'],
+        default='traverser',
+        help='resolve the player\'s collisions with Panda3D\'s collision traverser, or directly from the labyrinth\'s grid of cells (default=\'traverser\')')
+    parser.add_argument('--spawn-seed',
+        type=int,
+        default=None,
+        help='seed of the spiders\' and tables\' spawns, whose plan is then cached next to the map (default is random, or --sim.seed when simulating)')
+
+    parser_debug = parser.add_argument_group('debug', 'Add debug info to the game.')
+    parser_debug.add_argument('--debug.map',
+        action='store_true',
+        help='activate the debug environment for the labyrinth scene (colored walls, for instance)')
+    parser_debug.add_argument('--debug.mouse-camera',
+        action='store_true',
+        help='let the camera be freely controllable with the mouse using Panda3D\'s default controls')
+    parser_debug.add_argument('--debug.3d-axis',
+        action='store_true',
+        help='place a 3D axis in the scene at the origin')
+    parser_debug.add_argument('--debug.collisions',
+        action='store_true',
+        help='show the collision boundaries')
+    parser_debug.add_argument('--debug.hide-unlit',
+        action='store_true',
+        help='when putting a light, only show the labyrinth nodes that were lit')
+    parser_debug.add_argument('--debug.fps',
+        action='store_true',
+        help='show an FPS counter at the top right')
+    parser_debug.add_argument('--debug.log',
+        action='store_true',
+        help='print debug messages (reduces performance)')
+    parser_debug.add_argument('--debug.no-chaos',
+        action='store_true',
+        help='the random events are fired manually instead of automatically (keys \'c\', \'v\' and \'b\')')
+    parser_debug.add_argument('--debug.frag',
+        action='store_true',
+        help='enable manual change into the debug fragment shaders (alt + number)')
+
+    parser_sim = parser.add_argument_group('sim', 'Run the game headless, on a fixed timestep, and print a summary of the run.')
+    parser_sim.add_argument('--sim.steps',
+        type=int,
+        default=None,
+        help=f'number of steps to simulate, each lasting {SIMULATION_TIMESTEP:.4f} seconds of game time (enables the headless simulation)')
+    parser_sim.add_argument('--sim.seed',
+        type=int,
+        default=0,
+        help='seed of the random number generator (default=0)')
+    parser_sim.add_argument('--sim.input',
+        type=str,
+        default=None,
+        help='JSON file with the player\'s input, as a list of [number of steps, "keys held down"] (default is a random walk from the seed)')
+
+    parser_profile = parser.add_argument_group('profile', 'Measure the game\'s performance.')
+    parser_profile.add_argument('--profile.startup',
+        action='store_true',
+        help='time each phase of the startup and count what was loaded into the scene, then print the report as JSON and exit')
+    parser_profile.add_argument('--profile.output',
+        type=str,
+        default=None,
+        help='with --profile.startup, write the report to this file instead')
+    parser_profile.add_argument('--profile.cprofile',
+        type=str,
+        default=None,
+        help='with --profile.startup, run each phase under cProfile and save the stats of the slowest one to this file')
+    parser_profile.add_argument('--profile.frames',
+        action='store_true',
+        help='time every frame, task and entity update, and show their rolling 50th, 95th and 99th percentiles at the top left')
+    parser_profile.add_argument('--profile.frames-csv',
+        type=str,
+        default=None,
+        help='time every frame, task and entity update, and write them to this CSV file on exit')
+    parser_profile.add_argument('--profile.pstats',
+        action='store_true',
+        help='connect to a PStats server, where the entity updates show up next to Panda3D\'s cull and draw collectors')
+
+    parser_stream = parser.add_argument_group('stream', 'Load the labyrinth\'s floors as the player gets near them.')
+    parser_stream.add_argument('--stream.floors',
+        action='store_true',
+        help='only build the floors around the player at startup, and build the others on another thread when they are near the player or seen by the camera')
+    parser_stream.add_argument('--stream.radius',
+        type=int,
+        default=STREAMING_RADIUS,
+        help=f'number of floors above and below the player\'s that are always loaded (default={STREAMING_RADIUS})')
+    parser_stream.add_argument('--stream.budget',
+        type=int,
+        default=STREAMING_BUDGET,
+        help=f'memory of the loaded floors\' geometry in MB, above which the farthest floors are unloaded (default={STREAMING_BUDGET})')
+    parser_stream.add_argument('--stream.no-thread',
+        action='store_true',
+        help='build the floors on the main thread')
+
+    parser_render = parser.add_argument_group('render', 'Change how the scene is rendered.')
+    parser_render.add_argument('--render.dynamic-resolution',
+        action='store_true',
+        help='render the scene below the window\'s resolution when the frames take too long to hold the target frame rate, and sharpen it when upscaled')
+    parser_render.add_argument('--render.target-fps',
+        type=float,
+        default=RESOLUTION_TARGET_FPS,
+        help=f'with --render.dynamic-resolution, the frame rate to hold (default={RESOLUTION_TARGET_FPS})')
+    parser_render.add_argument('--render.min-scale',
+        type=float,
+        default=RESOLUTION_MIN_SCALE,
+        help=f'with --render.dynamic-resolution, the smallest fraction of the window\'s width and height that the scene is rendered at (default={RESOLUTION_MIN_SCALE})')
+    parser_render.add_argument('--render.sharpness',
+        type=float,
+        default=RESOLUTION_SHARPNESS,
+        help=f'how much the scene is sharpened when rendered below the window\'s resolution, from 0 to 1 (default={RESOLUTION_SHARPNESS})')
+    parser_render.add_argument('--render.shader-warm-up',
+        action='store_true',
+        help='generate and compile the shaders that the scene will need at startup, instead of the first time each one is needed (makes the startup slower)')
+    parser_render.add_argument('--render.shadow-budget',
+        type=int,
+        default=SHADOW_BUDGET,
+        help=f'number of shadow maps that are rendered in a frame, at most, when the lights or the entities near them move (default={SHADOW_BUDGET})')
+
+    args = parser.parse_args()
+
+    debug_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('debug.')}
+    sim_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('sim.')}
+    profile_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('profile.')}
+    stream_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('stream.')}
+    render_opts = {k.split('.')[1]: v for k, v in args._get_kwargs() if k.startswith('render.')}
+    is_headless = sim_opts['steps'] is not None
+
+    if is_headless:
+        loadPrcFileData('', '''
+window-type offscreen
+audio-library-name null
+win-size {WIDTH} {HEIGHT}
+'''.format(WIDTH=WIDTH, HEIGHT=HEIGHT))
+
+    # The startup report and the simulation's summary are alone on stdout, so that they can be read as JSON,
+    # and the messages printed while the game runs (such as when the map is parsed) go to stderr instead
+    writes_json = profile_opts['startup'] or is_headless
+    with contextlib.redirect_stdout(sys.stderr) if writes_json else contextlib.nullcontext():
+        app = ExplorerApp(
+            labyrinth_file='maps/' + args.map,
+            debug_opts=debug_opts,
+            baked=args.baked,
+            use_map_cache=not args.no_map_cache,
+            indexed=args.indexed,
+            face_culling=not args.no_face_culling,
+            grid_collisions=args.collisions == 'grid',
+            seed=sim_opts['seed'] if is_headless else None,
+            spawn_seed=args.spawn_seed if args.spawn_seed is not None else (sim_opts['seed'] if is_headless else None),
+            stream_opts=stream_opts,
+            render_opts=render_opts,
+            profiler=StartupProfiler(enabled=profile_opts['startup'], profile_phases=profile_opts['cprofile'] is not None),
+            frame_profiler=FrameProfiler(enabled=profile_opts['frames'] or profile_opts['frames_csv'] is not None or profile_opts['pstats']),
+        )
+        app.frame_profiler.attach(app.taskMgr,
+            overlay_parent=app.a2dTopLeft if profile_opts['frames'] else None,
+            csv_path=profile_opts['frames_csv'],
+            pstats=profile_opts['pstats'])
+
+    if profile_opts['startup']:
+        report = app.profiler.report(app.render, {
+            'map': args.map,
+            'baked': args.baked,
+            'indexed': args.indexed,
+            'collisions': args.collisions,
+            'streaming': stream_opts['floors'],
+            'shader_warm_up': app.shader_warm_up,
+            'blocks': len(app.labyrinth.blocks),
+        })
+        if profile_opts['cprofile'] is not None:
+            report['cprofile_phase'] = app.profiler.dump_slowest_profile(profile_opts['cprofile'])
+
+        if profile_opts['output'] is not None:
+            with open(profile_opts['output'], 'wt') as report_file:
+                json.dump(report, report_file, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
+
+    elif is_headless:
+        inputs = ScriptedInput.from_file(sim_opts['input']) if sim_opts['input'] is not None else ScriptedInput.random(sim_opts['steps'], sim_opts['seed'])
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = app.simulate(sim_opts['steps'], inputs)
+        print(json.dumps(summary, indent=2))
+    else:
+        app.setFrameRateMeter(debug_opts['fps'])
+        app.run()
@@ -1,9 +1,11 @@
 from CustomObject3D import CustomObject3D
 from panda3d.core import NodePath, PointLight
-from typing import Generator
+from typing import Generator, List
 import math
 import random
 
+import numpy as np
+
 class Bird(CustomObject3D):
     
     ROTATION_SPEED = 40
@@ -12,7 +14,7 @@ class Bird(CustomObject3D):
     def __init__(self, position, parent, game, scale=[1, 1, 1], rotation_center=(15, 10, 20), 
                  distance_from_center=20):
         model = game.loader.loadModel(Bird.MODEL_PATH)
-        super().__init__(model, position, parent, scale)
+        super().__init__(model, position, parent, scale, spatial_index=game.spatial_index)
         self.gravity = 0
         self.distance_from_center = distance_from_center
         self.rotation_center = rotation_center
@@ -29,6 +31,7 @@ class Bird(CustomObject3D):
         )
         
         self.model.setH(angleDegrees + 90)
+        self.update_spatial_index()
 
 class Spider(CustomObject3D):
     
@@ -38,13 +41,16 @@ class Spider(CustomObject3D):
     FLAT_SHADING_CHANCE = 0
     SPIDER_SCALE_VARIATION = 0.005
     
-    def __init__(self, position, parent, game, scale=[.01, .01, .01], movement_axis=(1, 1, 1), wall_dimensions=(1, 1, 1)):
-        model = game.loader.loadModel(Spider.MODEL_PATH)
+    def __init__(self, position, parent, game, scale=[.01, .01, .01], movement_axis=(1, 1, 1), wall_dimensions=(1, 1, 1), vary_scale=True):
+        # All spiders share the same geometry
+        model = game.models.instance(Spider.MODEL_PATH, parent)
         flat_chance = random.random()
         is_flat = flat_chance < Spider.FLAT_SHADING_CHANCE
-        random_scale = random.uniform(-Spider.SPIDER_SCALE_VARIATION, Spider.SPIDER_SCALE_VARIATION)
-        scale = [scale[i] + random_scale for i in range(3)]
-        super().__init__(model, position, parent, scale, is_flat=is_flat)
+        # The spawn plan already varies the spiders' scale
+        if vary_scale:
+            random_scale = random.uniform(-Spider.SPIDER_SCALE_VARIATION, Spider.SPIDER_SCALE_VARIATION)
+            scale = [scale[i] + random_scale for i in range(3)]
+        super().__init__(model, position, parent, scale, is_flat=is_flat, spatial_index=game.spatial_index)
         self.gravity = 0
         self.movement_axis = movement_axis
         self.wall_dimensions = wall_dimensions
@@ -62,6 +68,102 @@ class Spider(CustomObject3D):
         super().update()
 
 
+class SpiderSwarm:
+    """
+    Updates all spiders at once, with the same movement as `Spider.update`, keeping their state in arrays:
+    the position, the velocity, the offset from where each spider spawned, the axes it moves along and how far it can go
+    from its spawn (a quarter of its wall's dimensions). Only the spiders that moved have their transform written back, and only if they can be seen:
+    the others keep their last transform until they come into view, since writing the transforms one node at a time is most of the cost.
+    Since a spider can't leave those bounds, it's in the spatial index as the box it moves in, which never has to be updated.
+    Once added, a spider is only moved by the swarm, and its own `position`, `relative_position` and `velocity` are no longer updated.
+    """
+
+    def __init__(self, seed: int = None):
+        # Seeded from the global generator by default, so that the same seed of the game leads to the same movement
+        self.rng = np.random.default_rng(seed if seed is not None else random.getrandbits(64))
+        self.spiders: List[Spider] = []
+        self.models: List[NodePath] = []
+        self.positions = np.empty((0, 3))
+        self.velocities = np.empty((0, 3))
+        self.offsets = np.empty((0, 3))
+        self.axes = np.empty((0, 3))
+        self.bounds = np.empty((0, 3))
+        # Spiders that moved since their transform was last written back
+        self.stale = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.spiders)
+
+    def add(self, spiders: List[Spider]):
+        spiders = list(spiders)
+        if not spiders:
+            return
+        self.spiders.extend(spiders)
+        self.models.extend(spider.model for spider in spiders)
+        self.positions = np.concatenate([self.positions, [tuple(spider.model.getPos()) for spider in spiders]])
+        self.velocities = np.concatenate([self.velocities, [spider.velocity for spider in spiders]])
+        self.offsets = np.concatenate([self.offsets, [spider.relative_position for spider in spiders]])
+        self.axes = np.concatenate([self.axes, [spider.movement_axis for spider in spiders]])
+        self.bounds = np.concatenate([self.bounds, np.abs(np.array([spider.wall_dimensions for spider in spiders], dtype=np.float64) / 4)])
+        self.stale = np.concatenate([self.stale, np.zeros(len(spiders), dtype=bool)])
+
+        spawns = self.positions[-len(spiders):] - self.offsets[-len(spiders):]
+        for spider, spawn, bounds in zip(spiders, spawns, self.bounds[-len(spiders):]):
+            if spider.spatial_index is not None:
+                spider.spatial_index.remove(spider.model)
+                spider.spatial_index.insert(spider.model, spawn - bounds, spawn + bounds)
+
+    def remove(self, spiders: List[Spider]):
+        """Stop updating the `spiders`, which are also removed from the spatial index. Their models are left as they are."""
+        removed = {id(spider) for spider in spiders}
+        if not removed:
+            return
+        keep = np.array([id(spider) not in removed for spider in self.spiders], dtype=bool)
+        for spider in spiders:
+            if spider.spatial_index is not None:
+                spider.spatial_index.remove(spider.model)
+
+        self.spiders = [spider for spider, is_kept in zip(self.spiders, keep) if is_kept]
+        self.models = [model for model, is_kept in zip(self.models, keep) if is_kept]
+        self.positions = self.positions[keep]
+        self.velocities = self.velocities[keep]
+        self.offsets = self.offsets[keep]
+        self.axes = self.axes[keep]
+        self.bounds = self.bounds[keep]
+        self.stale = self.stale[keep]
+
+    def visible_from(self, camera: NodePath, root: NodePath, margin: float = 0.1) -> np.ndarray:
+        """
+        Get which spiders are in the view of `camera` (through its lens), with their positions relative to `root`.
+        The view is widened by `margin` of its size, since a spider can be seen before its origin is in view.
+        """
+        lens = camera.node().getLens()
+        to_clip = np.array(root.getMat(camera)) @ np.array(lens.getProjectionMat())
+        clip = np.hstack([self.positions, np.ones((len(self.positions), 1))]) @ to_clip
+        w = clip[:, 3:] * (1 + margin)
+        return (clip[:, 3] > 0) & (np.abs(clip[:, :3]) <= w).all(axis=1)
+
+    def update(self, visible: np.ndarray = None):
+        """Move the spiders, and write back the transforms of those that are `visible` (a mask, such as from `visible_from`), or of all of them."""
+        # Spiders that stopped pick a new random velocity along their movement axes
+        idle = ~self.velocities.any(axis=1)
+        n_idle = int(idle.sum())
+        if n_idle:
+            self.velocities[idle] = self.rng.uniform(-1, 1, (n_idle, 3)) * Spider.SPEED * self.axes[idle]
+
+        # Spiders that would go too far from their spawn stop instead, and pick a new velocity on the next update
+        self.velocities[(np.abs(self.offsets + self.velocities) > self.bounds).any(axis=1)] = 0
+
+        self.positions += self.velocities
+        self.offsets += self.velocities
+
+        self.stale |= self.velocities.any(axis=1)
+        written = np.flatnonzero(self.stale if visible is None else self.stale & visible)
+        for idx, position in zip(written.tolist(), self.positions[written].tolist()):
+            self.models[idx].setPos(*position)
+        self.stale[written] = False
+
+
 class Firefly(CustomObject3D):
     
     MODEL_PATH = "models/firefly/obj/firefly.obj"
@@ -74,7 +176,9 @@ class Firefly(CustomObject3D):
                  rotation_center=[15, 10, -40]):
         model = game.loader.loadModel(Firefly.MODEL_PATH)
         super().__init__(model, position, parent, scale, emmits_light=True, 
-                         light_color_temperature=Firefly.LIGHT_COLOR, light_distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD)
+                         light_color_temperature=Firefly.LIGHT_COLOR, light_distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD,
+                         spatial_index=game.spatial_index, light_bindings=game.light_bindings)
+        self.grasses = game.grasses
         self.gravity = 0
         self.velocity = [0, 0, 0]
         self.distance_from_center = distance_from_center
@@ -88,9 +192,7 @@ class Firefly(CustomObject3D):
         self.pn.setPos(self.model.getPos())
         
         if Firefly.LIGHT_DISTANCE_THRESHOLD > 0:
-            for node_to_illuminate in self.get_light_surroundings(distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD):
-                node_to_illuminate.setLight(self.pn)
-                node_to_illuminate.show()
+            self.light_bindings.update(self.pn, self.get_light_surroundings(distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD))
         else:
             self.parent.setLight(self.pn)
     
@@ -106,17 +208,16 @@ class Firefly(CustomObject3D):
         )
         self.pn.setPos(self.model.getPos())
         self.model.setH(angleDegrees + 90)
+        self.update_spatial_index()
         
-        for node_to_illuminate in self.get_light_surroundings(distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD):
-            node_to_illuminate.setLight(self.pn)
-            node_to_illuminate.show()
+        # Only the nodes that the light entered or left are changed
+        if Firefly.LIGHT_DISTANCE_THRESHOLD > 0:
+            self.light_bindings.update(self.pn, self.get_light_surroundings(distance_threshold=Firefly.LIGHT_DISTANCE_THRESHOLD))
         
     
     def get_light_surroundings(self, distance_threshold: float) -> Generator[NodePath, None, None]:
-        for child in self.parent.children:
-            # To make sure that the light only affects objects within the same floor
-            # This also assumes the objects to be lit are above the light (the light is on the floor)
-            if "grass" in child.name or self.model.get_distance(child) < distance_threshold:
-                yield child
+        # The grass is not in the spatial index, so it's lit separately
+        yield from self.grasses
+        yield from self.spatial_index.query_radius(self.model.getPos(), distance_threshold)
     
 
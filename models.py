@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from typing import Dict, List, Tuple
+from panda3d.core import ModelNode, NodePath, RigidBodyCombiner
+
+
+class ModelRegistry:
+    """
+    Loads each model once, keeping a master copy of it, and hands out instances of the master.
+    An instance shares the master's geometry (which is only uploaded once), and only has its own transform and render state.
+    Objects that don't move can be batched instead, flattening many instances into a single node with a few Geoms,
+    and objects that move can be combined, so that they are still drawn with a few Geoms.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.masters: Dict[str, NodePath] = {}
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.masters
+
+    def master(self, path: str) -> NodePath:
+        if path not in self.masters:
+            model = self.loader.loadModel(path)
+            # The model's root can be removed when its instances are flattened together into a batch
+            model.node().setPreserveTransform(ModelNode.PT_drop_node)
+            self.masters[path] = model
+        return self.masters[path]
+
+    def instance(self, path: str, parent: NodePath, name: str = None) -> NodePath:
+        """Get a new node under `parent` that shows the model, on which transforms and render attributes can be set."""
+        node = parent.attachNewNode(name or os.path.basename(path))
+        self.master(path).instanceTo(node)
+        return node
+
+    def instances(self, path: str, parent: NodePath, positions: np.ndarray, hprs: np.ndarray, scales: np.ndarray) -> List[NodePath]:
+        """Get an instance of the model for each row of the `(N, 3)` arrays of positions, rotations and scales."""
+        nodes = []
+        for position, hpr, scale in zip(positions.tolist(), hprs.tolist(), scales.tolist()):
+            node = self.instance(path, parent)
+            node.setPosHprScale(*position, *hpr, *scale)
+            nodes.append(node)
+        return nodes
+
+    def batch(self, path: str, parent: NodePath, positions: np.ndarray, hprs: np.ndarray, scales: np.ndarray, name: str = None) -> NodePath:
+        """
+        Put an instance of the model for each row of the `(N, 3)` arrays of positions, rotations and scales,
+        flattened into a single node. The instances can no longer be moved or changed individually.
+        """
+        batch = NodePath(name or f'{os.path.basename(path)}_batch')
+        self.instances(path, batch, positions, hprs, scales)
+        batch.flattenStrong()
+        batch.reparentTo(parent)
+        return batch
+
+    def combine(self, path: str, parent: NodePath, positions: np.ndarray, hprs: np.ndarray, scales: np.ndarray, name: str = None) -> Tuple[NodePath, List[NodePath]]:
+        """
+        Put an instance of the model for each row of the `(N, 3)` arrays of positions, rotations and scales,
+        combined into a few Geoms by a `RigidBodyCombiner`. Get the combiner's node and the instances,
+        whose transforms can still be changed (but not their render state).
+        """
+        combiner = parent.attachNewNode(RigidBodyCombiner(name or f'{os.path.basename(path)}_combiner'))
+        nodes = self.instances(path, combiner, positions, hprs, scales)
+        combiner.node().collect()
+        return combiner, nodes
@@ -1,14 +1,10 @@
 from CustomObject3D import CustomObject3D
 from panda3d.core import Spotlight, PerspectiveLens, LPoint3
 
-class Table(CustomObject3D):
+class Table:
+    """Tables never move, so they are only spawned in batches of instances (see `ModelRegistry.batch`)."""
     
     MODEL_PATH = "models/asylum-table/asylum_table01.obj"
-    
-    def __init__(self, position, parent, game, scale=[0.025 for _ in range(3)]):
-        model = game.loader.loadModel(Table.MODEL_PATH)
-        super().__init__(model, position, parent, scale)
-        self.gravity = 0
         
 class SpotlightOBJ(CustomObject3D):
     
@@ -30,7 +26,8 @@ class SpotlightOBJ(CustomObject3D):
                 grass_height=-10, target_height_limit=-10, test=None):
         model = game.loader.loadModel(SpotlightOBJ.MODEL_PATH)
         super().__init__(model, position, parent, scale, emmits_light=True, 
-                         light_color_temperature=SpotlightOBJ.LIGHT_COLOR, light_distance_threshold=SpotlightOBJ.LIGHT_DISTANCE_THRESHOLD)
+                         light_color_temperature=SpotlightOBJ.LIGHT_COLOR, light_distance_threshold=SpotlightOBJ.LIGHT_DISTANCE_THRESHOLD,
+                         spatial_index=game.spatial_index)
         self.gravity = 0
         self.velocity = [0, 0, 0]
         self.model.setP(90)
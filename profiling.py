@@ -0,0 +1,246 @@
+import atexit
+import cProfile
+import csv
+import time
+
+import numpy as np
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from direct.gui.OnscreenText import OnscreenText
+from direct.task import Task
+from panda3d.core import NodePath, PStatClient, PStatCollector, TextNode
+
+
+# Number of most recent frames that the percentiles are computed over
+FRAME_WINDOW = 300
+# In seconds
+FRAME_OVERLAY_UPDATE_INTERVAL = 0.5
+FRAME_OVERLAY_MAX_LINES = 16
+FRAME_PERCENTILES = (50, 95, 99)
+
+
+class StartupProfiler:
+    """
+    Times the phases of the game's startup, and counts the models and textures loaded in each of them.
+    The phases run one after the other, so starting a phase ends the previous one.
+    With `profile_phases`, each phase also runs under cProfile, so that the slowest one can be inspected afterwards.
+    When not `enabled`, the phases are not measured at all.
+    """
+
+    def __init__(self, enabled: bool = True, profile_phases: bool = False):
+        self.enabled = enabled
+        self.profile_phases = profile_phases
+        # Each phase is a dictionary with its name, duration, and the models and textures loaded during it
+        self.phases: List[dict] = []
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.model_loads = 0
+        self.texture_loads = 0
+        self.current_phase: Optional[dict] = None
+
+    def start(self, name: str):
+        """Start timing the phase `name`, ending the current phase if there is one."""
+        if not self.enabled:
+            return
+        self.stop()
+
+        self.current_phase = {
+            'name': name,
+            'start': time.perf_counter(),
+            'model_loads': self.model_loads,
+            'texture_loads': self.texture_loads,
+        }
+        if self.profile_phases:
+            self.profiles[name] = cProfile.Profile()
+            self.profiles[name].enable()
+
+    def stop(self):
+        """End the current phase."""
+        if not self.enabled or self.current_phase is None:
+            return
+        phase, self.current_phase = self.current_phase, None
+
+        if phase['name'] in self.profiles:
+            self.profiles[phase['name']].disable()
+        self.phases.append({
+            'name': phase['name'],
+            'seconds': time.perf_counter() - phase['start'],
+            'models_loaded': self.model_loads - phase['model_loads'],
+            'textures_loaded': self.texture_loads - phase['texture_loads'],
+        })
+
+    def track_loader(self, loader):
+        """Count the models and textures loaded through `loader`."""
+        if not self.enabled:
+            return
+        load_model, load_texture = loader.loadModel, loader.loadTexture
+
+        def counted_load_model(*args, **kwargs):
+            self.model_loads += 1
+            return load_model(*args, **kwargs)
+
+        def counted_load_texture(*args, **kwargs):
+            self.texture_loads += 1
+            return load_texture(*args, **kwargs)
+
+        loader.loadModel = counted_load_model
+        loader.loadTexture = counted_load_texture
+
+    def slowest_phase(self) -> Optional[dict]:
+        return max(self.phases, key=lambda phase: phase['seconds'], default=None)
+
+    def dump_slowest_profile(self, path: str) -> Optional[str]:
+        """Save the cProfile stats of the slowest phase to `path` (readable with `pstats`), and get the phase's name."""
+        slowest = self.slowest_phase()
+        if slowest is None or slowest['name'] not in self.profiles:
+            return None
+        self.profiles[slowest['name']].dump_stats(path)
+        return slowest['name']
+
+    def report(self, scene_root: NodePath, extra: dict = None) -> dict:
+        slowest = self.slowest_phase()
+        return {
+            'total_seconds': sum(phase['seconds'] for phase in self.phases),
+            'slowest_phase': slowest['name'] if slowest is not None else None,
+            'phases': self.phases,
+            'models_loaded': self.model_loads,
+            'textures_loaded': self.texture_loads,
+            'scene': count_scene(scene_root),
+            **(extra or {}),
+        }
+
+
+def count_scene(root: NodePath) -> dict:
+    """Count the nodes, Geoms, vertices, collision solids and distinct textures under `root`."""
+    geom_nodes = root.findAllMatches('**/+GeomNode')
+    collision_nodes = root.findAllMatches('**/+CollisionNode')
+
+    geoms = [geom for node in geom_nodes for geom in node.node().getGeoms()]
+    return {
+        'nodes': root.findAllMatches('**').getNumPaths(),
+        'geom_nodes': geom_nodes.getNumPaths(),
+        'geoms': len(geoms),
+        'vertices': sum(geom.getVertexData().getNumRows() for geom in geoms),
+        'collision_nodes': collision_nodes.getNumPaths(),
+        'collision_solids': sum(node.node().getNumSolids() for node in collision_nodes),
+        'textures': root.findAllTextures().getNumTextures(),
+    }
+
+
+class FrameProfiler:
+    """
+    Per-frame timings of the frame itself, of every task in the task manager, and of named sections of code.
+    The tasks' times are the durations of their last run, which Panda3D already keeps for each task, so they don't need to be wrapped.
+    This includes Panda3D's own tasks, such as `collisionLoop` (the collision traverser) and `igLoop` (cull and draw).
+    The sections are also PStats collectors, so they show up next to Panda3D's cull and draw collectors when PStats is connected.
+    The rolling percentiles of the last `window` frames can be shown in an overlay, and all frames exported as CSV.
+    When not `enabled`, nothing is measured and the section markers do nothing.
+    """
+
+    TASK_NAME = 'frame_profiler_task'
+
+    def __init__(self, enabled: bool = True, window: int = FRAME_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.history: Dict[str, Deque[float]] = {}
+        # Every frame, with the time of each series in milliseconds, only kept when exporting to CSV
+        self.rows: List[Dict[str, float]] = []
+        self.keep_rows = False
+
+        self.collectors: Dict[str, PStatCollector] = {}
+        self.section_times: Dict[str, float] = {}
+        self.current_section: Optional[str] = None
+        self.current_section_start = 0.0
+
+        self.frame = 0
+        self.frame_start: Optional[float] = None
+        self.overlay: Optional[OnscreenText] = None
+        self.overlay_updated = 0.0
+
+    def attach(self, task_mgr, overlay_parent: NodePath = None, csv_path: str = None, pstats: bool = False):
+        """
+        Start measuring every frame, after all other tasks (including the rendering) ran.
+        Optionally show the overlay under `overlay_parent`, write the frames to `csv_path` on exit, and connect to a PStats server.
+        """
+        if not self.enabled:
+            return
+        self.task_mgr = task_mgr
+        task_mgr.add(self.frame_task, self.TASK_NAME, sort=100)
+
+        if overlay_parent is not None:
+            self.overlay = OnscreenText(parent=overlay_parent, pos=(0.05, -0.08), scale=0.04, align=TextNode.ALeft,
+                fg=(1, 1, 1, 1), bg=(0, 0, 0, 0.5), mayChange=True)
+        if csv_path is not None:
+            self.keep_rows = True
+            atexit.register(self.write_csv, csv_path)
+        if pstats:
+            PStatClient.connect()
+
+    def start(self, name: str):
+        """Start timing the section `name`, ending the current section if there is one. A section can run many times in a frame."""
+        if not self.enabled:
+            return
+        self.stop()
+
+        if name not in self.collectors:
+            self.collectors[name] = PStatCollector(f'App:Profiler:{name}')
+        self.collectors[name].start()
+        self.current_section = name
+        self.current_section_start = time.perf_counter()
+
+    def stop(self):
+        """End the current section."""
+        if not self.enabled or self.current_section is None:
+            return
+        name, self.current_section = self.current_section, None
+
+        self.section_times[name] = self.section_times.get(name, 0.0) + time.perf_counter() - self.current_section_start
+        self.collectors[name].stop()
+
+    def frame_task(self, task):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            times = {'frame': (now - self.frame_start) * 1000}
+            for frame_task in self.task_mgr.mgr.getActiveTasks():
+                if frame_task.name != self.TASK_NAME:
+                    times[f'task:{frame_task.name}'] = frame_task.getDt() * 1000
+            for name, seconds in self.section_times.items():
+                times[f'section:{name}'] = seconds * 1000
+            self.record(times)
+
+            if self.overlay is not None and now - self.overlay_updated >= FRAME_OVERLAY_UPDATE_INTERVAL:
+                self.overlay.setText(self.overlay_text())
+                self.overlay_updated = now
+
+        self.section_times.clear()
+        self.frame_start = now
+        return Task.cont
+
+    def record(self, times: Dict[str, float]):
+        for name, milliseconds in times.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(milliseconds)
+        if self.keep_rows:
+            self.rows.append({'frame_index': self.frame, **times})
+        self.frame += 1
+
+    def percentiles(self) -> Dict[str, List[float]]:
+        """Get the `FRAME_PERCENTILES` of each series over the last `window` frames, in milliseconds."""
+        return {name: np.percentile(np.fromiter(values, dtype=np.float64), FRAME_PERCENTILES).tolist()
+            for name, values in self.history.items() if values}
+
+    def overlay_text(self) -> str:
+        percentiles = self.percentiles()
+        # The frame first, then the slowest series
+        names = sorted(percentiles, key=lambda name: (name != 'frame', -percentiles[name][1]))[:FRAME_OVERLAY_MAX_LINES]
+        header = f'{"ms (last " + str(self.window) + " frames)":<40}' + ''.join(f'{"p" + str(p):>8}' for p in FRAME_PERCENTILES)
+        return '\n'.join([header] + [f'{name:<40}' + ''.join(f'{value:>8.2f}' for value in percentiles[name]) for name in names])
+
+    def write_csv(self, path: str):
+        """Write every recorded frame, with one column per series (empty when a series didn't run in that frame)."""
+        columns = list(dict.fromkeys(column for row in self.rows for column in row))
+        with open(path, 'wt', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self.rows)
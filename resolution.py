@@ -0,0 +1,63 @@
+import math
+
+
+# Frame rate that the render scale is adjusted to hold
+RESOLUTION_TARGET_FPS = 60
+# Smallest fraction of the window's width and height that the scene is rendered at
+RESOLUTION_MIN_SCALE = 0.5
+# How much the upscaled scene is sharpened when rendered below the window's resolution, from 0 to 1
+RESOLUTION_SHARPNESS = 0.5
+
+
+class ResolutionScaler:
+    """
+    Chooses the scale at which the scene is rendered, as a fraction of the window's width and height, from the measured frame times.
+    The frame time is smoothed, and when it goes over the budget of `1 / target_fps` (or well under it, while below full resolution),
+    the scale changes so that the number of pixels is in proportion to the budget, since most of the cost of a frame is per pixel.
+    The scale moves in steps of `step` and at most every `cooldown` frames, because resizing the scene buffers takes a frame of its own.
+    """
+
+    def __init__(self, target_fps: float = RESOLUTION_TARGET_FPS, min_scale: float = RESOLUTION_MIN_SCALE, max_scale: float = 1.0,
+                 step: float = 0.05, smoothing: float = 0.1, headroom: float = 0.15, cooldown: int = 30):
+        self.budget = 1 / target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.cooldown = cooldown
+
+        self.scale = max_scale
+        self.frame_time = None
+        self.frames_since_change = 0
+
+    def update(self, frame_time: float) -> bool:
+        """Account for the time of the last frame, in seconds. Returns whether the scale changed."""
+        if self.frame_time is None:
+            self.frame_time = frame_time
+        else:
+            self.frame_time += self.smoothing * (frame_time - self.frame_time)
+        self.frames_since_change += 1
+
+        if self.frames_since_change < self.cooldown:
+            return False
+        over_budget = self.frame_time > self.budget * (1 + self.headroom)
+        under_budget = self.frame_time < self.budget * (1 - self.headroom) and self.scale < self.max_scale
+        if not over_budget and not under_budget:
+            return False
+
+        scale = self.scale * math.sqrt(self.budget / self.frame_time)
+        # Only increase it by a step at a time, since a frame that was short for other reasons would otherwise jump to full resolution
+        if under_budget:
+            scale = min(scale, self.scale + self.step)
+        else:
+            scale = min(scale, self.scale - self.step)
+        scale = min(max(round(self.step * round(scale / self.step), 6), self.min_scale), self.max_scale)
+        if scale == self.scale:
+            return False
+
+        self.scale = scale
+        self.frames_since_change = 0
+        # The frame times until now were measured at the previous scale
+        self.frame_time = None
+        return True
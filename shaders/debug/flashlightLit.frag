@@ -11,64 +11,14 @@ uniform float u_time;
 uniform float lightRadius;
 uniform float lightPower;
 uniform float lightFlickerRatio;
+// Noise of the flicker, the same for every pixel, so it is computed once per frame on the CPU
+uniform float lightFlickerNoise;
 
 in vec2 texcoord;
 
 out vec4 p3d_FragColor;
 
 const float lightBorder = 0.3;
-const int fbmNFuncs = 10;
-const float fbmLacunarity = 8.0;
-const float fbmGain = 0.5;
-const float fbmOffset = 0.9;
-
-// From the book of shaders: https://thebookofshaders.com/10/
-float random(vec2 st) {
-    return fract(sin(dot(st.xy,
-                         vec2(12.9898,78.233)))*
-        43758.5453123);
-}
-
-// Vector st should be in range [0, 1]
-// Formula from: https://en.wikipedia.org/wiki/Bilinear_interpolation
-float bilinearInterpolation(float v00, float v10, float v01, float v11, vec2 st) {
-    float f = .01;
-    float f1 = f;
-    float f2 = 1.-f;
-    
-    float vx0 = mix(v00, v10, smoothstep(f1, f2, st.x));
-    float vx1 = mix(v01, v11, smoothstep(f1, f2, st.x));
-
-    return mix(vx0, vx1, smoothstep(f1, f2, st.y));
-}
-
-// Value noise: https://en.wikipedia.org/wiki/Value_noise
-float noise(vec2 st, float interval) {
-
-    vec2 stStep = interval * floor(st / interval);
-    vec2 noiseInterp = fract(st / interval);
-    
-    float random00 = random(stStep);
-    float random10 = random(vec2(stStep.x + interval, stStep.y));
-    float random01 = random(vec2(stStep.x, stStep.y + interval));
-    float random11 = random(stStep + interval);
-    
-    return bilinearInterpolation(random00, random10, random01, random11, noiseInterp);
-}
-
-float fbm(vec2 st, float lacunarity, float gain) {
-    float res = 0.;
-    float frequency = 1.;
-    float amplitude = 1.;
-
-    for (int i = 0; i < fbmNFuncs; i++) {
-        res += amplitude * (noise(st, 1. / frequency));
-        frequency *= lacunarity;
-        amplitude *= gain;
-    }
-
-    return res;
-}
 
 vec3 filledCircle(in vec2 center, in float radius, in vec2 point, in float borderSmoothness) {
     float pct = distance(point, center);
@@ -91,7 +41,7 @@ void main() {
     // How much is the light affected by the distance to the camera. 0 means full fog.
     float fogDisturbance = 1 - pow(depth, 50);
 
-    float lightFlicker = mix(1.0, fbm(vec2(u_time, 0), fbmLacunarity, fbmGain) - fbmOffset, lightFlickerRatio);
+    float lightFlicker = mix(1.0, lightFlickerNoise, lightFlickerRatio);
 
     vec4 flashlightCircle = vec4(filledCircle(u_mouse, lightRadius, st, lightBorder), 1.0);
 
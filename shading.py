@@ -0,0 +1,97 @@
+import itertools
+import time
+
+from typing import Dict, List, Tuple
+from panda3d.core import BoundingSphere, GeomNode, LightAttrib, LightLensNode, NodePath, Shader
+
+
+class ShaderCache:
+    """Loads each GLSL shader once, so that switching between shaders doesn't read and compile them again."""
+
+    def __init__(self):
+        self.shaders: Dict[Tuple[str, str], Shader] = {}
+
+    def load(self, vertex: str, fragment: str) -> Shader:
+        key = (vertex, fragment)
+        if key not in self.shaders:
+            self.shaders[key] = Shader.load(Shader.SL_GLSL, vertex=vertex, fragment=fragment)
+        return self.shaders[key]
+
+    def prepare(self, gsg):
+        """Compile every loaded shader on the `gsg`, instead of the first time each one is used."""
+        for shader in self.shaders.values():
+            shader.prepare(gsg.getPreparedObjects())
+
+
+def scene_states(root: NodePath) -> List[NodePath]:
+    """
+    Get a node for each distinct way that the Geoms under `root` are rendered, regardless of their lights, which is what the shader generator
+    makes a shader for: their net state (textures, fog, lights...), the states of their Geoms and the formats of their vertices.
+    """
+    representatives = {}
+    for node in root.findAllMatches('**/+GeomNode'):
+        geom_node: GeomNode = node.node()
+        key = (
+            node.getNetState().removeAttrib(LightAttrib),
+            tuple(geom_node.getGeomState(idx) for idx in range(geom_node.getNumGeoms())),
+            tuple(geom_node.getGeom(idx).getVertexData().getFormat() for idx in range(geom_node.getNumGeoms())),
+        )
+        representatives.setdefault(key, node)
+    return list(representatives.values())
+
+
+def warm_up_shaders(base, root: NodePath, dynamic_lights: List[NodePath], max_dynamic_lights: int) -> dict:
+    """
+    Make the shader generator create, and the GPU compile, the shaders that the scene under `root` will need, before the first frame.
+    A copy of each distinct node (see `scene_states`) is lit by its lights and by every combination of up to `max_dynamic_lights`
+    of the `dynamic_lights` (lights that are set on nodes as they move, whose shaders would otherwise be made mid-game),
+    and rendered in front of the camera. The lights' shadow maps are rendered with their own shaders, which are also made.
+    Get how many states and light combinations were warmed up, and how long it took.
+    """
+    start = time.perf_counter()
+    warm_up_np = base.camera.attachNewNode('shader_warm_up')
+    # Right in front of the camera, so that nothing is culled
+    near = base.camLens.getNear()
+    warm_up_np.setPos(0, near * 2, 0)
+
+    # Lights that only differ in what the shader generator doesn't care about (such as their color) need the same shaders
+    light_kinds: Dict[tuple, List[NodePath]] = {}
+    for light in dynamic_lights:
+        is_shadow_caster = isinstance(light.node(), LightLensNode) and light.node().isShadowCaster()
+        light_kinds.setdefault((type(light.node()), is_shadow_caster), []).append(light)
+    light_copies = [[warm_up_np.attachNewNode(light.node().makeCopy()) for light in lights[:max_dynamic_lights]] for lights in light_kinds.values()]
+
+    combinations = [()]
+    for n_lights in range(1, max_dynamic_lights + 1):
+        combinations += [combination for combination in itertools.combinations_with_replacement(range(len(light_copies)), n_lights)
+            if all(combination.count(kind) <= len(copies) for kind, copies in enumerate(light_copies))]
+
+    states = scene_states(root)
+    for node in states:
+        for combination in combinations:
+            copy = node.copyTo(warm_up_np)
+            copy.setState(node.getNetState())
+            # Nodes that are only shown when lit are hidden until then
+            copy.show()
+            # Shrunk to the same small size, whatever the node's size
+            bounds = BoundingSphere()
+            bounds.extendBy(node.node().getInternalBounds())
+            if not bounds.isEmpty():
+                scale = near / max(bounds.getRadius(), 1e-6)
+                copy.setScale(scale)
+                copy.setPos(-bounds.getCenter() * scale)
+            for kind, n_lights in ((kind, combination.count(kind)) for kind in set(combination)):
+                for light in light_copies[kind][:n_lights]:
+                    copy.setLight(light)
+
+    warm_up_np.prepareScene(base.win.getGsg())
+    # Once to generate the shaders and the lights' shadow buffers, and again to render into those buffers
+    base.graphicsEngine.renderFrame()
+    base.graphicsEngine.renderFrame()
+    warm_up_np.removeNode()
+
+    return {
+        'states': len(states),
+        'light_combinations': len(combinations),
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,91 @@
+from typing import List, Optional
+
+import numpy as np
+
+from panda3d.core import GraphicsOutput, NodePath
+
+
+# Number of shadow buffers that are rendered in a frame, at most
+SHADOW_BUDGET = 2
+
+
+class ShadowScheduler:
+    """
+    Decides which shadow maps are rendered in each frame. Panda3D renders the shadow buffer of every shadow-casting light in every frame
+    (for a point light, the 6 faces of its cube map), even though the labyrinth doesn't move, and neither do the lights once placed.
+    Instead, a light's shadow buffer is only rendered when its shadow map could have changed: when the light was moved, when its buffer was
+    just created, or when one of the dynamic casters (the entities that move) moved within the light's `radius`. The other buffers are
+    left inactive, and keep the shadow maps they last rendered. At most `budget` buffers are rendered in a frame, the ones that were
+    never rendered first and then the ones that have been waiting the longest, so the updates of many moving lights are spread across frames.
+    The positions of the lights and casters are taken relative to `root`.
+    """
+
+    def __init__(self, gsg, root: NodePath, budget: int = SHADOW_BUDGET, caster_radius: float = 1.0):
+        self.gsg = gsg
+        self.root = root
+        self.budget = budget
+        # Casters are taken as spheres of this radius, since they cast shadows around their position
+        self.caster_radius = caster_radius
+
+        self.lights: List[NodePath] = []
+        self.radii = np.empty(0)
+        self.positions = np.empty((0, 3))
+        self.buffers: List[Optional[GraphicsOutput]] = []
+        self.dirty = np.empty(0, dtype=bool)
+        # Frame in which each light's buffer was last rendered, or -1 if it never was
+        self.rendered_frames = np.empty(0, dtype=np.int64)
+        self.casters = np.empty((0, 3))
+        self.frame = 0
+
+    def __len__(self) -> int:
+        return len(self.lights)
+
+    def add(self, light: NodePath, radius: float):
+        self.lights.append(light)
+        self.radii = np.append(self.radii, radius)
+        self.positions = np.concatenate([self.positions, [tuple(light.getPos(self.root))]])
+        self.buffers.append(None)
+        self.dirty = np.append(self.dirty, True)
+        self.rendered_frames = np.append(self.rendered_frames, -1)
+
+    def get_buffer(self, light: NodePath) -> Optional[GraphicsOutput]:
+        # Panda3D only creates the buffer once the light is used by the shader generator, and creates it again if it's resized
+        return light.node().getShadowBuffer(self.gsg)
+
+    def update(self, casters: np.ndarray) -> List[NodePath]:
+        """
+        Choose the shadow buffers to render in the next frame, given the current positions of the dynamic casters.
+        Get the lights whose buffers will be rendered.
+        """
+        casters = np.asarray(casters, dtype=np.float64).reshape(-1, 3)
+        # When casters were added or removed, they are all taken as moved, since they can't be matched with their previous positions
+        moved = casters if casters.shape != self.casters.shape else casters[(casters != self.casters).any(axis=1)]
+        self.casters = casters.copy()
+
+        positions = np.array([tuple(light.getPos(self.root)) for light in self.lights]).reshape(-1, 3)
+        self.dirty |= (positions != self.positions).any(axis=1)
+        self.positions = positions
+        if len(moved) and len(self.lights):
+            distances = np.linalg.norm(positions[:, np.newaxis] - moved[np.newaxis], axis=2)
+            self.dirty |= (distances <= (self.radii + self.caster_radius)[:, np.newaxis]).any(axis=1)
+
+        for idx, light in enumerate(self.lights):
+            buffer = self.get_buffer(light)
+            if buffer != self.buffers[idx]:
+                self.buffers[idx] = buffer
+                self.dirty[idx] = True
+                self.rendered_frames[idx] = -1
+
+        has_buffer = np.array([buffer is not None for buffer in self.buffers], dtype=bool)
+        candidates = np.flatnonzero(self.dirty & has_buffer)
+        # Never rendered first (-1), then the longest waiting
+        scheduled = candidates[np.argsort(self.rendered_frames[candidates], kind='stable')[:self.budget]]
+
+        for idx in np.flatnonzero(has_buffer):
+            self.buffers[idx].setActive(False)
+        for idx in scheduled:
+            self.buffers[idx].setActive(True)
+        self.dirty[scheduled] = False
+        self.rendered_frames[scheduled] = self.frame
+        self.frame += 1
+        return [self.lights[idx] for idx in scheduled]
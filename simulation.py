@@ -0,0 +1,68 @@
+import json
+import random
+
+from typing import List, Set, Tuple
+from panda3d.core import KeyboardButton, MouseWatcher
+
+
+# The entities' speeds are per frame, and were tuned for this frame rate, so each simulation step lasts one of these frames
+SIMULATION_TIMESTEP = 1 / 60
+
+# Keys that control the player
+INPUT_KEYS = ('a', 'd', 'w', 's', 'space', 'f')
+
+
+class KeyboardInput:
+    """Player input from the keyboard."""
+
+    def __init__(self, mouse_watcher: MouseWatcher):
+        self.mouse_watcher = mouse_watcher
+
+    def is_down(self, key: str) -> bool:
+        button = KeyboardButton.space() if key == 'space' else KeyboardButton.asciiKey(key)
+        return self.mouse_watcher.is_button_down(button)
+
+
+class ScriptedInput:
+    """
+    Player input from a script, as a list of `(number of steps, keys held down)` segments that are played in order.
+    After the script ends, no keys are held down.
+    """
+
+    def __init__(self, segments: List[Tuple[int, Set[str]]]):
+        self.segments = [(n_steps, set(keys)) for n_steps, keys in segments if n_steps > 0]
+        self.step = 0
+        self._segment_idx = 0
+        self._segment_end = self.segments[0][0] if self.segments else 0
+
+    @classmethod
+    def from_file(cls, path: str) -> 'ScriptedInput':
+        """Load a JSON list of `[number of steps, "keys separated by spaces"]`, such as `[[60, "w"], [10, "w space"]]`."""
+        with open(path, 'rt') as script_file:
+            segments = json.load(script_file)
+        return cls([(n_steps, keys.split()) for n_steps, keys in segments])
+
+    @classmethod
+    def random(cls, n_steps: int, seed: int = 0, max_segment_steps: int = 60) -> 'ScriptedInput':
+        """Random walk of the player, holding up to two movement keys (and sometimes jumping) for a random number of steps."""
+        rng = random.Random(seed)
+        segments = []
+        while n_steps > 0:
+            segment_steps = min(rng.randint(1, max_segment_steps), n_steps)
+            keys = set(rng.sample(INPUT_KEYS[:4], rng.randint(0, 2)))
+            if rng.random() < 0.1:
+                keys.add('space')
+            segments.append((segment_steps, keys))
+            n_steps -= segment_steps
+        return cls(segments)
+
+    def advance(self):
+        """Go to the next step of the script."""
+        self.step += 1
+        while self._segment_idx < len(self.segments) and self.step >= self._segment_end:
+            self._segment_idx += 1
+            if self._segment_idx < len(self.segments):
+                self._segment_end += self.segments[self._segment_idx][0]
+
+    def is_down(self, key: str) -> bool:
+        return self._segment_idx < len(self.segments) and key in self.segments[self._segment_idx][1]
@@ -0,0 +1,142 @@
+import math
+
+from collections import defaultdict
+from typing import Dict, Generator, List, Set, Tuple
+from panda3d.core import NodePath
+
+from labyrinth import Labyrinth
+
+
+Point = Tuple[float, float, float]
+CellKey = Tuple[int, int, int]
+
+
+class SpatialIndex:
+    """
+    Uniform grid with one layer of cells per floor, used to find the nodes near a point without going through the whole scene.
+    Each node is registered with one or more bounding boxes (the baked labyrinth has many blocks in the same node), or a single point.
+    The labyrinth blocks are inserted once, while the moving entities update their position with `move`.
+    All positions are relative to the same parent node (the labyrinth's).
+    """
+
+    CELL_SIZE = Labyrinth.DIMS_WALL_LENGTH + Labyrinth.DIMS_WALL_THIN
+    FLOOR_HEIGHT = Labyrinth.DIMS_FLOOR_HEIGHT + Labyrinth.DIMS_WALL_HEIGHT
+
+    def __init__(self, cell_size: float = CELL_SIZE, floor_height: float = FLOOR_HEIGHT):
+        self.cell_size = cell_size
+        self.floor_height = floor_height
+
+        self.cells: Dict[CellKey, Set[int]] = defaultdict(set)
+        # Each entry is a box of a node: (node, box minimum, box maximum, cells it's in)
+        self.entries: List[Tuple[NodePath, Point, Point, List[CellKey]]] = []
+        self.node_entries: Dict[NodePath, List[int]] = defaultdict(list)
+        self.free_entries: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.node_entries)
+
+    def __contains__(self, node: NodePath) -> bool:
+        return node in self.node_entries
+
+    def floor_of(self, z: float) -> int:
+        return math.floor(z / self.floor_height)
+
+    def box_cells(self, box_min: Point, box_max: Point) -> List[CellKey]:
+        x0, y0, z0 = (math.floor(box_min[0] / self.cell_size), math.floor(box_min[1] / self.cell_size), self.floor_of(box_min[2]))
+        x1, y1, z1 = (math.floor(box_max[0] / self.cell_size), math.floor(box_max[1] / self.cell_size), self.floor_of(box_max[2]))
+        # A box that ends exactly where the next floor starts isn't part of it (walls end at the next floor's slab)
+        if z1 > z0 and box_max[2] == z1 * self.floor_height:
+            z1 -= 1
+        return [(x, y, z) for z in range(z0, z1 + 1) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def insert(self, node: NodePath, box_min: Point, box_max: Point = None):
+        """Add a bounding box of `node` to the index, or a single point if `box_max` is not specified."""
+        box_min = tuple(box_min)
+        box_max = tuple(box_max) if box_max is not None else box_min
+        cells = self.box_cells(box_min, box_max)
+
+        entry = (node, box_min, box_max, cells)
+        if self.free_entries:
+            entry_idx = self.free_entries.pop()
+            self.entries[entry_idx] = entry
+        else:
+            entry_idx = len(self.entries)
+            self.entries.append(entry)
+
+        self.node_entries[node].append(entry_idx)
+        for cell in cells:
+            self.cells[cell].add(entry_idx)
+
+    def remove(self, node: NodePath):
+        for entry_idx in self.node_entries.pop(node, []):
+            for cell in self.entries[entry_idx][3]:
+                self.cells[cell].discard(entry_idx)
+                if not self.cells[cell]:
+                    del self.cells[cell]
+            self.entries[entry_idx] = None
+            self.free_entries.append(entry_idx)
+
+    def move(self, node: NodePath, position: Point):
+        """Update the position of a node that was inserted as a single point, inserting it if it wasn't yet."""
+        entry_indices = self.node_entries.get(node)
+        if not entry_indices:
+            self.insert(node, position)
+            return
+
+        entry_idx = entry_indices[0]
+        _, _, _, cells = self.entries[entry_idx]
+        position = tuple(position)
+        new_cells = self.box_cells(position, position)
+        if new_cells != cells:
+            for cell in cells:
+                self.cells[cell].discard(entry_idx)
+                if not self.cells[cell]:
+                    del self.cells[cell]
+            for cell in new_cells:
+                self.cells[cell].add(entry_idx)
+        self.entries[entry_idx] = (node, position, position, new_cells)
+
+    def query_radius(self, position: Point, radius: float, height_range: Tuple[float, float] = None) -> Generator[NodePath, None, None]:
+        """
+        Get the nodes with a box closer than `radius` to `position`, only going through the cells that are within the radius.
+        If `height_range` is specified, only the nodes whose base height relative to `position` is within it are considered,
+        which is used to query the nodes on the same floor.
+        """
+        x, y, z = position
+        if height_range is not None:
+            z_min, z_max = z + height_range[0], z + height_range[1]
+        else:
+            z_min, z_max = z - radius, z + radius
+
+        x0, x1 = math.floor((x - radius) / self.cell_size), math.floor((x + radius) / self.cell_size)
+        y0, y1 = math.floor((y - radius) / self.cell_size), math.floor((y + radius) / self.cell_size)
+        z0, z1 = self.floor_of(z_min), self.floor_of(z_max)
+
+        radius_squared = radius * radius
+        visited_entries = set()
+        yielded_nodes = set()
+        for cz in range(z0, z1 + 1):
+            for cy in range(y0, y1 + 1):
+                for cx in range(x0, x1 + 1):
+                    cell = self.cells.get((cx, cy, cz))
+                    if not cell:
+                        continue
+
+                    for entry_idx in cell:
+                        if entry_idx in visited_entries:
+                            continue
+                        visited_entries.add(entry_idx)
+
+                        node, box_min, box_max, _ = self.entries[entry_idx]
+                        if node in yielded_nodes:
+                            continue
+                        if height_range is not None and not (z_min <= box_min[2] <= z_max):
+                            continue
+
+                        # Distance from the position to the closest point in the box
+                        dx = max(box_min[0] - x, 0, x - box_max[0])
+                        dy = max(box_min[1] - y, 0, y - box_max[1])
+                        dz = max(box_min[2] - z, 0, z - box_max[2])
+                        if dx * dx + dy * dy + dz * dz < radius_squared:
+                            yielded_nodes.add(node)
+                            yield node
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from labyrinth import BLOCK_TYPES, BlockTable, Wall
+from mobs import Spider
+
+
+SPAWN_PLAN_VERSION = 1
+SPAWN_PLAN_EXTENSION = '.spawns'
+
+SPAWN_SPIDER = 0
+SPAWN_TABLE = 1
+
+# Each site is next to one of the sides of a wall that face inside the labyrinth, and can have both a spider and a table
+SPAWN_SITE_DTYPE = np.dtype([
+    ('kind',            np.uint8),      # SPAWN_SPIDER or SPAWN_TABLE
+    ('floor_index',     np.int32),
+    ('position',        np.float64, 3),
+    ('hpr',             np.float64, 3),
+    ('scale',           np.float64, 3),
+    ('movement_axis',   np.float64, 3), # only for spiders
+    ('wall_dims',       np.float64, 3), # width, depth and height of the wall, only for spiders
+])
+
+TABLE_SCALE = 0.025
+# Distance between the tables and the wall
+TABLE_DISTANCE = TABLE_SCALE * 20
+
+# For each side of a wall (east, west, south and north): where on the wall the spawns are, as a ratio of its width and depth,
+# the direction away from the wall, and the spider's and table's heading and the axes along which the spider moves
+SIDE_ANCHORS = np.array([(1, 0.5), (0, 0.5), (0.5, 1), (0.5, 0)])
+SIDE_NORMALS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)])
+SIDE_SPIDER_HEADINGS = np.array([90, 90, 0, 180])
+SIDE_TABLE_HEADINGS = np.array([-90, -90, 180, 0])
+SIDE_MOVEMENT_AXES = np.array([(0, 1, 1), (0, 1, 1), (1, 0, 1), (1, 0, 1)])
+
+
+def candidate_sites(table: BlockTable) -> np.ndarray:
+    """
+    Get every place where a spider and a table could spawn, as a `SPAWN_SITE_DTYPE` array with a spider site
+    followed by its table site, in the order of the walls of the map (the parts of merged walls) and their sides.
+    """
+    columns = table.columns
+    has_parts = np.zeros(len(table), dtype=bool)
+    has_parts[columns['parent'][columns['parent'] >= 0]] = True
+    wall_types = [code for code, block_type in enumerate(BLOCK_TYPES) if issubclass(block_type, Wall)]
+    walls = np.flatnonzero(np.isin(columns['type'], wall_types) & ~has_parts)
+
+    wall_idx, side = np.nonzero(columns['inside'][walls])
+    wall_idx = walls[wall_idx]
+    position = columns['position'][wall_idx]
+    width, height, depth = columns['dims'][wall_idx].T
+    n_sites = len(wall_idx)
+
+    # On the face of the wall, halfway up for the spiders and on the floor for the tables
+    anchor = np.column_stack([
+        position[:, 0] + SIDE_ANCHORS[side, 0] * width,
+        position[:, 1] + SIDE_ANCHORS[side, 1] * depth,
+        position[:, 2],
+    ])
+
+    spiders = np.zeros(n_sites, dtype=SPAWN_SITE_DTYPE)
+    spiders['kind'] = SPAWN_SPIDER
+    spiders['floor_index'] = columns['floor_index'][wall_idx]
+    spiders['position'] = anchor + np.column_stack([np.zeros((n_sites, 2)), height / 2])
+    spiders['hpr'] = np.column_stack([SIDE_SPIDER_HEADINGS[side], np.full(n_sites, -90), np.zeros(n_sites)])
+    spiders['scale'] = Spider.SCALE
+    spiders['movement_axis'] = SIDE_MOVEMENT_AXES[side]
+    spiders['wall_dims'] = np.column_stack([width, depth, height])
+
+    tables = np.zeros(n_sites, dtype=SPAWN_SITE_DTYPE)
+    tables['kind'] = SPAWN_TABLE
+    tables['floor_index'] = spiders['floor_index']
+    tables['position'] = anchor + np.column_stack([TABLE_DISTANCE * SIDE_NORMALS[side], np.zeros(n_sites)])
+    tables['hpr'] = np.column_stack([SIDE_TABLE_HEADINGS[side], np.full(n_sites, 90), np.zeros(n_sites)])
+    tables['scale'] = TABLE_SCALE
+
+    sites = np.empty(2 * n_sites, dtype=SPAWN_SITE_DTYPE)
+    sites[0::2] = spiders
+    sites[1::2] = tables
+    return sites
+
+
+def plan_spawns(table: BlockTable, seed: int, spider_chance: float, table_chance: float) -> np.ndarray:
+    """
+    Choose which of the candidate sites get a spawn, each with its own chance, and vary the spiders' scale.
+    The same seed always leads to the same plan.
+    """
+    rng = np.random.default_rng(seed)
+    sites = candidate_sites(table)
+
+    chances = np.where(sites['kind'] == SPAWN_SPIDER, spider_chance, table_chance)
+    plan = sites[rng.random(len(sites)) < chances]
+
+    spiders = plan['kind'] == SPAWN_SPIDER
+    plan['scale'][spiders] += rng.uniform(-Spider.SPIDER_SCALE_VARIATION, Spider.SPIDER_SCALE_VARIATION, (int(spiders.sum()), 1))
+    return plan
+
+
+def spawn_plan_key(table: BlockTable, seed: int, spider_chance: float, table_chance: float) -> str:
+    """Hash of everything that the spawn plan depends on: the walls of the labyrinth, the seed and the spawn chances."""
+    digest = hashlib.sha256(json.dumps([SPAWN_PLAN_VERSION, seed, spider_chance, table_chance]).encode())
+    for name in ('type', 'parent', 'floor_index', 'position', 'dims', 'inside'):
+        digest.update(np.ascontiguousarray(table.columns[name]).tobytes())
+    return digest.hexdigest()
+
+
+def load_or_plan_spawns(table: BlockTable, seed: int, spider_chance: float, table_chance: float, cache_path: str = None) -> np.ndarray:
+    """Get the spawn plan from `cache_path` if it was saved there with the same walls, seed and chances, or plan it and save it there."""
+    if cache_path is None:
+        return plan_spawns(table, seed, spider_chance, table_chance)
+
+    key = spawn_plan_key(table, seed, spider_chance, table_chance)
+    plan = load_spawn_plan(cache_path, key)
+    if plan is None:
+        plan = plan_spawns(table, seed, spider_chance, table_chance)
+        try:
+            save_spawn_plan(cache_path, key, plan)
+        except OSError as e:
+            print('Could not write the spawn plan cache:', e)
+    return plan
+
+
+def load_spawn_plan(path: str, key: str) -> np.ndarray:
+    """
+    Load a spawn plan saved with `save_spawn_plan`. Returns `None` if there is none, if it doesn't match the `key`,
+    or if it can't be read (such as a corrupt file), in which case the plan should be made again.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as plan_file:
+            if str(plan_file['key']) != key or plan_file['plan'].dtype != SPAWN_SITE_DTYPE:
+                return None
+            return plan_file['plan']
+    except (zipfile.BadZipFile, ValueError, KeyError, OSError, EOFError):
+        return None
+
+
+def save_spawn_plan(path: str, key: str, plan: np.ndarray):
+    # Write into a temporary file first, so that a plan is never left half-written
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as plan_file:
+        np.savez(plan_file, key=np.array(key), plan=plan)
+    os.replace(temporary_path, path)
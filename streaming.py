@@ -0,0 +1,170 @@
+import os
+
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from panda3d.core import BoundingBox, BoundingVolume, GeomNode, Lens, NodePath, Point3, Thread
+
+from common import generateBakedGeometry, generateCollisionHierarchy, generateGeometry, generateIndexedGeometry, group_blocks_for_baking, group_blocks_for_collisions
+from labyrinth import BlockView, FloorView
+
+
+# Floors above and below the player's that are always loaded
+STREAMING_RADIUS = 1
+# In megabytes
+STREAMING_BUDGET = 64
+
+# The render nodes of a floor: each node along with its texture, whether it's transparent, whether it's a roof,
+# and the blocks in it (with their range of vertex rows in the node, for the baked labyrinth)
+FloorGeometry = List[Tuple[NodePath, Optional[str], bool, bool, Dict[BlockView, Optional[Tuple[int, int]]]]]
+
+
+def build_floor_geometry(blocks: List[Tuple[int, BlockView]], baked: bool, indexed: bool, cull_hidden_faces: bool) -> FloorGeometry:
+    """
+    Create the render nodes of the `blocks` of a floor, given along with their index in the labyrinth, without attaching them to the scene.
+    When `baked`, there is one node for each group of blocks that share the same material, otherwise one node per block.
+    """
+    geometry = []
+    if baked:
+        for (floor_index, texture, is_transparent, is_roof), group_blocks in group_blocks_for_baking([block for _, block in blocks]).items():
+            group_name = f'labyrinth_floor_{floor_index}_{os.path.basename(texture or "none")}' + ('_transparent' if is_transparent else '') + ('_roof' if is_roof else '')
+            group_geom, vertex_ranges = generateBakedGeometry(group_blocks, group_name, indexed, cull_hidden_faces)
+            geometry.append((NodePath(group_geom), texture, is_transparent, is_roof, vertex_ranges))
+
+    else:
+        for idx, block in blocks:
+            if indexed:
+                block_geom = generateIndexedGeometry(block, f'labyrinth_block_{idx}', cull_hidden_faces)
+            else:
+                block_geom = generateGeometry(block, f'labyrinth_block_{idx}')
+            block_node = NodePath(block_geom)
+            block_node.setPos(block.position)
+            is_roof = isinstance(block, FloorView) and block.strictly_roof
+            geometry.append((block_node, block.texture, block.is_transparent(), is_roof, {block: None}))
+
+    return geometry
+
+
+def build_floor_collisions(blocks: List[Tuple[int, BlockView]]) -> List[NodePath]:
+    """Create the collision hierarchies of the `blocks` of a floor, one for each type of block, without attaching them to the scene."""
+    return [generateCollisionHierarchy(group_blocks, f'labyrinth_collisions_{floor_index}_{node_name}', node_name)
+        for (floor_index, node_name), group_blocks in group_blocks_for_collisions([block for _, block in blocks]).items()]
+
+
+def geometry_nbytes(nodes: List[NodePath]) -> int:
+    """Size of the vertex and index data of the Geoms under the `nodes`, which is what takes most of a floor's memory."""
+    nbytes = 0
+    for node in nodes:
+        for geom_node in [node] + list(node.findAllMatches('**/+GeomNode')):
+            if not isinstance(geom_node.node(), GeomNode):
+                continue
+            for geom in geom_node.node().getGeoms():
+                vertex_data = geom.getVertexData()
+                nbytes += sum(vertex_data.getArray(idx).getDataSizeBytes() for idx in range(vertex_data.getNumArrays()))
+                nbytes += sum(geom.getPrimitive(idx).getDataSizeBytes() for idx in range(geom.getNumPrimitives()) if geom.getPrimitive(idx).isIndexed())
+    return nbytes
+
+
+class FloorStreamer:
+    """
+    Loads the floors of the labyrinth as they are needed, instead of all of them at startup.
+    A floor is created by `build(floor_index)` away from the scene graph, in a threaded task chain when `threaded`,
+    and then put in the scene by `attach(floor_index, floor)` on the main thread. `detach(floor_index)` takes it out again.
+    The floors within `radius` of the player's floor, and the one above it, are always loaded. The floors that the camera sees are also loaded while
+    the loaded floors take less than `budget_bytes` (as estimated by `size(floor)`), and when they take more,
+    the floors that are neither are unloaded, starting from the farthest.
+    """
+
+    TASK_CHAIN = 'floor_streaming'
+
+    def __init__(self, task_mgr, floor_boxes: List[Tuple[Point3, Point3]],
+                 build: Callable[[int], object], attach: Callable[[int, object], None], detach: Callable[[int], None], size: Callable[[object], int],
+                 radius: int = STREAMING_RADIUS, budget_bytes: int = STREAMING_BUDGET * 2**20, threaded: bool = True):
+        self.task_mgr = task_mgr
+        self.floor_boxes = [BoundingBox(box_min, box_max) for box_min, box_max in floor_boxes]
+        self.build = build
+        self.attach = attach
+        self.detach = detach
+        self.size = size
+        self.radius = radius
+        self.budget_bytes = budget_bytes
+
+        self.threaded = threaded and Thread.isThreadingSupported()
+        if self.threaded:
+            task_mgr.setupTaskChain(self.TASK_CHAIN, numThreads=1, frameSync=False)
+
+        # Size of each loaded floor, in bytes
+        self.loaded: Dict[int, int] = {}
+        self.loaded_bytes = 0
+        # Size of every floor that was loaded before, so that a floor that doesn't fit in the budget isn't loaded again
+        self.sizes: Dict[int, int] = {}
+        self.building: Set[int] = set()
+        # Floors built by the streaming thread, waiting to be attached by the main thread
+        self.ready: List[Tuple[int, object]] = []
+
+    @property
+    def n_floors(self) -> int:
+        return len(self.floor_boxes)
+
+    def floor_range(self, center: int) -> range:
+        """Get the floors that are always loaded around the `center` floor, including the floor above it, which holds its ceiling."""
+        center = min(max(center, 0), self.n_floors - 1)
+        return range(max(center - self.radius, 0), min(center + max(self.radius, 1), self.n_floors - 1) + 1)
+
+    def visible_floors(self, camera: NodePath, lens: Lens, root: NodePath) -> Set[int]:
+        """Get the floors whose bounds are in the `camera`'s frustum, with the floors' bounds relative to `root`."""
+        frustum = lens.makeBounds()
+        frustum.xform(camera.getMat(root))
+        return {floor_index for floor_index, box in enumerate(self.floor_boxes) if frustum.contains(box) != BoundingVolume.IF_no_intersection}
+
+    def load(self, floor_indices):
+        """Build and attach the floors right away, such as the player's floors at startup."""
+        for floor_index in floor_indices:
+            if floor_index not in self.loaded and floor_index not in self.building:
+                self.add(floor_index, self.build(floor_index))
+
+    def request(self, floor_index: int):
+        if floor_index in self.loaded or floor_index in self.building:
+            return
+        self.building.add(floor_index)
+        if self.threaded:
+            self.task_mgr.add(self.build_task, f'build_floor_{floor_index}', taskChain=self.TASK_CHAIN, extraArgs=[floor_index])
+        else:
+            self.ready.append((floor_index, self.build(floor_index)))
+
+    def build_task(self, floor_index: int):
+        self.ready.append((floor_index, self.build(floor_index)))
+
+    def add(self, floor_index: int, floor):
+        self.attach(floor_index, floor)
+        self.loaded[floor_index] = self.sizes[floor_index] = self.size(floor)
+        self.loaded_bytes += self.loaded[floor_index]
+
+    def unload(self, floor_index: int):
+        self.detach(floor_index)
+        self.loaded_bytes -= self.loaded.pop(floor_index)
+
+    def update(self, center: int, visible: Set[int] = frozenset()):
+        """Load the floors around the `center` floor and the `visible` ones, attaching at most one built floor, and unload the rest if over the budget."""
+        required = set(self.floor_range(center))
+        for floor_index in sorted(required, key=lambda floor_index: abs(floor_index - center)):
+            self.request(floor_index)
+
+        budget_left = self.budget_bytes - self.loaded_bytes
+        for floor_index in sorted(visible - required, key=lambda floor_index: abs(floor_index - center)):
+            if floor_index in self.loaded or floor_index in self.building:
+                continue
+            if self.sizes.get(floor_index, 0) >= budget_left:
+                break
+            self.request(floor_index)
+            budget_left -= self.sizes.get(floor_index, 0)
+
+        # Attaching a floor is done on the main thread, so only one is attached per frame
+        if self.ready:
+            floor_index, floor = self.ready.pop(0)
+            self.building.discard(floor_index)
+            self.add(floor_index, floor)
+
+        while self.loaded_bytes > self.budget_bytes:
+            unneeded = [floor_index for floor_index in self.loaded if floor_index not in required]
+            if not unneeded:
+                break
+            self.unload(max(unneeded, key=lambda floor_index: (floor_index not in visible, abs(floor_index - center))))